@@ -1,14 +1,31 @@
+import time
+_INICIO_RERUN = time.perf_counter()  # o Streamlit reexecuta este arquivo a cada interação
+
 import streamlit as st
 import json
-import requests
+import os
 import re
-# Importação da biblioteca Gemini
-from google import genai
-from google.genai import types
+import threading
+import uuid
+import requests
+# google.genai e anthropic são importados sob demanda (ver obter_cliente_gemini/claude)
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
+from types import SimpleNamespace
+from pathlib import Path
+
+from assistente import classificador_intencao, parser_local
+from assistente.cliente_api import ClienteAPI
+from assistente.indice_nomes import IndiceNomes
+from assistente.pipeline import Prefetch, executar_com_prefetch
+from assistente.cache_intencao import CacheIntencao
+from assistente.hedge import ExtratorHedged, HistogramaLatencia, Provedor
+from assistente.json_incremental import LeitorComandos
+from assistente.historico import ArquivoHistorico, JanelaHistorico
+from assistente.metricas import METRICAS
+from assistente.agendador_llm import AgendadorLLM, PRIORIDADE_INTERATIVA, PRIORIDADE_LOTE
 
-# Importação da biblioteca Anthropic (Claude)
-from anthropic import Anthropic 
 # Se for usar Pydantic para Claude, descomente:
 # from pydantic import BaseModel, Field
 # from typing import List 
@@ -17,35 +34,160 @@ from anthropic import Anthropic
 # ==============================================================================
 # 1. CONFIGURAÇÃO INICIAL E CHAVES DE API (Gemini e Claude)
 # ==============================================================================
-st.set_page_config(page_title="Assistente de Recursos Acadêmicos (Gemini + DRF)", layout="wide")
-
-# Carrega a chave da Gemini
-try:
-    # A chave deve ser carregada via st.secrets (assumido que você a configurou)
-    GEMINI_API_KEY = st.secrets["GEMINI_API_KEY"] 
-    client_gemini = genai.Client(api_key=GEMINI_API_KEY)
-    MODELO_GEMINI = "gemini-2.5-flash"
-    # st.info("✅ Gemini API configurada com sucesso.") # Removido para limpar o output
-except Exception:
-    st.error("Erro: A chave GEMINI_API_KEY não foi encontrada. Adicione sua chave Gemini no arquivo .streamlit/secrets.toml")
-    st.stop()
-    
-# Carrega a chave do Anthropic (Claude) - APENAS CONFIGURAÇÃO
-try:
-    ANTHROPIC_API_KEY = st.secrets["ANTHROPIC_API_KEY"] 
-    client_claude = Anthropic(api_key=ANTHROPIC_API_KEY)
-    MODELO_CLAUDE = "claude-3-5-sonnet-20240620"
-    # st.info("✅ Anthropic API (Claude) configurada. (Não usada na extração JSON principal)") # Removido para limpar o output
-except KeyError:
-    # st.warning("⚠️ Chave ANTHROPIC_API_KEY não encontrada. O Claude não pode ser usado no momento.") # Removido para limpar o output
-    pass
-except Exception as e:
-    st.error(f"Erro ao inicializar o cliente Anthropic: {e}")
+MODELO_GEMINI = "gemini-2.5-flash"
+MODELO_CLAUDE = "claude-3-5-sonnet-20240620"
+
+# Os clientes (e os imports pesados das SDKs) são criados uma única vez por processo,
+# na primeira vez em que são usados: os reruns seguintes não fazem nenhum setup.
+@st.cache_resource
+def obter_metricas_rerun() -> dict:
+    """Custo do primeiro run (frio) x reruns seguintes (quentes) e da criação dos clientes."""
+    quentes = HistogramaLatencia(limites_ms=(5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000, 2000))
+    return {"frio_ms": None, "quentes": quentes, "ultimo_ms": None, "clientes_ms": {}}
+
+@st.cache_resource
+def obter_cliente_gemini():
+    """Levanta KeyError sem a chave GEMINI_API_KEY (exceções não ficam em cache: tenta de novo no próximo rerun)."""
+    inicio = time.perf_counter()
+    from google import genai
+    cliente = genai.Client(api_key=st.secrets["GEMINI_API_KEY"])
+    obter_metricas_rerun()["clientes_ms"]["gemini"] = (time.perf_counter() - inicio) * 1000
+    return cliente
+
+@st.cache_resource
+def obter_cliente_claude():
+    """Cliente Anthropic (reserva do Gemini no hedge) ou None se a chave não estiver configurada."""
+    inicio = time.perf_counter()
+    try:
+        api_key = st.secrets["ANTHROPIC_API_KEY"]
+    except (KeyError, FileNotFoundError):
+        return None
+    try:
+        from anthropic import Anthropic
+        cliente = Anthropic(api_key=api_key)
+    except Exception as e:
+        st.error(f"Erro ao inicializar o cliente Anthropic: {e}")
+        return None
+    obter_metricas_rerun()["clientes_ms"]["claude"] = (time.perf_counter() - inicio) * 1000
+    return cliente
+
+def registrar_tempo_rerun() -> None:
+    metricas = obter_metricas_rerun()
+    ms = (time.perf_counter() - _INICIO_RERUN) * 1000
+    if metricas["frio_ms"] is None:
+        metricas["frio_ms"] = ms
+    else:
+        metricas["quentes"].registrar(ms)
+    metricas["ultimo_ms"] = ms
 
 
 # URL base da sua API Django (Deve ter os endpoints /materias/, /professores/, /reservas/)
 API_BASE_URL = "http://127.0.0.1:8000/api/"
 
+@st.cache_resource
+def obter_cliente_api() -> ClienteAPI:
+    """Cliente HTTP único por processo: a Session (keep-alive) sobrevive aos reruns."""
+    return ClienteAPI(API_BASE_URL, timeout=(3.05, 10.0), tentativas=3)
+
+api_client = obter_cliente_api()
+
+# Cache persistente das intenções extraídas (sobrevive a reruns e reinícios do Streamlit)
+CACHE_DIR = Path(__file__).resolve().parent / ".cache_assistente"
+CACHE_INTENCAO_TTL = 7 * 24 * 3600  # 7 dias
+CACHE_INTENCAO_MAX = 2000
+
+@st.cache_resource
+def obter_cache_intencao() -> CacheIntencao:
+    """Instância única do cache por processo (compartilhada entre sessões e reruns)."""
+    return CacheIntencao(
+        CACHE_DIR / "intencoes.sqlite3",
+        max_entradas=CACHE_INTENCAO_MAX,
+        ttl_segundos=CACHE_INTENCAO_TTL,
+        namespace=f"{MODELO_GEMINI}|comandos",  # valores: lista de comandos por registro
+    )
+
+# Classificador treinado offline (python -m assistente.classificador_intencao): decide a intenção
+# dos registros que as REGEX não resolveram, antes de recorrer ao LLM. Opcional (NumPy + arquivo)
+CLASSIFICADOR_ARQUIVO = CACHE_DIR / "classificador_intencao.npz"
+
+@st.cache_resource(max_entries=1)
+def _carregar_classificador(versao: float) -> classificador_intencao.ClassificadorIntencao | None:
+    try:
+        return classificador_intencao.ClassificadorIntencao.carregar(CLASSIFICADOR_ARQUIVO)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def obter_classificador() -> classificador_intencao.ClassificadorIntencao | None:
+    """Modelo carregado uma vez por processo; um arquivo retreinado (mtime novo) é recarregado sozinho."""
+    if not classificador_intencao.DISPONIVEL:
+        return None
+    try:
+        versao = CLASSIFICADOR_ARQUIVO.stat().st_mtime
+    except OSError:
+        return None
+    return _carregar_classificador(versao)
+
+@st.cache_resource
+def obter_metricas_classificador() -> dict:
+    return {"consultados": 0, "resolvidos": 0}
+
+# Histórico do chat: só as últimas mensagens ficam na memória/tela; o resto vai para o disco
+HISTORICO_JANELA = 30
+HISTORICO_PAGINA = 20  # mensagens carregadas a cada clique em "mensagens anteriores"
+
+@st.cache_resource
+def obter_arquivo_historico() -> ArquivoHistorico:
+    return ArquivoHistorico(CACHE_DIR / "historico.sqlite3", retencao_dias=30)
+
+def obter_historico() -> JanelaHistorico:
+    if "historico" not in st.session_state:
+        st.session_state.historico = JanelaHistorico(obter_arquivo_historico(), obter_id_sessao(), HISTORICO_JANELA)
+        st.session_state.paginas_anteriores = 0
+    return st.session_state.historico
+
+# Limites da cota do Gemini (ajuste ao plano contratado)
+LLM_RPM = 15
+LLM_TPM = 250_000
+LLM_MAX_FILA = 32
+LLM_ESPERA_MAX = 8.0  # segundos na fila antes de desistir e usar o parser local
+
+@st.cache_resource
+def obter_agendador_llm() -> AgendadorLLM:
+    """Agendador único por processo: todas as sessões dividem a mesma cota do provedor."""
+    return AgendadorLLM(rpm=LLM_RPM, tpm=LLM_TPM, max_fila=LLM_MAX_FILA, max_concorrencia=4)
+
+# Hedge: se o Gemini passar do p90 da sua latência recente, a mesma extração vai ao Claude
+HEDGE_PERCENTIL = 0.9
+HEDGE_ATRASO_MIN_MS = 400
+HEDGE_ATRASO_MAX_MS = 5000
+
+@st.cache_resource
+def obter_extrator_llm() -> ExtratorHedged:
+    """Extrator único por processo: os histogramas de latência valem para todas as sessões."""
+    secundario = Provedor("claude", _chamar_claude) if obter_cliente_claude() is not None else None
+    return ExtratorHedged(
+        Provedor("gemini", _chamar_gemini),
+        secundario,
+        percentil=HEDGE_PERCENTIL,
+        atraso_min_ms=HEDGE_ATRASO_MIN_MS,
+        atraso_max_ms=HEDGE_ATRASO_MAX_MS,
+        executor=ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm"),
+    )
+
+# Streaming: a resposta do LLM é lida em pedaços e as leituras dependentes (listas,
+# buscar_*_id) começam assim que o campo 'intencao' de cada comando chega
+LLM_STREAMING = True
+
+@st.cache_resource
+def obter_metricas_streaming() -> dict:
+    """Tempo até a primeira ação x tempo até a resposta completa (todas as sessões)."""
+    return {"primeira_acao": HistogramaLatencia(), "resposta_completa": HistogramaLatencia()}
+
+def obter_id_sessao() -> str:
+    if "id_sessao" not in st.session_state:
+        st.session_state.id_sessao = uuid.uuid4().hex
+    return st.session_state.id_sessao
+
 
 # ==============================================================================
 # 2. SISTEMA DE EXTRAÇÃO DE INTENÇÃO (Função Core - Mantida com Gemini)
@@ -56,57 +198,38 @@ Você é um sistema de extração de intenção para um assistente acadêmico.
 Sua **ÚNICA** função é retornar **EXATAMENTE** um objeto JSON válido, aderindo estritamente ao esquema de resposta.
 Você deve responder **APENAS** com o JSON, sem markdown (como ```json) ou qualquer texto adicional.
 
+A mensagem do usuário vem dividida em registros numerados ([0], [1], ...). Um registro pode conter
+mais de um comando. Retorne {"comandos": [...]} com UM item por comando, na ordem em que aparecem,
+e em cada item informe em 'registro' o número do registro de onde o comando veio.
+
 Intenções Permitidas:
 'listar_materias', 'cadastrar_materia', 'atualizar_materia', 'excluir_materia',
 'listar_professores', 'cadastrar_professor', 'excluir_professor', 
 'reservar_laboratorio', 'listar_reservas', 'excluir_reserva',
-'outra'
+'mostrar_mais', 'carga_professor', 'ocupacao_laboratorio', 'top_materias', 'outra'
 
 Regras de Extração de Parâmetros:
 - Para 'reservar_laboratorio', extraia: {"materia_nome": "...", "data": "DD/MM ou DD/MM/AAAA", "hora_inicio": "HH:MM", "hora_fim": "HH:MM"}
 - Para operações de matéria, use: 'id', 'nome', 'professor', 'carga_horaria'.
 - Para professor, use: 'nome', 'email', 'departamento'.
 - Para 'excluir_reserva', o 'id' é obrigatório.
+- Use 'mostrar_mais' quando o usuário pedir a próxima página de uma listagem ("mostrar mais", "próxima página").
+- 'carga_professor' (total de horas por professor): {"professor": "..."} opcional.
+- 'ocupacao_laboratorio' (quanto o laboratório está reservado) e 'top_materias' (matérias que mais usam o laboratório):
+  {"periodo": "hoje" | "amanha" | "semana" | "proxima_semana" | "mes"} ou {"data": "DD/MM"}; sem período, a semana atual.
 """
 
-def extrair_intencao(mensagem_usuario: str) -> dict:
-    """
-    Usa o Gemini para extrair a intenção, com lógica aprimorada de fallback (REGEX).
-    """
-    
-    # CORREÇÃO CRÍTICA: Substitui o espaço inseparável (\xa0 ou \u00a0) por um espaço normal
-    clean_prompt = mensagem_usuario.lower().replace('\xa0', ' ').strip()
-    
-    
-    # 1. VERIFICAÇÃO DE COMANDOS SIMPLES (Garantia de intenção)
-    simple_intents = {
-        "listar": "listar_materias", "lista": "listar_materias", "ver": "listar_materias",
-        "crie a matéria": "cadastrar_materia", 
-        "cadastrar materia": "cadastrar_materia", "excluir materia": "excluir_materia", 
-        "atualizar materia": "atualizar_materia",
-        
-        "cadastrar professor": "cadastrar_professor",
-        "cadastre o professor": "cadastrar_professor",
-        "criar professor": "cadastrar_professor",
-        "excluir professor": "excluir_professor", # Adicionada intenção para consistência
-        
-        "listar professores": "listar_professores","falar professores": "listar_professores",
-        "reservar": "reservar_laboratorio", "listar reservas": "listar_reservas", "reservas": "listar_reservas",
-        "apagar reserva": "excluir_reserva", 
-        "deletar reserva": "excluir_reserva", 
-        "excluir reserva": "excluir_reserva" 
-    }
-    # Verificação de comandos simples no início da frase
-    for key, intent in simple_intents.items():
-        if clean_prompt.startswith(key.lower()):
-            # Se for uma ação que requer ID (ex: 'excluir reserva') a IA cuidará dos parâmetros
-            if 'id' not in clean_prompt and 'professor' not in clean_prompt and 'materia' not in clean_prompt:
-                    return {"intencao": intent, "parametros": {}}
-    
-    # 2. CHAMADA À IA (Tentativa Primária - usando Gemini)
-    schema = types.Schema(
+INTENCAO_DESCONHECIDA = {"intencao": "outra", "parametros": {}}
+
+# Esquema da resposta: montado UMA vez por processo (antes era reconstruído a cada mensagem)
+@st.cache_resource
+def obter_schema_resposta():
+    from google.genai import types
+
+    comando_schema = types.Schema(
         type=types.Type.OBJECT,
         properties={
+            "registro": types.Schema(type=types.Type.INTEGER),
             "intencao": types.Schema(type=types.Type.STRING),
             "parametros": types.Schema(
                 type=types.Type.OBJECT,
@@ -121,220 +244,542 @@ def extrair_intencao(mensagem_usuario: str) -> dict:
                     "data": types.Schema(type=types.Type.STRING),
                     "hora_inicio": types.Schema(type=types.Type.STRING),
                     "hora_fim": types.Schema(type=types.Type.STRING),
+                    "periodo": types.Schema(type=types.Type.STRING), # Consultas agregadas
                 },
             ),
         },
-        required=["intencao", "parametros"]
+        required=["registro", "intencao", "parametros"]
     )
-    
-    final_prompt = f"{SYSTEM_PROMPT}\n\nMENSAGEM DO USUÁRIO: \"{mensagem_usuario}\""
-    intent_data = {"intencao": "outra", "parametros": {}}
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={"comandos": types.Schema(type=types.Type.ARRAY, items=comando_schema)},
+        required=["comandos"]
+    )
+
+# Cache de contexto do provedor: o SYSTEM_PROMPT (estático) não é reenviado/reprocessado
+# a cada mensagem. Abaixo do mínimo de tokens de cada provedor o cache explícito não é
+# criado (Gemini) ou é ignorado (Anthropic) e tudo segue funcionando sem ele.
+CACHE_CONTEXTO_TTL = 3600  # segundos
+
+@st.cache_resource
+def obter_contexto_gemini() -> dict:
+    """Config do Gemini compartilhada pelo processo (recriada só quando o cache expira)."""
+    return {"config": None, "cache": None, "renovar_em": 0.0, "lock": threading.Lock()}
 
+def config_gemini():
+    contexto = obter_contexto_gemini()
+    with contexto["lock"]:
+        if contexto["config"] is None or time.time() >= contexto["renovar_em"]:
+            _renovar_contexto_gemini(contexto)
+        return contexto["config"]
+
+def invalidar_contexto_gemini() -> None:
+    contexto = obter_contexto_gemini()
+    with contexto["lock"]:
+        contexto["config"] = None
+
+def _renovar_contexto_gemini(contexto: dict) -> None:
+    from google.genai import types
+
+    base = dict(response_mime_type="application/json", response_schema=obter_schema_resposta(), temperature=0.0, timeout=15.0)
     try:
-        response = client_gemini.models.generate_content(
+        cache = obter_cliente_gemini().caches.create(
             model=MODELO_GEMINI,
-            contents=[final_prompt],
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=schema,
-                temperature=0.0,
-                timeout=15.0 
-            )
+            config=types.CreateCachedContentConfig(
+                display_name="assistente-system-prompt",
+                system_instruction=SYSTEM_PROMPT,
+                ttl=f"{CACHE_CONTEXTO_TTL}s",
+            ),
         )
-        
-        raw_json_output = response.text.strip()
-        
-        json_text = raw_json_output
-        if json_text.startswith("```json"):
-            json_text = json_text[7:]
-        if json_text.endswith("```"):
-            json_text = json_text[:-3]
-        
-        intent_data = json.loads(json_text.strip())
-        
-        # 3. CORREÇÃO DE TIPOS
-        for key in ["carga_horaria", "id"]:
-              if intent_data.get("parametros", {}).get(key) is not None:
-                try: intent_data["parametros"][key] = int(intent_data["parametros"][key])
-                except: intent_data["parametros"].pop(key) 
+        contexto["cache"] = cache.name
+        contexto["config"] = types.GenerateContentConfig(cached_content=cache.name, **base)
+    except Exception:
+        # Sem cache explícito (prompt curto demais, modelo sem suporte...): o prompt vai como
+        # system_instruction, prefixo fixo que o cache implícito do Gemini reaproveita
+        contexto["cache"] = None
+        contexto["config"] = types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT, **base)
+    # Renova um pouco antes de expirar; sem cache, tenta criar de novo depois do mesmo intervalo
+    contexto["renovar_em"] = time.time() + CACHE_CONTEXTO_TTL - 60
+
+# Anthropic: o system prompt vai como bloco com cache_control (cache de prompt "ephemeral")
+SYSTEM_CLAUDE = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
 
+
+def _uso_gemini(metadata) -> dict | None:
+    if metadata is None:
+        return None
+    em_cache = metadata.cached_content_token_count or 0
+    return {
+        "cache": em_cache,
+        "sem_cache": (metadata.prompt_token_count or 0) - em_cache,
+        "saida": metadata.candidates_token_count or 0,
+    }
+
+
+def _uso_claude(usage) -> dict | None:
+    if usage is None:
+        return None
+    return {
+        "cache": usage.cache_read_input_tokens or 0,
+        # Tokens gravados no cache nesta chamada foram processados (e cobrados) normalmente
+        "sem_cache": usage.input_tokens + (usage.cache_creation_input_tokens or 0),
+        "saida": usage.output_tokens,
+    }
+
+
+@st.cache_resource
+def obter_uso_tokens() -> dict:
+    """Totais de tokens de entrada (em cache x sem cache) e saída por provedor."""
+    return {}
+
+def registrar_uso_tokens(provedor: str, uso: dict) -> None:
+    totais = obter_uso_tokens().setdefault(provedor, {"chamadas": 0, "cache": 0, "sem_cache": 0, "saida": 0})
+    totais["chamadas"] += 1
+    for chave in ("cache", "sem_cache", "saida"):
+        totais[chave] += uso[chave]
+
+
+def dividir_registros(mensagem: str) -> list[str]:
+    """Uma mensagem com várias linhas (ou comandos separados por ';') vira uma lista de registros."""
+    return [r.strip() for r in re.split(r"[\r\n;]+", mensagem) if r.strip()]
+
+
+@METRICAS.medir("extracao")
+def extrair_intencoes(mensagem_usuario: str, sessao: str = "anonima", prefetch: Prefetch | None = None,
+                      uso: list | None = None) -> list[dict]:
+    """
+    Extrai TODOS os comandos da mensagem, na ordem.
+    Cada registro (linha) passa por: cache persistente -> parser local -> classificador -> IA.
+    Os registros que sobram vão juntos em UMA única chamada ao Gemini.
+    Só resultados reconhecidos (intenção diferente de 'outra') são gravados no cache.
+    Se `uso` for uma lista, recebe o consumo de tokens de cada chamada ao LLM.
+    """
+    registros = dividir_registros(mensagem_usuario) or [mensagem_usuario]
+    cache = obter_cache_intencao()
+    resultados: list[list[dict] | None] = [None] * len(registros)
+    locais = {}
+    pendentes = []
+
+    for i, registro in enumerate(registros):
+        with METRICAS.span("cache_intencao"):
+            comandos = cache.obter(registro)
+        if comandos is not None:
+            resultados[i] = comandos
+            continue
+        # PARSER LOCAL (REGEX pré-compiladas): se o resultado for completo e confiável,
+        # a chamada ao Gemini é dispensada.
+        with METRICAS.span("parser_local"):
+            local = parser_local.analisar(registro)
+        if local.confiavel:
+            resultados[i] = [local.como_intent_data()]
+            cache.guardar(registro, resultados[i], origem="local")
+        else:
+            locais[i] = local
+            pendentes.append(i)
+
+    classificador = obter_classificador() if pendentes else None
+    if classificador is not None:
+        # Todos os registros pendentes da mensagem em UMA previsão vetorizada
+        with METRICAS.span("classificador"):
+            previsoes = classificador.prever([registros[i] for i in pendentes])
+        restantes = []
+        for i, (intencao, confianca) in zip(pendentes, previsoes):
+            # Exclusão/atualização por ID não usa o atalho: um número solto no texto não vira o ID
+            if classificador.confiavel(intencao, confianca) \
+                    and "id" not in parser_local.PARAMETROS_OBRIGATORIOS.get(intencao, ()):
+                # Intenção decidida pelo modelo; os parâmetros ainda precisam estar completos
+                local = parser_local.analisar_intencao(registros[i], intencao)
+                if local.confiavel:
+                    # Não vai para o cache: o cache é a fonte de treino do próprio classificador
+                    resultados[i] = [local.como_intent_data()]
+                    continue
+            restantes.append(i)
+        metricas = obter_metricas_classificador()
+        metricas["consultados"] += len(pendentes)
+        metricas["resolvidos"] += len(pendentes) - len(restantes)
+        pendentes = restantes
+
+    if pendentes:
+        with METRICAS.span("llm"):
+            respostas_ia = _extrair_intencoes_ia([registros[i] for i in pendentes], sessao, prefetch, uso)
+        for posicao, i in enumerate(pendentes):
+            comandos = respostas_ia.get(posicao) or [dict(INTENCAO_DESCONHECIDA)]
+            comandos = [_combinar_com_local(c, locais[i]) for c in comandos]
+            resultados[i] = comandos
+            if any(c["intencao"] != "outra" for c in comandos):
+                cache.guardar(registros[i], comandos, origem="llm")
+
+    return [comando for comandos in resultados for comando in comandos]
+
+
+def _combinar_com_local(intent_data: dict, local: parser_local.ResultadoLocal) -> dict:
+    """
+    FALLBACK (PARSER LOCAL): se a IA falhou ou respondeu algo fora das intenções
+    permitidas, usa o resultado local; se concordam, completa os parâmetros ausentes.
+    """
+    if intent_data.get("intencao") not in parser_local.PARAMETROS_OBRIGATORIOS:
+        # Sem a IA, um número solto do texto não basta como ID de exclusão/atualização
+        if "id" in parser_local.PARAMETROS_OBRIGATORIOS.get(local.intencao, ()) and not local.confiavel:
+            return dict(INTENCAO_DESCONHECIDA)
+        return local.como_intent_data()
+    if intent_data["intencao"] == local.intencao:
+        parametros = intent_data.setdefault("parametros", {})
+        for chave, valor in local.parametros.items():
+            if parametros.get(chave) in (None, ""):
+                parametros[chave] = valor
+    return intent_data
+
+
+def _estimar_tokens(texto: str) -> int:
+    """Estimativa grosseira (~4 caracteres por token) para reservar a cota antes da chamada."""
+    return len(texto) // 4 + 256  # + resposta
+
+
+def _tokens_usados(response) -> int | None:
+    uso = getattr(response, "usage_metadata", None)
+    return getattr(uso, "total_token_count", None)
+
+
+def _extrair_intencoes_ia(registros: list[str], sessao: str = "anonima",
+                          prefetch: Prefetch | None = None, uso: list | None = None) -> dict[int, list[dict]]:
+    """
+    Usa o Gemini para extrair os comandos de vários registros numa única chamada.
+    A chamada passa pelo agendador (cota RPM/TPM compartilhada entre as sessões).
+    Com `prefetch`, as leituras de cada comando são agendadas durante o streaming.
+    Retorna {posição do registro: [comandos]}; em caso de erro/timeout/fila cheia, {}.
+    """
+
+    mensagem = "\n".join(f"[{n}] \"{registro}\"" for n, registro in enumerate(registros))
+    pedido = {"mensagem": mensagem, "sessao": sessao, "total": len(registros), "prefetch": prefetch, "uso": {}}
+
+    try:
+        # Gemini primeiro; se demorar além do percentil configurado, o Claude entra na corrida
+        comandos, provedor = obter_extrator_llm().extrair(
+            pedido, lambda texto: _interpretar_comandos(texto, len(registros))
+        )
+        consumo = pedido["uso"].get(provedor)
+        if consumo is not None:
+            registrar_uso_tokens(provedor, consumo)
+            if uso is not None:
+                uso.append({"provedor": provedor, **consumo})
+        return comandos
     except Exception as e:
         # print(f"Erro na extração de IA ou timeout: {type(e).__name__} - {e}")
-        intent_data["intencao"] = "outra"
-        
-    # 4. LÓGICA DE FALLBACK AGRESSIVA (REGEX) - Matéria CRUD
+        return {}
+
+
+@METRICAS.medir("llm.gemini")
+def _chamar_gemini(pedido: dict, cancelado) -> str:
+    """Provedor primário; passa pelo agendador (cota RPM/TPM compartilhada)."""
+    # Só a mensagem vai no conteúdo: o SYSTEM_PROMPT está no cache de contexto / system_instruction
+    conteudo = f"MENSAGEM DO USUÁRIO:\n{pedido['mensagem']}"
+    config = config_gemini()
+    client_gemini = obter_cliente_gemini()
+
+    def chamar():
+        # A vaga no agendador pode sair depois de o Claude já ter vencido a corrida
+        if cancelado.is_set():
+            raise RuntimeError("cancelado enquanto aguardava a cota")
+        if not LLM_STREAMING:
+            return client_gemini.models.generate_content(model=MODELO_GEMINI, contents=[conteudo], config=config)
+        uso = {}
+
+        def pedacos():
+            for chunk in client_gemini.models.generate_content_stream(
+                model=MODELO_GEMINI, contents=[conteudo], config=config
+            ):
+                if chunk.usage_metadata is not None:
+                    uso["metadata"] = chunk.usage_metadata
+                yield chunk.text or ""
+
+        texto = _ler_stream(pedacos(), pedido, cancelado)
+        return SimpleNamespace(text=texto, usage_metadata=uso.get("metadata"))
+
+    # Fila cheia / espera longa levantam FilaCheia / TempoEsgotado na hora: o Claude (se
+    # configurado) entra sem esperar o hedge; senão a extração cai no parser local
+    try:
+        response = obter_agendador_llm().executar(
+            pedido["sessao"],
+            chamar,
+            # Tokens em cache também contam na cota TPM do provedor
+            tokens_estimados=_estimar_tokens(SYSTEM_PROMPT + conteudo),
+            # Mensagens com muitos registros (lotes) cedem a vez às interativas
+            prioridade=PRIORIDADE_LOTE if pedido["total"] > 3 else PRIORIDADE_INTERATIVA,
+            espera_max=LLM_ESPERA_MAX,
+            contar_tokens=_tokens_usados,
+        )
+    except Exception as e:
+        if "cache" in str(e).lower():
+            invalidar_contexto_gemini()  # cache expirou/foi removido antes da hora: recria na próxima
+        raise
+    uso = _uso_gemini(response.usage_metadata)
+    if uso is not None:
+        pedido["uso"]["gemini"] = uso
+    return response.text
+
+
+@METRICAS.medir("llm.claude")
+def _chamar_claude(pedido: dict, cancelado) -> str:
+    """Provedor de reserva (hedge). Sem response_schema: a validação fica por conta de _interpretar_comandos."""
+    if cancelado.is_set():
+        raise RuntimeError("cancelado antes de começar")
+    argumentos = dict(
+        model=MODELO_CLAUDE,
+        max_tokens=1024,
+        temperature=0.0,
+        system=SYSTEM_CLAUDE,
+        messages=[{"role": "user", "content": f"MENSAGEM DO USUÁRIO:\n{pedido['mensagem']}"}],
+        timeout=15.0,
+    )
+    if LLM_STREAMING:
+        with obter_cliente_claude().messages.stream(**argumentos) as stream:
+            texto = _ler_stream(stream.text_stream, pedido, cancelado)
+            usage = stream.get_final_message().usage
+    else:
+        response = obter_cliente_claude().messages.create(**argumentos)
+        texto = "".join(bloco.text for bloco in response.content if getattr(bloco, "type", "") == "text")
+        usage = response.usage
+    uso = _uso_claude(usage)
+    if uso is not None:
+        pedido["uso"]["claude"] = uso
+    return texto
+
+
+def _ler_stream(pedacos, pedido: dict, cancelado) -> str:
+    """
+    Consome o stream com o parser incremental e devolve o texto completo.
+    Cada comando cuja 'intencao' (ou parâmetro) fecha já agenda suas leituras no prefetch;
+    se o hedge já tiver escolhido outro provedor (`cancelado`), para de ler.
+    """
+    leitor = LeitorComandos()
+    prefetch = pedido.get("prefetch")
+    metricas = obter_metricas_streaming()
+    inicio = time.perf_counter()
+    primeira_acao = None
+    for pedaco in pedacos:
+        if cancelado.is_set():
+            raise RuntimeError("cancelado durante o streaming")
+        for evento, _indice, comando in leitor.alimentar(pedaco):
+            # Um 'parametro' pode fechar antes da 'intencao' (a ordem das chaves é do modelo)
+            if evento == "comando" or prefetch is None or not comando.get("intencao"):
+                continue
+            for chave, fn, *args in palpites_para(comando["intencao"], comando.get("parametros") or {}):
+                prefetch.agendar(chave, fn, *args)
+                if primeira_acao is None:
+                    primeira_acao = (time.perf_counter() - inicio) * 1000
+                    metricas["primeira_acao"].registrar(primeira_acao)
+    metricas["resposta_completa"].registrar((time.perf_counter() - inicio) * 1000)
+    return "".join(leitor.texto)
+
+
+def _interpretar_comandos(texto: str, total_registros: int) -> dict[int, list[dict]]:
+    """
+    Converte o JSON da IA em {registro: [comandos]}, corrigindo tipos.
+    Levanta ValueError se a resposta não seguir o esquema (usado para descartar a resposta no hedge).
+    """
+    json_text = texto.strip()
+    if json_text.startswith("```json"):
+        json_text = json_text[7:]
+    if json_text.endswith("```"):
+        json_text = json_text[:-3]
     
-    if intent_data.get("intencao") == "outra" or "materia" in clean_prompt or "disciplina" in clean_prompt:
-        
-        if "cadastrar" in clean_prompt or "crie" in clean_prompt:
-              intent_data["intencao"] = "cadastrar_materia"
-        
-        
-        if intent_data.get("intencao") in ["atualizar_materia", "cadastrar_materia"]:
-              
-              # NOME DA MATÉRIA 
-              nome_match = re.search(r'(?:matéria|disciplina)\s*([\'"]?)\s*(.+?)\s*([\'"]?)\s*(?:e\s*vincule|com\s*o\s*professor|ou|$)', clean_prompt)
-
-              if nome_match:
-                  nome = nome_match.group(2).strip().replace("'", "").replace('"', '')
-                  if nome and not re.match(r'id\s*\d+', nome, re.IGNORECASE) and not nome.isdigit():
-                      intent_data["parametros"]["nome"] = nome.strip()
-              
-              # PROFESSOR 
-              prof_match = re.search(r'professor\s*([\'"].+?[\'"]|[\w\s]+?)\s*(?:e\s*|\s*carga|ou|$)', clean_prompt)
-              if prof_match:
-                  prof = prof_match.group(1).strip().replace("'", "").replace('"', '')
-                  if prof and len(prof.split()) >= 1 and len(prof) > 2: 
-                      intent_data["parametros"]["professor"] = prof.strip()
-
-              # CARGA HORÁRIA 
-              ch_match = re.search(r'(\d+)\s*(?:hora|h)', clean_prompt)
-              if ch_match:
-                  intent_data["parametros"]["carga_horaria"] = int(ch_match.group(1))
+    dados = json.loads(json_text.strip())
+    comandos = dados.get("comandos") if isinstance(dados, dict) else None
+    if not isinstance(comandos, list) or not all(
+        isinstance(c, dict) and isinstance(c.get("intencao"), str) for c in comandos
+    ):
+        raise ValueError("Resposta fora do esquema {'comandos': [{'intencao': ...}]}")
 
+    por_registro: dict[int, list[dict]] = {}
+    for comando in comandos:
+        if not isinstance(comando, dict):
+            continue
+        registro = comando.pop("registro", 0)
+        try:
+            registro = int(registro)
+        except (TypeError, ValueError):
+            registro = 0
+        if not 0 <= registro < total_registros:
+            registro = 0
+        comando.setdefault("parametros", {})
         
-        # ID (SÓ DEPOIS DOS DEMAIS PARÂMETROS)
-        id_match = re.search(r'(?:id\s*|#\s*)(\d+)|(?:\s|^)(\d+)(?:\s|$)', clean_prompt)
-        if id_match:
-            # Pega o ID da primeira ou segunda captura do regex
-            id_val = int(id_match.group(1) or id_match.group(2)) 
-            if id_val:
-                intent_data["parametros"]["id"] = id_val
-                
-                if "atualizar" in clean_prompt and "materia" in clean_prompt:
-                    intent_data["intencao"] = "atualizar_materia"
-                elif "excluir" in clean_prompt and "materia" in clean_prompt:
-                    intent_data["intencao"] = "excluir_materia"
-                elif "excluir" in clean_prompt and "professor" in clean_prompt:
-                    intent_data["intencao"] = "excluir_professor"
-                elif ("apagar" in clean_prompt or "deletar" in clean_prompt or "excluir" in clean_prompt) and "reserva" in clean_prompt:
-                    intent_data["intencao"] = "excluir_reserva"
-
-    # 5. FALLBACK ESPECÍFICO PARA CADASTRO DE PROFESSOR
-    if "professor" in clean_prompt and "cadastr" in clean_prompt:
-        
-        intent_data["intencao"] = "cadastrar_professor"
-        
-        # Nome
-        nome_match = re.search(r'(?:professor\s*)([^,]+?)(?:,|$|\scom)', clean_prompt)
-        if nome_match:
-            intent_data["parametros"]["nome"] = nome_match.group(1).strip()
-            
-        # Email
-        email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', clean_prompt)
-        if email_match:
-            intent_data["parametros"]["email"] = email_match.group(1).strip()
-            
-        # Departamento
-        depto_match = re.search(r'(?:departamento\s*de|depto\s*de)\s*([^,.\s]+)', clean_prompt)
-        if depto_match:
-            intent_data["parametros"]["departamento"] = depto_match.group(1).strip()
-            
-            
-    # 6. FALLBACK ESPECÍFICO PARA RESERVAS (ULTRA-SIMPLIFICAÇÃO)
-    if intent_data.get("intencao") == "reservar_laboratorio" or "reservar" in clean_prompt:
-        
-        intent_data["intencao"] = "reservar_laboratorio"
-        
-        # 6a. Extrair NOME DA MATÉRIA (Simplificação extrema)
-        # Tenta pegar a palavra após 'matéria' e ANTES de um delimitador de tempo/data
-        nome_materia_match = re.search(r"matéria\s*['\"]?\s*([^,]+?)(?=\s+no\s+dia|\s+em|\s+das|\s*$)", clean_prompt)
-        
-        if nome_materia_match:
-            nome = nome_materia_match.group(1).strip().strip('\'"').strip()
-            # Se o nome capturado for apenas uma data, hora, ou palavra-chave (ex: 'dia'), ignora.
-            if nome and not re.match(r'(\d+/\d+)|(\d+:\d+)|dia|das|em', nome, re.IGNORECASE):
-                intent_data["parametros"]["materia_nome"] = nome
-                
-        # 6b. Extrair DATA (Captura DD/MM ou DD/MM/AAAA)
-        data_match = re.search(r'(?:dia|em)\s*(\d{1,2}/\d{1,2}(?:/\d{4})?)', clean_prompt)
-        if data_match:
-            intent_data["parametros"]["data"] = data_match.group(1).strip()
-            
-        # 6c. Extrair HORA INÍCIO e FIM (Captura HH:MM)
-        horas_match = re.search(r'das\s*(\d{1,2}:\d{2})\s*às\s*(\d{1,2}:\d{2})', clean_prompt)
-        if horas_match:
-            intent_data["parametros"]["hora_inicio"] = horas_match.group(1).strip()
-            intent_data["parametros"]["hora_fim"] = horas_match.group(2).strip()
+        # CORREÇÃO DE TIPOS
+        for key in ["carga_horaria", "id"]:
+              if comando["parametros"].get(key) is not None:
+                try: comando["parametros"][key] = int(comando["parametros"][key])
+                except: comando["parametros"].pop(key) 
 
-    return intent_data
+        por_registro.setdefault(registro, []).append(comando)
+    return por_registro
 
 
 # ==============================================================================
 # 3. FUNÇÕES AUXILIARES E DE ORQUESTRAÇÃO
 # ==============================================================================
 
+def _carregador_lista(endpoint: str):
+    """
+    Carregador do índice: GET condicional na lista do endpoint (o cliente envia If-None-Match).
+    A ETag depende da versão da tabela, então se a 1ª página não mudou, nenhuma mudou.
+    """
+    def carregar(etag: str | None):
+        response = api_client.get(endpoint, params={'page_size': 100})
+        response.raise_for_status()
+        novo_etag = response.headers.get("ETag")
+        if response.revalidado:
+            return None, etag
+        itens, proxima = _pagina(response.json())
+        while proxima:
+            response = api_client.get(proxima)
+            response.raise_for_status()
+            mais, proxima = _pagina(response.json())
+            itens.extend(mais)
+        return itens, novo_etag
+    return carregar
+
+# Nome ausente no índice local: melhor candidato da busca indexada do servidor. Só o nome
+# igual vira ID; um candidato apenas parecido fica no índice e aparece como sugestão
+BUSCA_NOME_SIMILARIDADE_MIN = 0.5
+
+def _buscador_nome(endpoint: str):
+    """GET <endpoint>buscar/?q=: nome normalizado no servidor (acentos, maiúsculas, prefixo, trigramas)."""
+    def buscar(nome: str) -> dict | None:
+        response = api_client.get(
+            f"{endpoint}buscar/", condicional=False,
+            params={'q': nome, 'k': 1, 'min_similaridade': BUSCA_NOME_SIMILARIDADE_MIN},
+        )
+        response.raise_for_status()
+        resultados = response.json().get("results") or []
+        return resultados[0] if resultados else None
+    return buscar
+
+@st.cache_resource
+def obter_indices() -> dict[str, IndiceNomes]:
+    """Índices nome -> ID compartilhados entre todas as sessões do processo."""
+    return {
+        "professores": IndiceNomes(_carregador_lista("professores/"), buscar_remoto=_buscador_nome("professores/")),
+        "materias": IndiceNomes(_carregador_lista("materias/"), buscar_remoto=_buscador_nome("materias/")),
+    }
+
+@METRICAS.medir("buscar_professor_id")
 def buscar_professor_id(nome_professor: str) -> (int | None):
     """
-    Busca o ID de um professor pelo nome. 
-    CORRIGIDO: Usa 'params' para garantir o URL Encoding do nome, mas o ponto de falha 
-    AGORA é na sua API Django, que precisa de um filtro exato no ViewSet.
+    Busca o ID de um professor pelo nome no índice local.
+    Ignora acentos, maiúsculas, aspas e pontuação final ('Leandro.' == 'leandro'), mas
+    não aceita um nome só parecido: o ID vai para uma escrita (ver `sugestao_nome`).
     """
-    try:
-        url = f"{API_BASE_URL}professores/" 
-        
-        # O requests se encarrega de formatar a URL (ex: "João Silva" -> "Jo%C3%A3o%20Silva")
-        # Se a sua API Django estiver configurada para filtrar por 'nome' (via django-filter com 'exact'), isso funciona.
-        response = requests.get(url, params={'nome': nome_professor}) 
-        
-        if response.status_code == 200 and response.json():
-            # CORREÇÃO: Verifica se a lista retornada tem o professor exato (melhor prática)
-            # No entanto, se o filtro na API estiver errado, isso continuará pegando o 1º de TODOS.
-            # Assumimos que o primeiro resultado é o correto APÓS a correção no Django ViewSet.
-            return response.json()[0]['id']
-        return None
-    except requests.exceptions.RequestException:
-        return None
+    return obter_indices()["professores"].buscar(nome_professor)
 
+@METRICAS.medir("buscar_materia_id")
 def buscar_materia_id(nome_materia: str) -> (int | None):
     """
-    Busca o ID de uma matéria pelo nome.
-    CORRIGIDO: Usa 'params' para garantir o URL Encoding do nome.
+    Busca o ID de uma matéria pelo nome no índice local (mesma normalização do professor).
     """
-    try:
-        # Busca flexível
-        url = f"{API_BASE_URL}materias/"
-        # O requests se encarrega de formatar a URL
-        response = requests.get(url, params={'nome': nome_materia})
-        if response.status_code == 200 and response.json():
-            # Retorna o ID da primeira matéria encontrada
-            return response.json()[0]['id']
-        return None
-    except requests.exceptions.RequestException:
-        return None
+    return obter_indices()["materias"].buscar(nome_materia)
+
+def sugestao_nome(indice: str, nome: str) -> str:
+    """Nome parecido (se houver) como pergunta ao usuário, em vez de vínculo automático."""
+    sugestao = obter_indices()[indice].sugerir(nome)
+    return f" Você quis dizer **{sugestao}**? Repita o comando com o nome exato." if sugestao else ""
+
+
+@st.cache_resource
+def obter_executor() -> ThreadPoolExecutor:
+    """Pool de threads do processo para as pré-buscas (compartilhado entre sessões)."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="prefetch")
+
+@METRICAS.medir("prefetch")
+def obter_prefetch(prefetch: Prefetch | None, chave: tuple, fn, *args):
+    """Usa o resultado pré-buscado quando houver; senão chama `fn` diretamente."""
+    if prefetch is None:
+        return fn(*args)
+    return prefetch.obter(chave, fn, *args)
+
+def palpites_prefetch(mensagem_usuario: str) -> list:
+    """
+    Sinais baratos do parser local para adivinhar as leituras necessárias
+    antes de a intenção final ser conhecida.
+    """
+    palpites = []
+    for registro in dividir_registros(mensagem_usuario):
+        local = parser_local.analisar(registro)
+        palpites += palpites_para(local.intencao, local.parametros)
+    return palpites
+
+
+def palpites_para(intenção: str, params: dict) -> list:
+    """Leituras de que um comando (intenção + parâmetros, mesmo parciais) vai precisar."""
+    palpites = []
+    if intenção == "listar_materias":
+        palpites.append((("listar_materias",), listar_materias))
+    elif intenção == "listar_professores":
+        palpites.append((("listar_professores",), listar_professores))
+    elif intenção == "listar_reservas":
+        palpites.append((("listar_reservas",), listar_reservas))
+    if params.get("professor"):
+        palpites.append((("professor", params["professor"]), buscar_professor_id, params["professor"]))
+    if params.get("materia_nome"):
+        palpites.append((("materia", params["materia_nome"]), buscar_materia_id, params["materia_nome"]))
+    return palpites
 
 
 # ==============================================================================
 # 4. FUNÇÕES DE CRUD NA API DJANGO (usando requests)
 # ==============================================================================
 
-def listar_reservas() -> (str, int):
-    """Realiza um GET na API e retorna a lista de reservas formatada."""
+AVISO_MAIS = "\n➡️ Há mais resultados: digite **mostrar mais** para ver a próxima página."
+
+def _pagina(dados) -> tuple[list, str | None]:
+    """Itens e link da próxima página (aceita resposta paginada por cursor ou lista simples)."""
+    if isinstance(dados, dict):
+        return list(dados.get("results", [])), dados.get("next")
+    return list(dados), None
+
+@METRICAS.medir("crud.listar_reservas")
+def listar_reservas(url: str | None = None) -> (str, int, str | None):
+    """
+    Realiza um GET na API e retorna uma página da lista de reservas formatada,
+    junto com o link da próxima página (ou None).
+    """
     try:
-        response = requests.get(f"{API_BASE_URL}reservas/")
+        # ?expand= traz os nomes da matéria e do professor na mesma resposta (sem GET por linha)
+        # O link da próxima página já carrega o cursor e os mesmos parâmetros
+        if url:
+            response = api_client.get(url)
+        else:
+            response = api_client.get("reservas/", params={'expand': 'materia,professor'})
         response.raise_for_status()
-        reservas = response.json()
+        reservas, proxima = _pagina(response.json())
         
         if not reservas:
-            return "Não há reservas de laboratório cadastradas no momento.", 200
+            return "Não há reservas de laboratório cadastradas no momento.", 200, None
 
         lista = "\n"
         for r in reservas:
-            # Assumindo que a API retorna o ID da matéria e não o nome
-            materia_id = r.get('materia') 
+            # Usa o nome expandido; se a API não suportar ?expand=, mostra o ID
+            if r.get('materia_nome'):
+                materia_info = f"Matéria: {r['materia_nome']}"
+            else:
+                materia_info = f"Matéria ID: {r.get('materia')}"
+            if r.get('professor_nome'):
+                materia_info += f" (Prof. {r['professor_nome']})"
             data = r.get('data')
             h_in = r.get('hora_inicio')[:5] # Pega HH:MM
             h_fim = r.get('hora_fim')[:5] # Pega HH:MM
             
-            lista += f"ID: {r['id']} | Matéria ID: {materia_id} | Data: {data} | Horário: {h_in} - {h_fim}\n"
+            lista += f"ID: {r['id']} | {materia_info} | Data: {data} | Horário: {h_in} - {h_fim}\n"
         
-        return "📅 Reservas de Laboratório cadastradas:\n" + lista, 200
+        if proxima:
+            lista += AVISO_MAIS
+        titulo = "📅 Reservas de Laboratório (continuação):\n" if url else "📅 Reservas de Laboratório cadastradas:\n"
+        return titulo + lista, 200, proxima
     except requests.exceptions.ConnectionError:
-        return "Erro: A API Django está offline. Inicie o servidor.", 500
+        return "Erro: A API Django está offline. Inicie o servidor.", 500, None
     except requests.exceptions.RequestException as e:
-        return f"❌ Erro ao listar reservas: {e}", response.status_code if 'response' in locals() else 500
+        return f"❌ Erro ao listar reservas: {e}", response.status_code if 'response' in locals() else 500, None
 
 
+@METRICAS.medir("crud.excluir_reserva")
 def excluir_reserva(params: dict) -> (str, int):
     """Realiza um DELETE na API para excluir uma reserva pelo ID."""
     reserva_id = params.get('id')
@@ -345,8 +790,7 @@ def excluir_reserva(params: dict) -> (str, int):
     try:
         # Converte para int 
         reserva_id = int(reserva_id) 
-        url = f"{API_BASE_URL}reservas/{reserva_id}/"
-        response = requests.delete(url)
+        response = api_client.delete(f"reservas/{reserva_id}/")
         
         if response.status_code == 204: # 204 No Content é o sucesso do DELETE
             return f"🗑️ Reserva ID {reserva_id} excluída com sucesso!", 204
@@ -367,47 +811,57 @@ def excluir_reserva(params: dict) -> (str, int):
         return f"❌ Erro ao excluir reserva (Status {status_code}): {erro_msg}", status_code
 
 
-def listar_materias() -> (str, int):
-    """Realiza um GET na API e retorna a lista formatada."""
+@METRICAS.medir("crud.listar_materias")
+def listar_materias(url: str | None = None) -> (str, int, str | None):
+    """Realiza um GET na API e retorna uma página da lista formatada e o link da próxima."""
     try:
-        response = requests.get(f"{API_BASE_URL}materias/")
+        if url:
+            response = api_client.get(url)
+        else:
+            response = api_client.get("materias/", params={'expand': 'professor'})
         response.raise_for_status()
-        materias = response.json()
+        materias, proxima = _pagina(response.json())
         
         if not materias:
-            return "Não há matérias cadastradas no momento.", 200
+            return "Não há matérias cadastradas no momento.", 200, None
 
         lista = "\n"
         for m in materias:
             carga = m.get('carga_horaria')
             carga_str = f"{carga}h" if carga is not None else "N/D"
             prof_id = m.get('professor') 
-            prof_info = f"Prof ID: {prof_id}" if prof_id is not None else "Professor: N/A"
+            if m.get('professor_nome'):
+                prof_info = f"Professor: {m['professor_nome']}"
+            else:
+                prof_info = f"Prof ID: {prof_id}" if prof_id is not None else "Professor: N/A"
             lista += f"ID: {m['id']} | Matéria: {m['nome']} | {prof_info} | Carga: {carga_str}\n"
         
-        return "Matérias cadastradas:\n" + lista, 200
+        if proxima:
+            lista += AVISO_MAIS
+        titulo = "Matérias cadastradas (continuação):\n" if url else "Matérias cadastradas:\n"
+        return titulo + lista, 200, proxima
     except requests.exceptions.ConnectionError:
-        return "Erro: A API Django está offline. Inicie o servidor.", 500
+        return "Erro: A API Django está offline. Inicie o servidor.", 500, None
     except requests.exceptions.RequestException as e:
-        return f"Erro ao listar matérias: {e}", response.status_code if 'response' in locals() else 500
+        return f"Erro ao listar matérias: {e}", response.status_code if 'response' in locals() else 500, None
     
 
-def cadastrar_materia(params: dict) -> (str, int):
-    """Realiza um POST para criar uma nova matéria, orquestrando o Professor."""
+def montar_payload_materia(params: dict, prefetch: Prefetch | None = None) -> (dict | None, tuple | None):
+    """Valida os parâmetros e resolve o Professor. Retorna (payload, None) ou (None, (erro, status))."""
     nome_materia = params.get('nome')
     nome_professor = params.get('professor')
     carga_horaria_valor = params.get('carga_horaria')
     
     if not nome_materia:
-        return "Erro: O nome da matéria é obrigatório para o cadastro.", 400
+        return None, ("Erro: O nome da matéria é obrigatório para o cadastro.", 400)
     
     professor_id = None
     if nome_professor:
         # Tenta buscar o professor existente usando a função CORRIGIDA
-        professor_id = buscar_professor_id(nome_professor)
+        professor_id = obter_prefetch(prefetch, ("professor", nome_professor), buscar_professor_id, nome_professor)
         
         if professor_id is None:
-            return f"❌ Professor '{nome_professor}' não encontrado no sistema. Por favor, cadastre o professor primeiro (Ex: Cadastre o professor {nome_professor}, email: x, depto: y).", 404
+            return None, (f"❌ Professor '{nome_professor}' não encontrado no sistema.{sugestao_nome('professores', nome_professor)} Se for um professor novo, cadastre-o primeiro (Ex: Cadastre o professor {nome_professor}, email: x, depto: y).", 404)
 
     payload = {
         'nome': nome_materia,
@@ -415,12 +869,22 @@ def cadastrar_materia(params: dict) -> (str, int):
         'professor': professor_id  # Usa o ID
     }
     # Remove valores None
-    payload = {k: v for k, v in payload.items() if v is not None}
+    return {k: v for k, v in payload.items() if v is not None}, None
+
+@METRICAS.medir("crud.cadastrar_materia")
+def cadastrar_materia(params: dict, prefetch: Prefetch | None = None) -> (str, int):
+    """Realiza um POST para criar uma nova matéria, orquestrando o Professor."""
+    payload, erro = montar_payload_materia(params, prefetch)
+    if erro:
+        return erro
+    nome_materia = payload['nome']
     
     try:
-        response = requests.post(f"{API_BASE_URL}materias/", json=payload)
+        response = api_client.post("materias/", json=payload)
         response.raise_for_status()
-        return f"✅ Matéria '{nome_materia}' cadastrada e vinculada com sucesso! (ID: {response.json().get('id')})", 201
+        nova_id = response.json().get('id')
+        obter_indices()["materias"].adicionar(nova_id, nome_materia)
+        return f"✅ Matéria '{nome_materia}' cadastrada e vinculada com sucesso! (ID: {nova_id})", 201
     except requests.exceptions.RequestException as e:
         status_code = response.status_code if 'response' in locals() else 500
         try:
@@ -429,6 +893,7 @@ def cadastrar_materia(params: dict) -> (str, int):
              erro_msg = response.text
         return f"❌ Erro ao cadastrar matéria (Status {status_code}): {erro_msg}", status_code
     
+@METRICAS.medir("crud.atualizar_materia")
 def atualizar_materia(params: dict) -> (str, int):
     """(STUB) Lógica para atualizar uma matéria pelo ID."""
     materia_id = params.get('id')
@@ -437,6 +902,7 @@ def atualizar_materia(params: dict) -> (str, int):
     
     return f"⚠️ **Atualizar Matéria (ID {materia_id})** - Intenção detectada, mas a função de atualização (PUT/PATCH) ainda não foi implementada. Parâmetros: {params}", 400
     
+@METRICAS.medir("crud.excluir_materia")
 def excluir_materia(params: dict) -> (str, int):
     """(STUB) Lógica para excluir uma matéria pelo ID."""
     materia_id = params.get('id')
@@ -446,41 +912,55 @@ def excluir_materia(params: dict) -> (str, int):
     return f"⚠️ **Excluir Matéria (ID {materia_id})** - Intenção detectada, mas a função de exclusão (DELETE) ainda não foi implementada.", 400
 
 
-def listar_professores() -> (str, int):
-    """Realiza um GET na API e retorna a lista de professores formatada."""
+@METRICAS.medir("crud.listar_professores")
+def listar_professores(url: str | None = None) -> (str, int, str | None):
+    """Realiza um GET na API e retorna uma página da lista de professores e o link da próxima."""
     try:
-        response = requests.get(f"{API_BASE_URL}professores/")
+        response = api_client.get(url or "professores/")
         response.raise_for_status()
-        professores = response.json()
+        professores, proxima = _pagina(response.json())
         
         if not professores:
-            return "Não há professores cadastrados no momento.", 200
+            return "Não há professores cadastrados no momento.", 200, None
 
         lista = "\n"
         for p in professores:
             lista += f"ID: {p['id']} | Professor: {p['nome']} | E-mail: {p['email']} | Depto: {p['departamento']}\n"
         
-        return "Professores cadastrados:\n" + lista, 200
+        if proxima:
+            lista += AVISO_MAIS
+        titulo = "Professores cadastrados (continuação):\n" if url else "Professores cadastrados:\n"
+        return titulo + lista, 200, proxima
     except requests.exceptions.ConnectionError:
-        return "Erro: A API Django está offline. Inicie o servidor.", 500
+        return "Erro: A API Django está offline. Inicie o servidor.", 500, None
     except requests.exceptions.RequestException as e:
-        return f"Erro ao listar professores: {e}", response.status_code if 'response' in locals() else 500
+        return f"Erro ao listar professores: {e}", response.status_code if 'response' in locals() else 500, None
 
-def cadastrar_professor(params: dict) -> (str, int):
-    """Realiza um POST na API para criar um novo professor."""
+def montar_payload_professor(params: dict, prefetch: Prefetch | None = None) -> (dict | None, tuple | None):
+    """Valida os parâmetros do professor. Retorna (payload, None) ou (None, (erro, status))."""
     nome = params.get('nome')
     email = params.get('email')
     departamento = params.get('departamento')
 
     if not nome or not email or not departamento:
-        return "Erro: Faltam dados essenciais (nome, email e departamento) para cadastrar o professor. Tente reformular a frase.", 400
+        return None, ("Erro: Faltam dados essenciais (nome, email e departamento) para cadastrar o professor. Tente reformular a frase.", 400)
     
-    payload = {'nome': nome, 'email': email, 'departamento': departamento}
+    return {'nome': nome, 'email': email, 'departamento': departamento}, None
+
+@METRICAS.medir("crud.cadastrar_professor")
+def cadastrar_professor(params: dict) -> (str, int):
+    """Realiza um POST na API para criar um novo professor."""
+    payload, erro = montar_payload_professor(params)
+    if erro:
+        return erro
+    nome, departamento = payload['nome'], payload['departamento']
     
     try:
-        response = requests.post(f"{API_BASE_URL}professores/", json=payload)
+        response = api_client.post("professores/", json=payload)
         response.raise_for_status()
-        return f"🧑‍🏫 Professor '{nome}' do departamento '{departamento}' cadastrado com sucesso! (ID: {response.json().get('id')})", 201
+        nova_id = response.json().get('id')
+        obter_indices()["professores"].adicionar(nova_id, nome)
+        return f"🧑‍🏫 Professor '{nome}' do departamento '{departamento}' cadastrado com sucesso! (ID: {nova_id})", 201
     except requests.exceptions.RequestException as e:
         status_code = response.status_code if 'response' in locals() else 500
         try:
@@ -489,6 +969,7 @@ def cadastrar_professor(params: dict) -> (str, int):
              erro_msg = response.text
         return f"❌ Erro ao cadastrar professor (Status {status_code}): {erro_msg}", status_code
 
+@METRICAS.medir("crud.excluir_professor")
 def excluir_professor(params: dict) -> (str, int):
     """(STUB) Lógica para excluir um professor pelo ID."""
     professor_id = params.get('id')
@@ -497,38 +978,43 @@ def excluir_professor(params: dict) -> (str, int):
           
     return f"⚠️ **Excluir Professor (ID {professor_id})** - Intenção detectada, mas a função de exclusão (DELETE) ainda não foi implementada.", 400
 
-def reservar_laboratorio(params: dict) -> (str, int):
-    """Realiza um POST na API para criar uma nova reserva."""
+def formatar_conflito_reserva(detalhe: dict) -> str:
+    """Mensagem amigável a partir do erro estruturado 'conflito_reserva' da API."""
+    linhas = [f"⛔ {detalhe.get('mensagem', 'Conflito de horário com outra reserva.')}"]
+    for c in detalhe.get('conflitos', []):
+        linhas.append(f"- Reserva ID {c['id']} (Matéria ID {c['materia']}): {c['data']} das {c['hora_inicio']} às {c['hora_fim']}")
+    return "\n".join(linhas)
+
+def converter_data(data_str: str):
+    """'DD/MM' (ano atual) ou 'DD/MM/AAAA' -> date; None se o formato for inválido."""
+    for fmt in ("%d/%m/%Y", "%d/%m"):
+        try:
+            dt_obj = datetime.strptime(data_str, fmt)
+        except ValueError:
+            continue
+        if fmt == "%d/%m":
+            dt_obj = dt_obj.replace(year=datetime.now().year)
+        return dt_obj.date()
+    return None
+
+def montar_payload_reserva(params: dict, prefetch: Prefetch | None = None) -> (dict | None, tuple | None):
+    """Resolve a Matéria e valida data/hora. Retorna (payload, None) ou (None, (erro, status))."""
     nome_materia = params.get('materia_nome')
     data_str = params.get('data')
-    hora_inicio_str = params.get('hora_inicio', '10:00') # Default
-    hora_fim_str = params.get('hora_fim', '12:00') # Default
+    hora_inicio_str = params.get('hora_inicio') or '10:00' # Default
+    hora_fim_str = params.get('hora_fim') or '12:00' # Default
 
     if not nome_materia or not data_str:
-        return "Erro: Faltam dados (nome da matéria e data) para a reserva.", 400
+        return None, ("Erro: Faltam dados (nome da matéria e data) para a reserva.", 400)
     
     # 1. ORQUESTRAÇÃO: Buscar ID da Matéria 
-    materia_id = buscar_materia_id(nome_materia)
+    materia_id = obter_prefetch(prefetch, ("materia", nome_materia), buscar_materia_id, nome_materia)
     if materia_id is None:
-        return f"Matéria '{nome_materia}' não encontrada. Verifique o nome e tente novamente.", 404
+        return None, (f"Matéria '{nome_materia}' não encontrada.{sugestao_nome('materias', nome_materia)} Verifique o nome e tente novamente.", 404)
         
     # 2. Processamento da Data e Hora
     try:
-        # A data pode vir como DD/MM ou DD/MM/AAAA
-        formatos_data = ["%d/%m/%Y", "%d/%m"]
-        data_reserva = None
-        
-        for fmt in formatos_data:
-            try:
-                dt_obj = datetime.strptime(data_str, fmt)
-                # Se o formato for DD/MM, assume o ano atual
-                if fmt == "%d/%m":
-                    dt_obj = dt_obj.replace(year=datetime.now().year)
-                data_reserva = dt_obj.date()
-                break
-            except ValueError:
-                continue
-
+        data_reserva = converter_data(data_str)
         if data_reserva is None:
             raise ValueError("Formato de data inválido.")
 
@@ -537,21 +1023,34 @@ def reservar_laboratorio(params: dict) -> (str, int):
         
         # Simples validação de lógica
         if datetime.combine(data_reserva, hora_inicio) >= datetime.combine(data_reserva, hora_fim):
-            return "Erro: A hora de início deve ser anterior à hora de fim.", 400
+            return None, ("Erro: A hora de início deve ser anterior à hora de fim.", 400)
             
     except ValueError as e:
-        return f"Erro na formatação de data/hora. Use DD/MM ou DD/MM/AAAA e HH:MM. Erro: {e}", 400
+        return None, (f"Erro na formatação de data/hora. Use DD/MM ou DD/MM/AAAA e HH:MM. Erro: {e}", 400)
 
-    payload = {
+    return {
         'materia': materia_id,
         'data': data_reserva.isoformat(),
         'hora_inicio': hora_inicio.isoformat(),
         'hora_fim': hora_fim.isoformat(),
         'confirmada': True 
-    }
+    }, None
+
+@METRICAS.medir("crud.reservar_laboratorio")
+def reservar_laboratorio(params: dict, prefetch: Prefetch | None = None) -> (str, int):
+    """Realiza um POST na API para criar uma nova reserva."""
+    payload, erro = montar_payload_reserva(params, prefetch)
+    if erro:
+        return erro
+    nome_materia = params.get('materia_nome')
+    data_str = params.get('data')
+    hora_inicio_str = payload['hora_inicio'][:5]
+    hora_fim_str = payload['hora_fim'][:5]
     
     try:
-        response = requests.post(f"{API_BASE_URL}reservas/", json=payload)
+        response = api_client.post("reservas/", json=payload)
+        if response.status_code == 409:
+            return formatar_conflito_reserva(response.json()), 409
         response.raise_for_status()
         return f"📅 Reserva do laboratório para '{nome_materia}' em {data_str} das {hora_inicio_str} às {hora_fim_str} **CRIADA com sucesso!** (ID: {response.json().get('id')})", 201
     except requests.exceptions.RequestException as e:
@@ -564,76 +1063,403 @@ def reservar_laboratorio(params: dict) -> (str, int):
         return f"❌ Erro ao criar reserva (Status {status_code}): {erro_msg}", status_code
 
 
+# Intenções de cadastro que aceitam lote: endpoint e montador do payload de cada item
+CADASTROS_EM_LOTE = {
+    "cadastrar_professor": ("professores/", montar_payload_professor, "professor(es)"),
+    "cadastrar_materia": ("materias/", montar_payload_materia, "matéria(s)"),
+    "reservar_laboratorio": ("reservas/", montar_payload_reserva, "reserva(s)"),
+}
+
+@METRICAS.medir("crud.cadastrar_em_lote")
+def cadastrar_em_lote(intenção: str, lista_params: list[dict], prefetch: Prefetch | None = None) -> (str, int):
+    """
+    Monta todos os payloads e envia UM único POST para /<recurso>/lote/.
+    Se algum item for inválido, nada é enviado (o servidor também grava tudo ou nada).
+    """
+    endpoint, montar, rotulo = CADASTROS_EM_LOTE[intenção]
+    payloads, erros = [], []
+    for i, params in enumerate(lista_params, start=1):
+        payload, erro = montar(params, prefetch)
+        if erro:
+            erros.append(f"- Linha {i}: {erro[0]}")
+        else:
+            payloads.append(payload)
+    if erros:
+        return "❌ Lote não enviado. Corrija as linhas abaixo e tente de novo:\n" + "\n".join(erros), 400
+
+    try:
+        response = api_client.post(f"{endpoint}lote/", json=payloads)
+        if response.status_code == 409:
+            return formatar_conflito_reserva(response.json()), 409
+        response.raise_for_status()
+        criados = response.json()
+        if intenção == "cadastrar_professor":
+            for item in criados:
+                obter_indices()["professores"].adicionar(item['id'], item['nome'])
+        elif intenção == "cadastrar_materia":
+            for item in criados:
+                obter_indices()["materias"].adicionar(item['id'], item['nome'])
+        ids = ", ".join(str(item.get('id')) for item in criados)
+        return f"✅ {len(criados)} {rotulo} cadastrado(s) em lote com sucesso! (IDs: {ids})", 201
+    except requests.exceptions.ConnectionError:
+        return "Erro: A API Django está offline. Inicie o servidor.", 500
+    except requests.exceptions.RequestException as e:
+        status_code = response.status_code if 'response' in locals() else 500
+        try:
+            erro_msg = response.json() if 'response' in locals() and response.content else str(e)
+        except:
+             erro_msg = response.text
+        return f"❌ Erro ao cadastrar lote (Status {status_code}): {erro_msg}", status_code
+
+
+# --- Consultas agregadas (GET /api/agregacoes/...: a soma é feita no banco) ---
+
+def periodo_consulta(params: dict) -> tuple | None:
+    """(início, fim) a partir de 'data' (DD/MM) ou 'periodo'; sem nenhum, a semana atual. None se a data for inválida."""
+    hoje = datetime.now().date()
+    if params.get('data'):
+        dia = converter_data(str(params['data']))
+        return (dia, dia) if dia else None
+    periodo = params.get('periodo') or 'semana'
+    if periodo == 'hoje':
+        return hoje, hoje
+    if periodo == 'amanha':
+        return hoje + timedelta(days=1), hoje + timedelta(days=1)
+    if periodo == 'mes':
+        proximo_mes = (hoje.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return hoje.replace(day=1), proximo_mes - timedelta(days=1)
+    segunda = hoje - timedelta(days=hoje.weekday())
+    if periodo == 'proxima_semana':
+        segunda += timedelta(days=7)
+    return segunda, segunda + timedelta(days=6)
+
+def _horas(minutos: int) -> str:
+    return f"{minutos // 60}h{minutos % 60:02d}"
+
+def _erro_consulta(e: Exception, response) -> (str, int):
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return "Erro: A API Django está offline. Inicie o servidor.", 500
+    return f"❌ Erro na consulta: {e}", response.status_code if response is not None else 500
+
+@METRICAS.medir("crud.carga_professor")
+def consultar_carga_professor(params: dict) -> (str, int):
+    """Carga horária total (soma das matérias) por professor, ou de um professor."""
+    professor = params.get('professor')
+    response = None
+    try:
+        response = api_client.get("agregacoes/carga-professores/", params={'professor': professor} if professor else None)
+        response.raise_for_status()
+        linhas = response.json().get("results", [])
+    except requests.exceptions.RequestException as e:
+        return _erro_consulta(e, response)
+
+    if not linhas:
+        if professor:
+            return f"Nenhuma matéria encontrada para o professor '{professor}'.", 404
+        return "Não há matérias com professor vinculado no momento.", 200
+    texto = "📚 Carga horária por professor:\n" if not professor else ""
+    for linha in linhas:
+        texto += (f"Prof. {linha['professor_nome']}: {linha['carga_total']} horas "
+                  f"em {linha['materias']} matéria(s)\n")
+    return texto, 200
+
+@METRICAS.medir("crud.ocupacao_laboratorio")
+def consultar_ocupacao(params: dict) -> (str, int):
+    """Reservas e horas reservadas do laboratório no período, dia a dia (ou por semana no mês)."""
+    periodo = periodo_consulta(params)
+    if periodo is None:
+        return "Erro na formatação da data. Use DD/MM ou DD/MM/AAAA.", 400
+    inicio, fim = periodo
+    response = None
+    try:
+        response = api_client.get("agregacoes/ocupacao/", params={
+            'inicio': inicio.isoformat(), 'fim': fim.isoformat(),
+            'agrupar': 'semana' if (fim - inicio).days > 13 else 'dia',
+        })
+        response.raise_for_status()
+        dados = response.json()
+    except requests.exceptions.RequestException as e:
+        return _erro_consulta(e, response)
+
+    total = dados["total"]
+    intervalo = inicio.strftime('%d/%m') if inicio == fim else f"{inicio:%d/%m} a {fim:%d/%m}"
+    texto = (f"🧪 Ocupação do laboratório ({intervalo}): {total['reservas']} reserva(s), "
+             f"{_horas(total['minutos'])} reservadas ({total['ocupacao']:.0%} do horário de funcionamento)\n")
+    if inicio != fim:
+        rotulo = "Semana de " if dados.get("agrupar") == "semana" else ""
+        for linha in dados.get("results", []):
+            dia = datetime.fromisoformat(linha['periodo']).strftime('%d/%m')
+            texto += f"{rotulo}{dia}: {linha['reservas']} reserva(s) | {_horas(linha['minutos'])} | {linha['ocupacao']:.0%}\n"
+    return texto, 200
+
+@METRICAS.medir("crud.top_materias")
+def consultar_top_materias(params: dict) -> (str, int):
+    """Matérias com mais horas de laboratório reservadas no período."""
+    periodo = periodo_consulta(params)
+    if periodo is None:
+        return "Erro na formatação da data. Use DD/MM ou DD/MM/AAAA.", 400
+    inicio, fim = periodo
+    response = None
+    try:
+        response = api_client.get("agregacoes/top-materias/", params={
+            'inicio': inicio.isoformat(), 'fim': fim.isoformat(), 'k': 5,
+        })
+        response.raise_for_status()
+        linhas = response.json().get("results", [])
+    except requests.exceptions.RequestException as e:
+        return _erro_consulta(e, response)
+
+    intervalo = inicio.strftime('%d/%m') if inicio == fim else f"{inicio:%d/%m} a {fim:%d/%m}"
+    if not linhas:
+        return f"Nenhuma reserva do laboratório entre {intervalo}.", 200
+    texto = f"🏆 Matérias que mais usam o laboratório ({intervalo}):\n"
+    for posicao, linha in enumerate(linhas, 1):
+        professor = f" (Prof. {linha['professor_nome']})" if linha.get('professor_nome') else ""
+        texto += f"{posicao}. {linha['materia_nome']}{professor}: {linha['reservas']} reserva(s) | {_horas(linha['minutos'])}\n"
+    return texto, 200
+
+
 # ==============================================================================
 # 5. CHATBOT E LÓGICA DE EXECUÇÃO
 # ==============================================================================
 
+LISTAGENS = {
+    "listar_materias": listar_materias,
+    "listar_professores": listar_professores,
+    "listar_reservas": listar_reservas,
+}
+
+# Intenções que alteram dados: depois delas, as leituras pré-buscadas da mensagem ficam velhas
+INTENCOES_ESCRITA = {
+    "cadastrar_materia", "atualizar_materia", "excluir_materia",
+    "cadastrar_professor", "excluir_professor",
+    "reservar_laboratorio", "excluir_reserva",
+}
+
+@METRICAS.medir("despacho")
+def despachar_intencao(intenção: str, params: dict, prefetch: Prefetch | None = None,
+                       estado: dict | None = None) -> (str, int):
+    """
+    Executa a ação correspondente à intenção, reaproveitando as pré-buscas.
+    `estado` (st.session_state) guarda o link da próxima página para o "mostrar mais".
+    """
+    estado = estado if estado is not None else {}
+    METRICAS.definir_intencao(intenção)  # as etapas abaixo (buscar_*_id, crud.*) ficam rotuladas
+
+    if intenção in LISTAGENS:
+        response_text, status_code, proxima = obter_prefetch(prefetch, (intenção,), LISTAGENS[intenção])
+        estado["proxima_pagina"] = (intenção, proxima) if proxima else None
+        return response_text, status_code
+    elif intenção == "mostrar_mais":
+        pendente = estado.get("proxima_pagina")
+        if not pendente:
+            return "Não há mais resultados para mostrar. Peça uma nova listagem (ex: **listar reservas**).", 400
+        listagem, url = pendente
+        response_text, status_code, proxima = LISTAGENS[listagem](url)
+        estado["proxima_pagina"] = (listagem, proxima) if proxima else None
+        return response_text, status_code
+    elif intenção == "cadastrar_materia":
+        return cadastrar_materia(params, prefetch)
+    elif intenção == "atualizar_materia": # Incluído
+        return atualizar_materia(params)
+    elif intenção == "excluir_materia": # Incluído
+        return excluir_materia(params)
+    elif intenção == "cadastrar_professor":
+        return cadastrar_professor(params)
+    elif intenção == "excluir_professor": # Incluído
+        return excluir_professor(params)
+    elif intenção == "reservar_laboratorio":
+        return reservar_laboratorio(params, prefetch)
+    elif intenção == "excluir_reserva":
+        return excluir_reserva(params)
+    elif intenção == "carga_professor":
+        return consultar_carga_professor(params)
+    elif intenção == "ocupacao_laboratorio":
+        return consultar_ocupacao(params)
+    elif intenção == "top_materias":
+        return consultar_top_materias(params)
+    # ... Outras intenções
+    return "Intenção não reconhecida ou fora do escopo do assistente.", 400
+
+
+def extrair_com_prefetch(mensagem: str, sessao: str = "anonima", uso: list | None = None) -> tuple[list[dict], Prefetch]:
+    """Extração dos comandos com as leituras prováveis já disparadas em paralelo (etapa 1 do main)."""
+    return executar_com_prefetch(
+        obter_executor(), mensagem, partial(extrair_intencoes, sessao=sessao, uso=uso), palpites_prefetch(mensagem)
+    )
+
+
+def executar_comandos(comandos: list[dict], prefetch: Prefetch | None = None, estado: dict | None = None) -> (str, int):
+    """
+    Executa os comandos extraídos de uma mensagem, na ordem, com resultado por item.
+    Vários cadastros do mesmo tipo viram UM único POST em lote.
+    Depois da primeira escrita, os comandos seguintes não usam mais o prefetch: ele foi
+    disparado antes dela (ex: 'cadastrar professor X; listar professores').
+    """
+    if len(comandos) == 1:
+        return despachar_intencao(comandos[0].get("intencao", "outra"), comandos[0].get("parametros", {}), prefetch, estado)
+
+    intencoes = {c.get("intencao", "outra") for c in comandos}
+    if len(intencoes) == 1 and (intenção := intencoes.pop()) in CADASTROS_EM_LOTE:
+        return cadastrar_em_lote(intenção, [c.get("parametros", {}) for c in comandos], prefetch)
+
+    textos, pior_status = [], 200
+    for n, comando in enumerate(comandos, start=1):
+        intenção = comando.get("intencao", "outra")
+        texto, status_code = despachar_intencao(intenção, comando.get("parametros", {}), prefetch, estado)
+        textos.append(f"**{n}.** {texto}")
+        pior_status = max(pior_status, status_code)
+        if prefetch is not None and intenção in INTENCOES_ESCRITA:
+            prefetch.cancelar_pendentes()
+            prefetch = None
+    return "\n\n".join(textos), pior_status
+
+
+# Exportação das métricas para o Prometheus: defina ASSISTENTE_METRICAS_PORTA (ex: 9108)
+# para expor /metrics e /metrics.json (em 127.0.0.1)
+@st.cache_resource
+def iniciar_servidor_metricas():
+    porta = os.environ.get("ASSISTENTE_METRICAS_PORTA")
+    return METRICAS.iniciar_servidor(int(porta)) if porta else None
+
+
+def exibir_painel_metricas() -> None:
+    with st.expander("⏱️ Latência por etapa e intenção", expanded=True):
+        st.dataframe(METRICAS.resumo(), use_container_width=True, hide_index=True)
+        if METRICAS.traces:
+            st.caption("Última mensagem (spans aninhados, em ms):")
+            st.json(METRICAS.traces[-1].como_dict(), expanded=False)
+        col1, col2 = st.columns(2)
+        col1.download_button("Exportar (Prometheus)", METRICAS.exportar_prometheus(), "metricas.prom", "text/plain")
+        col2.download_button("Exportar (JSON)", METRICAS.exportar_json(), "metricas.json", "application/json")
+
+
+def exibir_mensagem(historico: JanelaHistorico, message: dict) -> None:
+    """Respostas grandes aparecem resumidas; o texto completo vem do disco só se pedido."""
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        if message.get("ref") and st.button("Ver resposta completa", key=f"completa-{message['id']}"):
+            st.markdown(historico.conteudo_completo(message))
+
+
 def main():
+    # set_page_config precisa ser o primeiro comando do Streamlit do run
+    st.set_page_config(page_title="Assistente de Recursos Acadêmicos (Gemini + DRF)", layout="wide")
+    try:
+        obter_cliente_gemini()  # criado só no primeiro run; nos reruns é só uma consulta ao cache
+    except Exception:
+        st.error("Erro: A chave GEMINI_API_KEY não foi encontrada. Adicione sua chave Gemini no arquivo .streamlit/secrets.toml")
+        st.stop()
+    iniciar_servidor_metricas()
+
     # Título para garantir que o código foi atualizado
-    st.title("🤖 Assistente - (DRF+Anthropic+Gemini)") 
+    st.title("🤖 Assistente - (DRF+Anthropic+Gemini)")
+
+    # Contadores do cache de intenções
+    stats_cache = obter_cache_intencao().estatisticas()
+    st.sidebar.caption(
+        f"Cache de intenções: {stats_cache['hits']} hits / {stats_cache['misses']} misses "
+        f"({stats_cache['taxa_acerto']:.0%}) | {stats_cache['entradas']} entradas"
+    )
+    if obter_classificador() is not None:
+        c = obter_metricas_classificador()
+        st.sidebar.caption(f"Classificador local: {c['resolvidos']}/{c['consultados']} registros resolvidos sem LLM")
+    with st.sidebar.expander("Latência da API Django"):
+        st.caption(f"Circuito: {api_client.breaker.estado}")
+        for endpoint, m in api_client.metricas.resumo().items():
+            st.caption(f"{endpoint}: {m['chamadas']} chamadas | média {m['media_ms']:.0f} ms | máx {m['max_ms']:.0f} ms | erros {m['erros']}")
+        st.caption(f"Respostas revalidadas (304, sem corpo): {api_client.validadores.revalidacoes}")
+    with st.sidebar.expander("Tempo de rerun"):
+        r = obter_metricas_rerun()
+        if r["frio_ms"] is not None:
+            st.caption(f"Primeiro run (frio): {r['frio_ms']:.0f} ms | último: {r['ultimo_ms']:.0f} ms")
+            st.caption(f"Reruns quentes: {r['quentes'].amostras} | p50 {r['quentes'].percentil(0.5) or 0:.0f} ms "
+                       f"| p90 {r['quentes'].percentil(0.9) or 0:.0f} ms")
+        for nome, ms in r["clientes_ms"].items():
+            st.caption(f"Criação do cliente {nome} (uma vez por processo): {ms:.0f} ms")
+    with st.sidebar.expander("Cota do LLM"):
+        s = obter_agendador_llm().estatisticas()
+        st.caption(f"Último minuto: {s['req_ultimo_minuto']}/{LLM_RPM} req | {s['tokens_ultimo_minuto']}/{LLM_TPM} tokens")
+        st.caption(f"Na fila: {s['na_fila']} | espera média {s['espera_media_ms']:.0f} ms"
+                   f"{' | pausado (429)' if s['pausado'] else ''}")
+        st.caption(f"Executadas {s['executadas']} | rejeitadas {s['rejeitadas']} | expiradas {s['expiradas']} | 429: {s['erros_429']}")
+        streaming = obter_metricas_streaming()
+        st.caption(f"Streaming: primeira ação p50 {streaming['primeira_acao'].percentil(0.5) or 0:.0f} ms | "
+                   f"resposta completa p50 {streaming['resposta_completa'].percentil(0.5) or 0:.0f} ms")
+        for provedor, t in obter_uso_tokens().items():
+            entrada = t["cache"] + t["sem_cache"]
+            st.caption(f"Tokens {provedor}: {t['cache']}/{entrada} de entrada em cache "
+                       f"({t['cache'] / entrada if entrada else 0:.0%}) | {t['saida']} de saída em {t['chamadas']} chamadas")
+        extrator = obter_extrator_llm()
+        st.caption(f"Hedges disparados: {extrator.hedges_disparados} | atraso atual {extrator.atraso_hedge_ms():.0f} ms")
+        for provedor in filter(None, (extrator.primario, extrator.secundario)):
+            h = provedor.latencias.resumo()
+            st.caption(f"{provedor.nome}: {provedor.vitorias} vitórias | p50 {h['p50_ms'] or 0:.0f} ms | "
+                       f"p90 {h['p90_ms'] or 0:.0f} ms | p99 {h['p99_ms'] or 0:.0f} ms | erros {h['erros']}")
     
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-        st.session_state.messages.append({"role": "assistant", "content": "Olá! Sou seu assistente para gerenciar Matérias, Professores e Reservas. O que você gostaria de fazer? (Ex: **listar professores, cadastrar matéria, reservar laboratório, excluir reserva ID 5**)"})
+    if st.sidebar.toggle("Painel de depuração (latência por etapa)"):
+        exibir_painel_metricas()
+
+    historico = obter_historico()
+    if historico.total == 0:
+        historico.adicionar("assistant", "Olá! Sou seu assistente para gerenciar Matérias, Professores e Reservas. O que você gostaria de fazer? (Ex: **listar professores, cadastrar matéria, reservar laboratório, excluir reserva ID 5, ocupação do laboratório esta semana**)")
+
+    # Mensagens fora da janela só são lidas do disco quando o usuário pede
+    arquivadas = historico.arquivadas()
+    carregadas = min(st.session_state.paginas_anteriores * HISTORICO_PAGINA, arquivadas)
+    if carregadas < arquivadas and st.button(f"⬆️ Carregar mensagens anteriores ({arquivadas - carregadas} arquivadas)"):
+        st.session_state.paginas_anteriores += 1
+        carregadas = min(carregadas + HISTORICO_PAGINA, arquivadas)
+    with METRICAS.span("renderizacao.historico"):
+        if carregadas:
+            for message in historico.anteriores(carregadas):
+                exibir_mensagem(historico, message)
+            st.divider()
 
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+        for message in historico.mensagens:
+            exibir_mensagem(historico, message)
 
     if prompt := st.chat_input("Fale com o assistente..."):
         
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
+        with METRICAS.span("mensagem"):
+            historico.adicionar("user", prompt)
+            with st.chat_message("user"):
+                st.markdown(prompt)
 
-        with st.chat_message("assistant"):
-            with st.spinner("Analisando intenção e executando operação..."):
+            with st.chat_message("assistant"):
+                with st.spinner("Analisando intenção e executando operação..."):
                 
-                # 1. Extrai a intenção
-                intent_data = extrair_intencao(prompt)
-                intenção = intent_data.get("intencao", "outra")
-                params = intent_data.get("parametros", {})
+                    # 1. Extrai as intenções (uma ou várias, numa única chamada à IA)
+                    # Pré-busca das leituras prováveis em paralelo com a chamada ao LLM
+                    uso_tokens = []
+                    comandos, prefetch = extrair_com_prefetch(prompt, obter_id_sessao(), uso_tokens)
                 
-                # 2. Exibe a Intenção Detectada (DEBUG)
-                st.write(f"Intenção detectada: **{intenção}**")
-                st.write(f"Parâmetros: **{params}**")
+                    # 2. Exibe as Intenções Detectadas (DEBUG)
+                    for comando in comandos:
+                        st.write(f"Intenção detectada: **{comando.get('intencao', 'outra')}**")
+                        st.write(f"Parâmetros: **{comando.get('parametros', {})}**")
+                    for u in uso_tokens:
+                        st.write(f"Tokens ({u['provedor']}): {u['cache']} de entrada em cache | "
+                                 f"{u['sem_cache']} sem cache | {u['saida']} de saída")
                 
-                # 3. Executa a Ação com base na Intenção
+                    # 3. Executa as Ações, na ordem
                 
-                response_text = "Intenção não reconhecida ou fora do escopo do assistente."
-                status_code = 400
-                
-                if intenção == "listar_materias":
-                    response_text, status_code = listar_materias()
-                elif intenção == "cadastrar_materia":
-                    response_text, status_code = cadastrar_materia(params)
-                elif intenção == "atualizar_materia": # Incluído
-                    response_text, status_code = atualizar_materia(params)
-                elif intenção == "excluir_materia": # Incluído
-                    response_text, status_code = excluir_materia(params)
-                elif intenção == "listar_professores":
-                    response_text, status_code = listar_professores()
-                elif intenção == "cadastrar_professor":
-                    response_text, status_code = cadastrar_professor(params)
-                elif intenção == "excluir_professor": # Incluído
-                    response_text, status_code = excluir_professor(params)
-                elif intenção == "reservar_laboratorio":
-                    response_text, status_code = reservar_laboratorio(params)
-                elif intenção == "listar_reservas": 
-                    response_text, status_code = listar_reservas()
-                elif intenção == "excluir_reserva": 
-                    response_text, status_code = excluir_reserva(params)
-                # ... Outras intenções
-                
-                # 4. Formatação da Resposta
-                if status_code >= 200 and status_code < 400:
-                    st.success(response_text)
-                elif status_code == 204: # Sucesso para DELETE (No Content)
-                    st.success(response_text)
-                else:
-                    st.error(response_text)
+                    response_text, status_code = executar_comandos(comandos, prefetch, st.session_state)
+                    prefetch.cancelar_pendentes()
+
+                    # 4. Formatação da Resposta
+                    with METRICAS.span("renderizacao"):
+                        if status_code >= 200 and status_code < 400:
+                            st.success(response_text)
+                        elif status_code == 204: # Sucesso para DELETE (No Content)
+                            st.success(response_text)
+                        else:
+                            st.error(response_text)
                     
-                st.session_state.messages.append({"role": "assistant", "content": response_text})
+                    historico.adicionar("assistant", response_text)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        registrar_tempo_rerun()
\ No newline at end of file
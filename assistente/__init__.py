@@ -0,0 +1,6 @@
+"""
+Componentes de apoio do assistente Streamlit (Prog3_assistente.py).
+
+Os módulos deste pacote são importados uma única vez por processo, então o estado
+que eles guardam (caches, conexões, contadores) sobrevive aos reruns do Streamlit.
+"""
@@ -0,0 +1,217 @@
+"""
+Agendador das chamadas ao LLM, compartilhado por todas as sessões do Streamlit.
+
+Sem coordenação, um pico de uso dispara dezenas de chamadas ao mesmo tempo, o
+provedor responde 429 para todas e todo mundo cai no fallback de uma vez. Aqui
+cada chamada passa por:
+
+- dois baldes de tokens (requisições por minuto e tokens por minuto);
+- uma fila limitada com prioridade, em que cada sessão só fura a fila de quem
+  tem mais pedidos pendentes do que ela (justiça entre sessões);
+- um limite de chamadas simultâneas.
+
+Fila cheia -> FilaCheia na hora; espera maior que `espera_max` -> TempoEsgotado.
+Nos dois casos quem chamou usa o parser local, sem tocar no provedor. Um 429 do
+provedor pausa o despacho por alguns segundos em vez de gerar uma rajada de erros.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+PRIORIDADE_INTERATIVA = 0
+PRIORIDADE_LOTE = 1
+
+
+class FilaCheia(Exception):
+    """A fila do agendador está no limite: a chamada nem foi enfileirada."""
+
+
+class TempoEsgotado(Exception):
+    """A chamada esperou mais que `espera_max` na fila e foi descartada."""
+
+
+class BaldeTokens:
+    """Token bucket: `capacidade` de rajada, reposto continuamente a `taxa` por segundo."""
+
+    def __init__(self, capacidade: float, taxa: float):
+        self.capacidade = capacidade
+        self.taxa = taxa
+        self.disponivel = capacidade
+        self._atualizado = time.monotonic()
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def espera_para(self, quantidade: float) -> float:
+        """Segundos até haver `quantidade` disponível (0 se já há)."""
+        self._repor()
+        # Um pedido maior que a capacidade inteira passa quando o balde está cheio
+        quantidade = min(quantidade, self.capacidade)
+        if self.disponivel >= quantidade:
+            return 0.0
+        return (quantidade - self.disponivel) / self.taxa
+
+    def consumir(self, quantidade: float) -> None:
+        self._repor()
+        self.disponivel -= quantidade  # pode ficar negativo (ajuste pelo uso real)
+
+    def devolver(self, quantidade: float) -> None:
+        self._repor()
+        self.disponivel = min(self.capacidade, self.disponivel + quantidade)
+
+
+class _Pedido:
+    __slots__ = ("sessao", "fn", "tokens", "prazo", "contar_tokens", "futuro", "enfileirado_em")
+
+    def __init__(self, sessao, fn, tokens, prazo, contar_tokens):
+        self.sessao = sessao
+        self.fn = fn
+        self.tokens = tokens
+        self.prazo = prazo
+        self.contar_tokens = contar_tokens
+        self.futuro = Future()
+        self.enfileirado_em = time.monotonic()
+
+
+def _eh_limite_taxa(erro: Exception) -> bool:
+    codigo = getattr(erro, "code", None) or getattr(erro, "status_code", None)
+    return codigo == 429 or "RESOURCE_EXHAUSTED" in str(erro)
+
+
+class AgendadorLLM:
+    """
+    Uso: `agendador.executar(sessao, fn, tokens_estimados=..., prioridade=...)`.
+    `fn()` faz a chamada ao provedor; `contar_tokens(resultado)` (opcional) devolve os
+    tokens realmente gastos, usados para corrigir a estimativa no balde de TPM.
+    """
+
+    def __init__(self, rpm: int = 15, tpm: int = 250_000, max_fila: int = 32,
+                 max_concorrencia: int = 4, pausa_429: float = 5.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_fila = max_fila
+        self.pausa_429 = pausa_429
+        self._balde_req = BaldeTokens(rpm, rpm / 60)
+        self._balde_tok = BaldeTokens(tpm, tpm / 60)
+        self._fila: list = []
+        self._pendentes_sessao: dict[str, int] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pausado_ate = 0.0
+        self._janela: deque = deque()  # (instante, tokens) das chamadas do último minuto
+        self.contadores = {"executadas": 0, "rejeitadas": 0, "expiradas": 0, "erros_429": 0, "espera_total_s": 0.0}
+        for n in range(max_concorrencia):
+            threading.Thread(target=self._trabalhador, name=f"agendador-llm-{n}", daemon=True).start()
+
+    # ------------------------------------------------------------------ API
+    def submeter(self, sessao: str, fn, *, tokens_estimados: int = 1000,
+                 prioridade: int = PRIORIDADE_INTERATIVA, espera_max: float = 10.0,
+                 contar_tokens=None) -> Future:
+        with self._cond:
+            if len(self._fila) >= self.max_fila:
+                self.contadores["rejeitadas"] += 1
+                raise FilaCheia(f"{len(self._fila)} chamadas na fila")
+            pedido = _Pedido(sessao, fn, tokens_estimados, time.monotonic() + espera_max, contar_tokens)
+            # Justiça: o n-ésimo pedido pendente de uma sessão fica atrás dos pedidos
+            # de ordem menor das outras sessões (dentro da mesma prioridade)
+            ordem_sessao = self._pendentes_sessao.get(sessao, 0)
+            self._pendentes_sessao[sessao] = ordem_sessao + 1
+            heapq.heappush(self._fila, (prioridade, ordem_sessao, next(self._seq), pedido))
+            self._cond.notify()
+        return pedido.futuro
+
+    def executar(self, sessao: str, fn, **kwargs):
+        """Submete e espera o resultado (FilaCheia / TempoEsgotado / erro do provedor)."""
+        return self.submeter(sessao, fn, **kwargs).result()
+
+    def estatisticas(self) -> dict:
+        with self._cond:
+            self._limpar_janela()
+            executadas = self.contadores["executadas"]
+            return {
+                **self.contadores,
+                "na_fila": len(self._fila),
+                "req_ultimo_minuto": len(self._janela),
+                "tokens_ultimo_minuto": sum(t for _, t in self._janela),
+                "espera_media_ms": 1000 * self.contadores["espera_total_s"] / executadas if executadas else 0.0,
+                "pausado": time.monotonic() < self._pausado_ate,
+            }
+
+    # ------------------------------------------------------------- internos
+    def _limpar_janela(self) -> None:
+        limite = time.monotonic() - 60
+        while self._janela and self._janela[0][0] < limite:
+            self._janela.popleft()
+
+    def _liberar_sessao(self, sessao: str) -> None:
+        restantes = self._pendentes_sessao.get(sessao, 1) - 1
+        if restantes > 0:
+            self._pendentes_sessao[sessao] = restantes
+        else:
+            self._pendentes_sessao.pop(sessao, None)
+
+    def _proximo(self) -> _Pedido:
+        """Bloqueia até o pedido do topo poder sair sem estourar RPM/TPM."""
+        with self._cond:
+            while True:
+                if not self._fila:
+                    self._cond.wait()
+                    continue
+                pedido = self._fila[0][-1]
+                agora = time.monotonic()
+                if agora >= pedido.prazo:
+                    heapq.heappop(self._fila)
+                    self._liberar_sessao(pedido.sessao)
+                    self.contadores["expiradas"] += 1
+                    pedido.futuro.set_exception(TempoEsgotado(f"{agora - pedido.enfileirado_em:.1f}s na fila"))
+                    continue
+                espera = max(
+                    self._pausado_ate - agora,
+                    self._balde_req.espera_para(1),
+                    self._balde_tok.espera_para(pedido.tokens),
+                )
+                if espera > 0:
+                    # Acorda antes se chegar algo novo (ex: prioridade maior) ou o prazo vencer
+                    self._cond.wait(min(espera, pedido.prazo - agora))
+                    continue
+                heapq.heappop(self._fila)
+                self._liberar_sessao(pedido.sessao)
+                self._balde_req.consumir(1)
+                self._balde_tok.consumir(pedido.tokens)
+                self.contadores["espera_total_s"] += agora - pedido.enfileirado_em
+                return pedido
+
+    def _trabalhador(self) -> None:
+        while True:
+            pedido = self._proximo()
+            if not pedido.futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                resultado = pedido.fn()
+            except Exception as e:
+                with self._cond:
+                    self._janela.append((time.monotonic(), pedido.tokens))
+                    if _eh_limite_taxa(e):
+                        self.contadores["erros_429"] += 1
+                        self._pausado_ate = time.monotonic() + self.pausa_429
+                pedido.futuro.set_exception(e)
+                continue
+
+            usados = pedido.contar_tokens(resultado) if pedido.contar_tokens else None
+            with self._cond:
+                if usados is not None:
+                    diferenca = usados - pedido.tokens
+                    if diferenca > 0:
+                        self._balde_tok.consumir(diferenca)
+                    else:
+                        self._balde_tok.devolver(-diferenca)
+                self._janela.append((time.monotonic(), usados if usados is not None else pedido.tokens))
+                self.contadores["executadas"] += 1
+                self._limpar_janela()
+            pedido.futuro.set_result(resultado)
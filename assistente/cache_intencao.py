@@ -0,0 +1,137 @@
+"""
+Cache persistente (SQLite) para o resultado da extração de intenção (por registro).
+
+A chave é o prompt com os espaços normalizados, mas com as maiúsculas preservadas: o
+valor guarda parâmetros que dependem delas (nome, e-mail), então "professor 'ana'" e
+"professor 'Ana'" são entradas diferentes. Cada entrada tem TTL e o número de entradas
+é limitado com despejo LRU (pela data do último acesso).
+A origem de cada entrada ('llm', 'local') fica gravada: só as do LLM servem de rótulo
+para treinar o classificador (as do parser local o ensinariam a imitar as regex).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# Versão do formato da chave (PRAGMA user_version); ao mudar, as entradas antigas são descartadas
+VERSAO_ESQUEMA = 2  # 2: chave sem lower() (na 1, outra grafia reaproveitava os parâmetros)
+
+
+def normalizar_prompt(mensagem: str) -> str:
+    """Sem \\xa0, espaços repetidos ou espaços nas pontas; maiúsculas preservadas."""
+    return " ".join(mensagem.replace('\xa0', ' ').split())
+
+
+class CacheIntencao:
+    """
+    Cache LRU com TTL gravado em disco.
+    Thread-safe: uma única conexão protegida por lock (o Streamlit atende várias sessões
+    em threads diferentes do mesmo processo).
+    """
+
+    def __init__(self, caminho: str | Path, max_entradas: int = 2000, ttl_segundos: float = 7 * 24 * 3600,
+                 namespace: str = ""):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        # O namespace separa entradas geradas por modelos/prompts diferentes
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.caminho), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS intencoes ("
+            " chave TEXT PRIMARY KEY,"
+            " valor TEXT NOT NULL,"
+            " criado_em REAL NOT NULL,"
+            " acessado_em REAL NOT NULL,"
+            " origem TEXT NOT NULL DEFAULT '')"
+        )
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(intencoes)")}
+        if "origem" not in colunas:
+            # Arquivo criado antes da coluna: as entradas antigas ficam com origem desconhecida
+            self._conn.execute("ALTER TABLE intencoes ADD COLUMN origem TEXT NOT NULL DEFAULT ''")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < VERSAO_ESQUEMA:
+            # Chaves de um formato anterior podem apontar para parâmetros de outra grafia
+            self._conn.execute("DELETE FROM intencoes")
+            self._conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_intencoes_acesso ON intencoes (acessado_em)")
+
+    def _chave(self, mensagem: str) -> str:
+        return f"{self.namespace}|{normalizar_prompt(mensagem)}"
+
+    def obter(self, mensagem: str) -> dict | list | None:
+        """Retorna o valor em cache (cópia nova) ou None se ausente/expirado."""
+        chave = self._chave(mensagem)
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT valor, criado_em FROM intencoes WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is None or agora - linha[1] > self.ttl_segundos:
+                if linha is not None:
+                    self._conn.execute("DELETE FROM intencoes WHERE chave = ?", (chave,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE intencoes SET acessado_em = ? WHERE chave = ?", (agora, chave))
+            self.hits += 1
+        return json.loads(linha[0])
+
+    def guardar(self, mensagem: str, intent_data: dict | list, origem: str = "") -> None:
+        """Grava (ou substitui) a entrada e aplica o despejo LRU se passar do limite."""
+        chave = self._chave(mensagem)
+        agora = time.time()
+        valor = json.dumps(intent_data, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO intencoes (chave, valor, criado_em, acessado_em, origem)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (chave, valor, agora, agora, origem),
+            )
+            total = self._conn.execute("SELECT COUNT(*) FROM intencoes").fetchone()[0]
+            if total > self.max_entradas:
+                self._conn.execute(
+                    "DELETE FROM intencoes WHERE chave IN ("
+                    " SELECT chave FROM intencoes ORDER BY acessado_em ASC LIMIT ?)",
+                    (total - self.max_entradas,),
+                )
+
+    def entradas(self, origem: str | None = None) -> list[tuple[str, dict | list]]:
+        """
+        (prompt normalizado, valor) de todas as entradas válidas deste namespace (ex: para
+        treino); com `origem`, só as gravadas com ela.
+        """
+        prefixo = f"{self.namespace}|"
+        sql = "SELECT chave, valor FROM intencoes WHERE substr(chave, 1, ?) = ? AND criado_em >= ?"
+        args = [len(prefixo), prefixo, time.time() - self.ttl_segundos]
+        if origem is not None:
+            sql += " AND origem = ?"
+            args.append(origem)
+        with self._lock:
+            linhas = self._conn.execute(sql, args).fetchall()
+        return [(chave[len(prefixo):], json.loads(valor)) for chave, valor in linhas]
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM intencoes")
+            self.hits = 0
+            self.misses = 0
+
+    def estatisticas(self) -> dict:
+        """Contadores de hit/miss e tamanho atual do cache."""
+        with self._lock:
+            total = self._conn.execute("SELECT COUNT(*) FROM intencoes").fetchone()[0]
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": (self.hits / consultas) if consultas else 0.0,
+            "entradas": total,
+        }
@@ -0,0 +1,284 @@
+"""
+Classificador de intenção treinado offline (n-gramas de caracteres + regressão logística).
+
+Fica entre o parser local (REGEX) e o LLM: os registros que as REGEX não resolvem
+passam por ele em lote (uma multiplicação esparsa para todos), e quando a probabilidade
+da intenção prevista passa do limiar calibrado daquela intenção, os parâmetros são
+extraídos pelo parser local e o LLM não é chamado.
+
+    python -m assistente.classificador_intencao --cache .cache_assistente/intencoes.sqlite3
+
+Os exemplos vêm do cache de intenções (prompt normalizado -> comandos finais) e,
+opcionalmente, de arquivos JSONL com {"prompt": ..., "intencao": ...}. O texto vira
+n-gramas de caracteres (2 a 4) num espaço de hashing de tamanho fixo, com TF-IDF
+sublinear normalizado; o modelo é uma regressão logística multinomial treinada com
+Adam. Parte dos exemplos fica de fora do treino para calibrar, por intenção, a menor
+confiança com precisão >= `precisao_alvo`; intenções sem exemplos suficientes na
+validação nunca dispensam o LLM.
+
+O arquivo .npz (pesos, IDF, limiares) carrega em milissegundos. NumPy é opcional:
+sem ele `DISPONIVEL` é False e o assistente segue só com REGEX + LLM.
+"""
+
+import argparse
+import json
+import random
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+from assistente.indice_nomes import normalizar_nome
+
+DISPONIVEL = np is not None
+
+NGRAMAS = (2, 3, 4)
+DIMENSOES = 2 ** 14  # espaço de hashing (potência de 2)
+VERSAO_MODELO = 1
+LIMIAR_NUNCA = 2.0  # confiança inalcançável: a intenção sempre vai para o LLM
+
+
+def _indices(texto: str) -> Counter:
+    """Índices (hash crc32, estável entre processos) dos n-gramas de caracteres do texto."""
+    texto = f" {normalizar_nome(texto)} "
+    return Counter(
+        zlib.crc32(texto[i:i + n].encode()) & (DIMENSOES - 1)
+        for n in NGRAMAS
+        for i in range(len(texto) - n + 1)
+    )
+
+
+def _esparsa(contagens: list[Counter], idf):
+    """Matriz TF-IDF (sublinear, L2) no formato coordenado: (linhas, colunas, valores)."""
+    linhas, colunas, valores = [], [], []
+    for linha, contagem in enumerate(contagens):
+        linhas.extend([linha] * len(contagem))
+        colunas.extend(contagem.keys())
+        valores.extend(contagem.values())
+    linhas = np.asarray(linhas, dtype=np.int32)
+    colunas = np.asarray(colunas, dtype=np.int32)
+    valores = (1.0 + np.log(np.asarray(valores, dtype=np.float32))) * idf[colunas]
+    normas = np.zeros(len(contagens), dtype=np.float32)
+    np.add.at(normas, linhas, valores * valores)
+    valores /= np.sqrt(np.maximum(normas, 1e-12))[linhas]
+    return linhas, colunas, valores
+
+
+def _softmax(escores):
+    escores = escores - escores.max(axis=1, keepdims=True)
+    exp = np.exp(escores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class ClassificadorIntencao:
+    def __init__(self, rotulos: list[str], pesos, vies, idf, limiares):
+        self.rotulos = list(rotulos)
+        self.pesos = pesos  # (DIMENSOES, intenções)
+        self.vies = vies
+        self.idf = idf
+        self.limiares = dict(zip(self.rotulos, (float(x) for x in limiares)))
+
+    # ------------------------------------------------------------- inferência
+    def probabilidades(self, textos: list[str]):
+        """Matriz (textos, intenções) de probabilidades, calculada de uma vez para o lote."""
+        linhas, colunas, valores = _esparsa([_indices(t) for t in textos], self.idf)
+        escores = np.tile(self.vies, (len(textos), 1))
+        np.add.at(escores, linhas, self.pesos[colunas] * valores[:, None])
+        return _softmax(escores)
+
+    def prever(self, textos: list[str]) -> list[tuple[str, float]]:
+        """(intenção mais provável, probabilidade) de cada texto."""
+        if not textos:
+            return []
+        probs = self.probabilidades(textos)
+        melhores = probs.argmax(axis=1)
+        return [(self.rotulos[j], float(probs[i, j])) for i, j in enumerate(melhores)]
+
+    def confiavel(self, intencao: str, confianca: float) -> bool:
+        """True quando a confiança passa do limiar calibrado para a intenção."""
+        return confianca >= self.limiares.get(intencao, LIMIAR_NUNCA)
+
+    # ------------------------------------------------------------ persistência
+    def salvar(self, caminho: str | Path) -> None:
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        with open(caminho, "wb") as arquivo:  # savez acrescentaria '.npz' a um caminho sem extensão
+            np.savez_compressed(
+                arquivo,
+                versao=np.array([VERSAO_MODELO, DIMENSOES, *NGRAMAS], dtype=np.int32),
+                rotulos=np.array(self.rotulos),
+                pesos=self.pesos.astype(np.float32),
+                vies=self.vies.astype(np.float32),
+                idf=self.idf.astype(np.float32),
+                limiares=np.array([self.limiares[r] for r in self.rotulos], dtype=np.float32),
+            )
+
+    @classmethod
+    def carregar(cls, caminho: str | Path) -> "ClassificadorIntencao":
+        """Levanta ValueError se o arquivo foi gerado com outra configuração de n-gramas/hashing."""
+        with np.load(caminho, allow_pickle=False) as dados:
+            if dados["versao"].tolist() != [VERSAO_MODELO, DIMENSOES, *NGRAMAS]:
+                raise ValueError(f"Modelo incompatível: {caminho} (treine de novo)")
+            return cls(dados["rotulos"].tolist(), dados["pesos"], dados["vies"], dados["idf"], dados["limiares"])
+
+
+# ==============================================================================
+# TREINO
+# ==============================================================================
+
+def _ajustar(linhas, colunas, valores, y, n_classes: int, epocas: int, taxa: float, l2: float):
+    """Regressão logística multinomial (gradiente do lote inteiro + Adam)."""
+    n = int(y.shape[0])
+    pesos = np.zeros((DIMENSOES, n_classes), dtype=np.float32)
+    vies = np.zeros(n_classes, dtype=np.float32)
+    alvo = np.eye(n_classes, dtype=np.float32)[y]
+    m_p, v_p = np.zeros_like(pesos), np.zeros_like(pesos)
+    m_v, v_v = np.zeros_like(vies), np.zeros_like(vies)
+    b1, b2, eps = 0.9, 0.999, 1e-8
+
+    for t in range(1, epocas + 1):
+        escores = np.tile(vies, (n, 1))
+        np.add.at(escores, linhas, pesos[colunas] * valores[:, None])
+        erro = (_softmax(escores) - alvo) / n
+        grad_p = l2 * pesos
+        np.add.at(grad_p, colunas, valores[:, None] * erro[linhas])
+        grad_v = erro.sum(axis=0)
+        for param, grad, m, v in ((pesos, grad_p, m_p, v_p), (vies, grad_v, m_v, v_v)):
+            m *= b1
+            m += (1 - b1) * grad
+            v *= b2
+            v += (1 - b2) * grad * grad
+            param -= taxa * (m / (1 - b1 ** t)) / (np.sqrt(v / (1 - b2 ** t)) + eps)
+    return pesos, vies
+
+
+def calibrar_limiares(probs, y, n_classes: int, precisao_alvo: float, minimo: int) -> list[float]:
+    """
+    Para cada intenção, a menor confiança c tal que, entre os exemplos de validação previstos
+    como essa intenção com confiança >= c, a precisão é >= `precisao_alvo`.
+    """
+    previstas = probs.argmax(axis=1)
+    confiancas = probs.max(axis=1)
+    limiares = []
+    for classe in range(n_classes):
+        selecao = previstas == classe
+        if selecao.sum() < minimo:
+            limiares.append(LIMIAR_NUNCA)
+            continue
+        ordem = np.argsort(-confiancas[selecao])
+        acertos = (y[selecao] == classe)[ordem]
+        precisao = np.cumsum(acertos) / np.arange(1, len(acertos) + 1)
+        validos = np.nonzero((precisao >= precisao_alvo) & (np.arange(1, len(acertos) + 1) >= minimo))[0]
+        limiares.append(float(confiancas[selecao][ordem][validos[-1]]) if len(validos) else LIMIAR_NUNCA)
+    return limiares
+
+
+def treinar(exemplos: list[tuple[str, str]], epocas: int = 150, taxa: float = 0.05, l2: float = 1e-4,
+            fracao_validacao: float = 0.2, precisao_alvo: float = 0.98, minimo_calibracao: int = 5,
+            semente: int = 0) -> tuple[ClassificadorIntencao, dict]:
+    """Treina com (texto, intenção); devolve o modelo e um relatório da validação."""
+    if not DISPONIVEL:
+        raise RuntimeError("O classificador precisa do NumPy (pip install numpy)")
+    rotulos = sorted({intencao for _, intencao in exemplos})
+    if len(rotulos) < 2:
+        raise ValueError("São necessárias pelo menos duas intenções diferentes para treinar")
+
+    # Separação estratificada: cada intenção contribui com a mesma fração para a validação
+    rng = random.Random(semente)
+    por_rotulo = defaultdict(list)
+    for texto, intencao in exemplos:
+        por_rotulo[intencao].append(texto)
+    treino, validacao = [], []
+    for intencao, textos in por_rotulo.items():
+        rng.shuffle(textos)
+        corte = int(len(textos) * fracao_validacao)
+        validacao += [(t, intencao) for t in textos[:corte]]
+        treino += [(t, intencao) for t in textos[corte:]]
+
+    indice = {r: i for i, r in enumerate(rotulos)}
+    contagens = [_indices(t) for t, _ in treino]
+    df = np.zeros(DIMENSOES, dtype=np.float32)
+    for contagem in contagens:
+        df[list(contagem)] += 1
+    idf = (np.log((1 + len(contagens)) / (1 + df)) + 1).astype(np.float32)
+
+    y = np.array([indice[r] for _, r in treino], dtype=np.int64)
+    pesos, vies = _ajustar(*_esparsa(contagens, idf), y, len(rotulos), epocas, taxa, l2)
+    modelo = ClassificadorIntencao(rotulos, pesos, vies, idf, [LIMIAR_NUNCA] * len(rotulos))
+
+    relatorio = {"treino": len(treino), "validacao": len(validacao), "intencoes": {}}
+    if validacao:
+        probs = modelo.probabilidades([t for t, _ in validacao])
+        y_val = np.array([indice[r] for _, r in validacao], dtype=np.int64)
+        limiares = calibrar_limiares(probs, y_val, len(rotulos), precisao_alvo, minimo_calibracao)
+        modelo.limiares = dict(zip(rotulos, limiares))
+        previstas, confiancas = probs.argmax(axis=1), probs.max(axis=1)
+        relatorio["acuracia"] = float((previstas == y_val).mean())
+        aceitos = confiancas >= np.array(limiares)[previstas]
+        relatorio["cobertura"] = float(aceitos.mean())  # fração que dispensaria o LLM
+        relatorio["precisao_aceitos"] = float((previstas == y_val)[aceitos].mean()) if aceitos.any() else None
+    for r in rotulos:
+        relatorio["intencoes"][r] = {"exemplos": len(por_rotulo[r]), "limiar": modelo.limiares[r]}
+    return modelo, relatorio
+
+
+def carregar_exemplos(caches: list[Path], namespace: str, jsonl: list[Path]) -> list[tuple[str, str]]:
+    """
+    Pares (prompt, intenção final). Do cache só entram registros rotulados pelo LLM (os do
+    parser local só ensinariam o modelo a imitar as regex) com UM comando reconhecido
+    (um registro com vários comandos não tem um rótulo único).
+    """
+    from assistente.cache_intencao import CacheIntencao
+
+    exemplos = []
+    for caminho in caches:
+        for prompt, comandos in CacheIntencao(caminho, namespace=namespace).entradas(origem="llm"):
+            if isinstance(comandos, dict):
+                comandos = [comandos]
+            if len(comandos) == 1 and comandos[0].get("intencao", "outra") != "outra":
+                exemplos.append((prompt, comandos[0]["intencao"]))
+    for caminho in jsonl:
+        with open(caminho, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                if linha.strip():
+                    registro = json.loads(linha)
+                    exemplos.append((registro["prompt"], registro["intencao"]))
+    return exemplos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o classificador de intenção a partir dos logs.")
+    parser.add_argument("--cache", type=Path, action="append", default=[], help="SQLite do cache de intenções")
+    parser.add_argument("--namespace", default="gemini-2.5-flash|comandos",
+                        help="namespace das entradas no cache (o mesmo de obter_cache_intencao)")
+    parser.add_argument("--jsonl", type=Path, action="append", default=[], help='linhas {"prompt", "intencao"}')
+    parser.add_argument("--saida", type=Path, default=Path(".cache_assistente/classificador_intencao.npz"))
+    parser.add_argument("--epocas", type=int, default=150)
+    parser.add_argument("--precisao-alvo", type=float, default=0.98)
+    parser.add_argument("--validacao", type=float, default=0.2, help="fração reservada para calibrar os limiares")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    exemplos = carregar_exemplos(args.cache, args.namespace, args.jsonl)
+    print(f"{len(exemplos)} exemplos")
+    modelo, relatorio = treinar(exemplos, epocas=args.epocas, fracao_validacao=args.validacao,
+                                precisao_alvo=args.precisao_alvo, semente=args.semente)
+    modelo.salvar(args.saida)
+
+    print(f"treino {relatorio['treino']} | validação {relatorio['validacao']}")
+    if "acuracia" in relatorio:
+        precisao = relatorio["precisao_aceitos"]
+        print(f"acurácia {relatorio['acuracia']:.1%} | dispensaria o LLM em {relatorio['cobertura']:.1%}"
+              f" (precisão {'—' if precisao is None else f'{precisao:.1%}'})")
+    for intencao, info in relatorio["intencoes"].items():
+        limiar = "nunca" if info["limiar"] > 1 else f"{info['limiar']:.3f}"
+        print(f"  {intencao:<22} {info['exemplos']:>6} exemplos  limiar {limiar}")
+    print(f"modelo salvo em {args.saida} ({args.saida.stat().st_size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
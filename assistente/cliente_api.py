@@ -0,0 +1,245 @@
+"""
+Cliente HTTP para a API Django (DRF).
+
+Uma única requests.Session com keep-alive (pool de conexões) é compartilhada por
+todas as sessões do Streamlit. Cada chamada tem timeout, as chamadas idempotentes
+têm novas tentativas com backoff e um circuit breaker evita martelar a API quando
+ela está fora do ar. Latências são acumuladas por endpoint.
+
+GETs guardam os validadores (ETag / Last-Modified) de cada URL e revalidam com
+If-None-Match / If-Modified-Since: quando nada mudou a API responde 304 sem corpo e
+o cliente devolve o corpo guardado (response.revalidado = True).
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class APIIndisponivel(requests.exceptions.ConnectionError):
+    """Circuito aberto: a API falhou repetidamente e as chamadas estão suspensas."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples: 'fechado' -> 'aberto' após N falhas seguidas;
+    depois de `tempo_reabertura` segundos deixa passar uma chamada de teste ('meio-aberto').
+    No meio-aberto só UMA chamada passa; as concorrentes são recusadas até ela terminar
+    (ou até passar outro `tempo_reabertura`, se o resultado dela nunca for registrado).
+    """
+
+    def __init__(self, limite_falhas: int = 5, tempo_reabertura: float = 15.0):
+        self.limite_falhas = limite_falhas
+        self.tempo_reabertura = tempo_reabertura
+        self.falhas = 0
+        self.aberto_em = None
+        self._sonda_em = None  # início da chamada de teste em andamento
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        if self.aberto_em is None:
+            return "fechado"
+        if time.monotonic() - self.aberto_em >= self.tempo_reabertura:
+            return "meio-aberto"
+        return "aberto"
+
+    def permitir(self) -> bool:
+        with self._lock:
+            estado = self.estado
+            if estado != "meio-aberto":
+                return estado == "fechado"
+            agora = time.monotonic()
+            if self._sonda_em is not None and agora - self._sonda_em < self.tempo_reabertura:
+                return False
+            self._sonda_em = agora
+            return True
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            self.falhas = 0
+            self.aberto_em = None
+            self._sonda_em = None
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self._sonda_em = None
+            self.falhas += 1
+            if self.falhas >= self.limite_falhas or self.aberto_em is not None:
+                # No meio-aberto uma nova falha reabre o circuito imediatamente
+                self.aberto_em = time.monotonic()
+
+
+class MetricasEndpoint:
+    """Contadores de latência por endpoint (chamadas, erros, total e máximo em ms)."""
+
+    def __init__(self):
+        self._dados = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, chave: str, ms: float, erro: bool = False) -> None:
+        with self._lock:
+            d = self._dados.setdefault(chave, {"chamadas": 0, "erros": 0, "total_ms": 0.0, "max_ms": 0.0})
+            d["chamadas"] += 1
+            d["erros"] += int(erro)
+            d["total_ms"] += ms
+            d["max_ms"] = max(d["max_ms"], ms)
+
+    def resumo(self) -> dict:
+        with self._lock:
+            return {
+                chave: {**d, "media_ms": d["total_ms"] / d["chamadas"] if d["chamadas"] else 0.0}
+                for chave, d in self._dados.items()
+            }
+
+
+_RE_ID_URL = re.compile(r"/\d+(?=/|$)")
+
+# Métodos que podem ser repetidos com segurança
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class CacheValidadores:
+    """Últimas respostas GET por URL (LRU) com seus validadores HTTP."""
+
+    def __init__(self, max_entradas: int = 256):
+        self.max_entradas = max_entradas
+        self._dados: OrderedDict[str, tuple[dict, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.revalidacoes = 0  # 304 recebidos (corpo não baixado)
+
+    def cabecalhos(self, url: str) -> dict:
+        with self._lock:
+            entrada = self._dados.get(url)
+            if entrada is None:
+                return {}
+            self._dados.move_to_end(url)
+            validadores = entrada[0]
+        cabecalhos = {}
+        if validadores.get("ETag"):
+            cabecalhos["If-None-Match"] = validadores["ETag"]
+        if validadores.get("Last-Modified"):
+            cabecalhos["If-Modified-Since"] = validadores["Last-Modified"]
+        return cabecalhos
+
+    def guardar(self, url: str, response: requests.Response) -> None:
+        validadores = {k: response.headers[k] for k in ("ETag", "Last-Modified") if k in response.headers}
+        if not validadores:
+            return
+        with self._lock:
+            self._dados[url] = (validadores, response.content)
+            self._dados.move_to_end(url)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def restaurar(self, url: str, response: requests.Response) -> bool:
+        """Transforma um 304 numa resposta 200 com o corpo guardado."""
+        with self._lock:
+            entrada = self._dados.get(url)
+            self.revalidacoes += int(entrada is not None)
+        if entrada is None:
+            return False
+        response.status_code = 200
+        response._content = entrada[1]
+        response.revalidado = True
+        return True
+
+
+class ClienteAPI:
+    """Cliente da API Django com Session compartilhada, timeouts, retries e circuit breaker."""
+
+    def __init__(self, base_url: str, timeout: tuple[float, float] = (3.05, 10.0), tentativas: int = 3,
+                 backoff: float = 0.3, tamanho_pool: int = 10, breaker: CircuitBreaker | None = None):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.metricas = MetricasEndpoint()
+        self.validadores = CacheValidadores()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, endpoint: str) -> str:
+        return urljoin(self.base_url, endpoint)
+
+    @staticmethod
+    def _chave_metrica(metodo: str, url: str) -> str:
+        # /api/reservas/5/ e /api/reservas/7/ contam no mesmo endpoint
+        caminho = _RE_ID_URL.sub("/{id}", url.split("?", 1)[0])
+        return f"{metodo} {caminho}"
+
+    def request(self, metodo: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        Executa a requisição. Levanta APIIndisponivel se o circuito estiver aberto e
+        as exceções do requests (ConnectionError/Timeout) se todas as tentativas falharem.
+        Respostas HTTP de erro (4xx/5xx) são devolvidas normalmente.
+        """
+        metodo = metodo.upper()
+        url = endpoint if endpoint.startswith("http") else self.url(endpoint)
+        kwargs.setdefault("timeout", self.timeout)
+        chave = self._chave_metrica(metodo, url)
+        tentativas = self.tentativas if metodo in METODOS_IDEMPOTENTES else 1
+
+        for tentativa in range(tentativas):
+            if not self.breaker.permitir():
+                raise APIIndisponivel(f"API indisponível (circuito aberto) para {url}")
+
+            inicio = time.perf_counter()
+            try:
+                response = self.session.request(metodo, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.metricas.registrar(chave, (time.perf_counter() - inicio) * 1000, erro=True)
+                self.breaker.registrar_falha()
+                if tentativa + 1 >= tentativas:
+                    raise
+            else:
+                ms = (time.perf_counter() - inicio) * 1000
+                erro_servidor = response.status_code >= 500
+                self.metricas.registrar(chave, ms, erro=erro_servidor)
+                if not erro_servidor:
+                    self.breaker.registrar_sucesso()
+                    return response
+                self.breaker.registrar_falha()
+                if tentativa + 1 >= tentativas:
+                    return response
+
+            time.sleep(self.backoff * (2 ** tentativa))
+
+    def get(self, endpoint: str, condicional: bool = True, **kwargs) -> requests.Response:
+        """GET; com `condicional`, revalida a última resposta da mesma URL (304 -> corpo guardado)."""
+        if not condicional:
+            return self.request("GET", endpoint, **kwargs)
+
+        preparada = requests.models.PreparedRequest()
+        preparada.prepare_url(endpoint if endpoint.startswith("http") else self.url(endpoint), kwargs.pop("params", None))
+        url = preparada.url
+        kwargs["headers"] = {**self.validadores.cabecalhos(url), **(kwargs.get("headers") or {})}
+
+        response = self.request("GET", url, **kwargs)
+        response.revalidado = False
+        if response.status_code == 304:
+            if not self.validadores.restaurar(url, response):
+                # Entrada descartada do LRU no meio do caminho: busca o corpo de novo
+                kwargs["headers"] = {k: v for k, v in kwargs["headers"].items()
+                                     if k not in ("If-None-Match", "If-Modified-Since")}
+                return self.get(url, condicional=False, **kwargs)
+        elif response.status_code == 200:
+            self.validadores.guardar(url, response)
+        return response
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+
+    def patch(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", endpoint, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", endpoint, **kwargs)
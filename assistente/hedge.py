@@ -0,0 +1,185 @@
+"""
+Requisições "hedged" ao LLM: primário (Gemini) com reserva (Claude).
+
+Se o primário não responder dentro de um percentil da sua latência recente, a
+mesma extração é disparada no secundário. Vale a primeira resposta que passar na
+validação do esquema; a outra é cancelada (se ainda não começou) ou ignorada.
+O atraso do hedge vem do histograma de latência de cada provedor, então ele se
+ajusta sozinho: quando o Gemini está rápido, o Claude quase nunca é chamado.
+
+Os provedores são apenas `Provedor(nome, fn)`, em que `fn(pedido, cancelado)` devolve
+o texto da resposta (`pedido` é repassado sem ser interpretado); `ProvedorFalso`
+permite exercitar tudo sem rede.
+"""
+
+import bisect
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Limites superiores dos baldes do histograma, em ms (o último balde é aberto)
+LIMITES_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 15000)
+
+
+class HistogramaLatencia:
+    """
+    Histograma de latências com decaimento: a cada `meia_vida` amostras as contagens
+    caem pela metade, então os percentis refletem o comportamento recente.
+    """
+
+    def __init__(self, limites_ms: tuple = LIMITES_MS, meia_vida: int = 200):
+        self.limites_ms = limites_ms
+        self.meia_vida = meia_vida
+        self.contagens = [0.0] * (len(limites_ms) + 1)
+        self.amostras = 0
+        self.erros = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, ms: float) -> None:
+        with self._lock:
+            self.contagens[bisect.bisect_left(self.limites_ms, ms)] += 1
+            self.amostras += 1
+            if self.amostras % self.meia_vida == 0:
+                self.contagens = [c / 2 for c in self.contagens]
+
+    def registrar_erro(self) -> None:
+        with self._lock:
+            self.erros += 1
+
+    def percentil(self, p: float) -> float | None:
+        """Limite superior do balde que contém o percentil `p` (0-1); None sem amostras."""
+        with self._lock:
+            total = sum(self.contagens)
+            if not total:
+                return None
+            acumulado = 0.0
+            for i, c in enumerate(self.contagens):
+                acumulado += c
+                if acumulado >= p * total:
+                    return float(self.limites_ms[min(i, len(self.limites_ms) - 1)])
+            return float(self.limites_ms[-1])
+
+    def resumo(self) -> dict:
+        return {
+            "amostras": self.amostras,
+            "erros": self.erros,
+            "p50_ms": self.percentil(0.5),
+            "p90_ms": self.percentil(0.9),
+            "p99_ms": self.percentil(0.99),
+        }
+
+
+class Provedor:
+    """Um LLM que responde a extração: `fn(pedido, cancelado: threading.Event) -> texto`."""
+
+    def __init__(self, nome: str, fn):
+        self.nome = nome
+        self.fn = fn
+        self.latencias = HistogramaLatencia()
+        self.vitorias = 0
+
+    def chamar(self, pedido, cancelado: threading.Event) -> str:
+        inicio = time.perf_counter()
+        try:
+            texto = self.fn(pedido, cancelado)
+        except Exception:
+            # Cancelado no meio: o tempo gasto é só o atraso do hedge, não uma latência real
+            if not cancelado.is_set():
+                self.latencias.registrar_erro()
+            raise
+        # O perdedor que terminou também registra (senão o histograma só veria os rápidos)
+        self.latencias.registrar((time.perf_counter() - inicio) * 1000)
+        return texto
+
+
+class ProvedorFalso:
+    """Provedor local para testes/benchmarks: responde `resposta(pedido)` após uma latência sorteada."""
+
+    def __init__(self, resposta, latencia_ms: tuple[float, float] = (50, 150), taxa_erro: float = 0.0):
+        self.resposta = resposta
+        self.latencia_ms = latencia_ms
+        self.taxa_erro = taxa_erro
+
+    def __call__(self, pedido, cancelado: threading.Event) -> str:
+        # Espera "interrompível": um perdedor cancelado libera a thread na hora
+        if cancelado.wait(random.uniform(*self.latencia_ms) / 1000):
+            raise RuntimeError("cancelado")
+        if random.random() < self.taxa_erro:
+            raise RuntimeError("erro simulado do provedor")
+        return self.resposta(pedido) if callable(self.resposta) else self.resposta
+
+
+class ExtratorHedged:
+    """
+    `extrair(pedido, validar)` devolve (resultado validado, nome do provedor).
+    `validar(texto)` deve converter a resposta ou levantar exceção (JSON/esquema inválido).
+    Levanta RuntimeError se nenhum provedor produzir uma resposta válida.
+    """
+
+    def __init__(self, primario: Provedor, secundario: Provedor | None = None, percentil: float = 0.9,
+                 atraso_min_ms: float = 300, atraso_max_ms: float = 4000, atraso_inicial_ms: float = 1500,
+                 executor: ThreadPoolExecutor | None = None):
+        self.primario = primario
+        self.secundario = secundario
+        self.percentil = percentil
+        self.atraso_min_ms = atraso_min_ms
+        self.atraso_max_ms = atraso_max_ms
+        self.atraso_inicial_ms = atraso_inicial_ms
+        self.executor = executor or ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        self.hedges_disparados = 0
+
+    def atraso_hedge_ms(self) -> float:
+        p = self.primario.latencias.percentil(self.percentil)
+        if p is None:
+            p = self.atraso_inicial_ms
+        return min(max(p, self.atraso_min_ms), self.atraso_max_ms)
+
+    def extrair(self, pedido, validar):
+        cancelado = threading.Event()
+        futuros = {self.executor.submit(self.primario.chamar, pedido, cancelado): self.primario}
+        pendentes, erros = set(futuros), []
+        try:
+            if self.secundario is not None:
+                vencedor, pendentes, erros = self._aguardar_valido(
+                    pendentes, futuros, validar, self.atraso_hedge_ms() / 1000
+                )
+                if vencedor is not None:
+                    return vencedor
+                # Primário lento (ou já falhou): dispara o mesmo pedido no secundário
+                self.hedges_disparados += 1
+                futuro = self.executor.submit(self.secundario.chamar, pedido, cancelado)
+                futuros[futuro] = self.secundario
+                pendentes.add(futuro)
+
+            vencedor, _, mais_erros = self._aguardar_valido(pendentes, futuros, validar, None)
+            if vencedor is not None:
+                return vencedor
+            raise RuntimeError(f"Nenhum provedor respondeu com JSON válido: {erros + mais_erros}")
+        finally:
+            cancelado.set()  # avisa o perdedor (provedores que observam o evento param antes)
+
+    def _aguardar_valido(self, pendentes: set, futuros: dict, validar, timeout: float | None):
+        """
+        Espera até `timeout` (None = até todos terminarem) pela primeira resposta válida.
+        Devolve ((resultado, nome do provedor) ou None, futuros ainda pendentes, erros).
+        """
+        erros = []
+        limite = None if timeout is None else time.monotonic() + timeout
+        while pendentes:
+            restante = None if limite is None else max(0.0, limite - time.monotonic())
+            prontos, pendentes = wait(pendentes, timeout=restante, return_when=FIRST_COMPLETED)
+            if not prontos:
+                break
+            for futuro in prontos:
+                provedor = futuros[futuro]
+                try:
+                    resultado = validar(futuro.result())
+                except Exception as e:
+                    erros.append(f"{provedor.nome}: {type(e).__name__}")
+                    continue
+                provedor.vitorias += 1
+                for outro in pendentes:
+                    outro.cancel()
+                return (resultado, provedor.nome), pendentes, erros
+        return None, set(pendentes), erros
@@ -0,0 +1,129 @@
+"""
+Histórico do chat com janela limitada e arquivo em disco (SQLite).
+
+Antes, `st.session_state.messages` crescia sem limite e era todo renderizado a cada
+rerun. Agora cada sessão guarda na memória só as últimas N mensagens (`JanelaHistorico`);
+todas são gravadas no `ArquivoHistorico` assim que chegam, e as mais antigas só voltam
+do disco quando o usuário pede. Respostas grandes (listagens) ficam no disco uma única
+vez, comprimidas e endereçadas pelo hash do conteúdo; a mensagem carrega só um resumo
+e a referência. O custo de cada rerun passa a ser proporcional à janela.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+
+LIMITE_INLINE = 1500  # caracteres; acima disso o conteúdo vai para o disco por referência
+TAMANHO_RESUMO = 400
+
+
+def _resumir(conteudo: str) -> str:
+    """Começo do texto, cortado numa quebra de linha quando possível."""
+    corte = conteudo.rfind("\n", 0, TAMANHO_RESUMO)
+    return conteudo[:corte if corte > 0 else TAMANHO_RESUMO].rstrip() + "\n\n…"
+
+
+class ArquivoHistorico:
+    """
+    Armazenamento das mensagens de todas as sessões do processo.
+    Thread-safe: uma única conexão protegida por lock (como o CacheIntencao).
+    """
+
+    def __init__(self, caminho: str | Path, retencao_dias: float = 30):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.caminho), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS mensagens ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " sessao TEXT NOT NULL,"
+            " papel TEXT NOT NULL,"
+            " conteudo TEXT NOT NULL,"  # texto completo, ou só o resumo quando há ref
+            " ref TEXT,"
+            " criado_em REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_mensagens_sessao ON mensagens (sessao, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (ref TEXT PRIMARY KEY, dados BLOB NOT NULL, tamanho INTEGER NOT NULL)"
+        )
+        self.expurgar(retencao_dias)
+
+    def gravar(self, sessao: str, papel: str, conteudo: str) -> dict:
+        """Grava a mensagem e devolve a versão leve que fica na memória."""
+        ref = None
+        texto = conteudo
+        if len(conteudo) > LIMITE_INLINE:
+            ref = hashlib.sha1(conteudo.encode()).hexdigest()
+            texto = _resumir(conteudo)
+        with self._lock:
+            if ref is not None:
+                # Conteúdo idêntico (ex: a mesma listagem pedida de novo) é gravado uma vez só
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO blobs (ref, dados, tamanho) VALUES (?, ?, ?)",
+                    (ref, zlib.compress(conteudo.encode()), len(conteudo)),
+                )
+            cursor = self._conn.execute(
+                "INSERT INTO mensagens (sessao, papel, conteudo, ref, criado_em) VALUES (?, ?, ?, ?, ?)",
+                (sessao, papel, texto, ref, time.time()),
+            )
+        return {"id": cursor.lastrowid, "role": papel, "content": texto, "ref": ref}
+
+    def conteudo(self, ref: str) -> str:
+        with self._lock:
+            linha = self._conn.execute("SELECT dados FROM blobs WHERE ref = ?", (ref,)).fetchone()
+        return zlib.decompress(linha[0]).decode() if linha else ""
+
+    def anteriores(self, sessao: str, antes_de_id: int, limite: int) -> list[dict]:
+        """As `limite` mensagens da sessão imediatamente anteriores a `antes_de_id`, em ordem cronológica."""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT id, papel, conteudo, ref FROM mensagens WHERE sessao = ? AND id < ?"
+                " ORDER BY id DESC LIMIT ?",
+                (sessao, antes_de_id, limite),
+            ).fetchall()
+        return [
+            {"id": id_, "role": papel, "content": conteudo, "ref": ref}
+            for id_, papel, conteudo, ref in reversed(linhas)
+        ]
+
+    def expurgar(self, retencao_dias: float) -> None:
+        """Remove mensagens antigas e os blobs que ficaram sem referência."""
+        with self._lock:
+            self._conn.execute("DELETE FROM mensagens WHERE criado_em < ?", (time.time() - retencao_dias * 86400,))
+            self._conn.execute("DELETE FROM blobs WHERE ref NOT IN (SELECT ref FROM mensagens WHERE ref IS NOT NULL)")
+
+
+class JanelaHistorico:
+    """As últimas `tamanho` mensagens de UMA sessão (fica no st.session_state)."""
+
+    def __init__(self, arquivo: ArquivoHistorico, sessao: str, tamanho: int = 30):
+        self.arquivo = arquivo
+        self.sessao = sessao
+        self.mensagens: deque[dict] = deque(maxlen=tamanho)
+        self.total = 0
+
+    def adicionar(self, papel: str, conteudo: str) -> dict:
+        mensagem = self.arquivo.gravar(self.sessao, papel, conteudo)
+        self.mensagens.append(mensagem)
+        self.total += 1
+        return mensagem
+
+    def conteudo_completo(self, mensagem: dict) -> str:
+        return self.arquivo.conteudo(mensagem["ref"]) if mensagem.get("ref") else mensagem["content"]
+
+    def _primeiro_id(self) -> int:
+        return self.mensagens[0]["id"] if self.mensagens else 2**63 - 1
+
+    def arquivadas(self) -> int:
+        """Quantas mensagens desta sessão já saíram da janela (sem consultar o disco)."""
+        return self.total - len(self.mensagens)
+
+    def anteriores(self, limite: int) -> list[dict]:
+        return self.arquivo.anteriores(self.sessao, self._primeiro_id(), limite)
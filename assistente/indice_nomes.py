@@ -0,0 +1,144 @@
+"""
+Índice local nome -> ID (professores e matérias).
+
+Os nomes são normalizados (acentos, maiúsculas, aspas, pontuação final e espaços),
+então 'Leandro.', 'leandro' e ' LEANDRO ' caem na mesma chave. Buscas viram
+consultas a um dicionário; o índice é revalidado em segundo plano (stale-while-
+revalidate) com requisição condicional, sem baixar tudo de novo quando nada mudou.
+Um nome que não está no índice é procurado no servidor (busca indexada por nome
+normalizado) em vez de baixar a lista inteira de novo.
+
+`buscar` só devolve o ID de um nome IGUAL após a normalização: o ID vira chave
+estrangeira numa escrita, e 'Prog 2' não pode virar 'Prog 1'. O nome parecido (fuzzy)
+sai separado, por `sugerir`, para o assistente perguntar "você quis dizer...?".
+"""
+
+import difflib
+import threading
+import time
+import unicodedata
+
+_PONTUACAO_PONTAS = " \t'\"`´.,;:!?-"
+
+
+def normalizar_nome(nome: str) -> str:
+    """'Programação ' -> 'programacao'; 'Leandro.' -> 'leandro'."""
+    sem_acento = unicodedata.normalize("NFKD", nome or "")
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return " ".join(sem_acento.lower().replace('\xa0', ' ').split()).strip(_PONTUACAO_PONTAS)
+
+
+class IndiceNomes:
+    """
+    Índice em memória compartilhado entre sessões.
+
+    `carregar(validador)` deve devolver (itens, novo_validador), onde itens é a lista de
+    dicts com 'id' e 'nome', ou None quando o servidor respondeu que nada mudou (304).
+    `buscar_remoto(nome)` (opcional) devolve o dict {'id', 'nome'} do melhor candidato no
+    servidor, ou None; sem ele, um nome ausente força uma recarga completa.
+    `corte_similaridade` vale só para as sugestões (difflib), nunca para o ID.
+    """
+
+    def __init__(self, carregar, ttl_segundos: float = 60.0, corte_similaridade: float = 0.8,
+                 intervalo_min_recarga: float = 2.0, buscar_remoto=None):
+        self._carregar = carregar
+        self._buscar_remoto = buscar_remoto
+        self.ttl_segundos = ttl_segundos
+        self.corte_similaridade = corte_similaridade
+        self.intervalo_min_recarga = intervalo_min_recarga
+        self._ids: dict[str, int] = {}
+        self._nomes: dict[str, str] = {}  # chave normalizada -> nome como cadastrado
+        self._sugestoes_remotas: dict[str, str] = {}  # nome pedido -> candidato parecido do servidor
+        self._validador = None
+        self._atualizado_em = None
+        self._lock = threading.Lock()
+        self._recarregando = threading.Lock()  # single-flight
+
+    # --- Manutenção ---------------------------------------------------------------
+
+    def recarregar(self) -> bool:
+        """Revalida o índice de forma síncrona. Se outra thread já está recarregando, não duplica."""
+        if not self._recarregando.acquire(blocking=False):
+            # Espera a recarga em andamento terminar e usa o resultado dela
+            with self._recarregando:
+                return True
+        try:
+            itens, validador = self._carregar(self._validador)
+            with self._lock:
+                if itens is not None:
+                    self._ids = {normalizar_nome(i["nome"]): i["id"] for i in itens if i.get("nome")}
+                    self._nomes = {normalizar_nome(i["nome"]): i["nome"] for i in itens if i.get("nome")}
+                    self._sugestoes_remotas = {}
+                self._validador = validador
+                self._atualizado_em = time.monotonic()
+            return True
+        except Exception:
+            return False
+        finally:
+            self._recarregando.release()
+
+    def _revalidar_em_segundo_plano(self) -> None:
+        if self._recarregando.locked():
+            return
+        threading.Thread(target=self.recarregar, daemon=True, name="indice-nomes").start()
+
+    def adicionar(self, id_: int, nome: str) -> None:
+        """Registra um item recém-criado sem esperar a próxima revalidação."""
+        with self._lock:
+            self._ids[normalizar_nome(nome)] = id_
+            self._nomes[normalizar_nome(nome)] = nome
+
+    def remover(self, id_: int) -> None:
+        with self._lock:
+            self._ids = {k: v for k, v in self._ids.items() if v != id_}
+            self._nomes = {k: v for k, v in self._nomes.items() if k in self._ids}
+
+    # --- Consulta -----------------------------------------------------------------
+
+    def _procurar(self, chave: str) -> int | None:
+        with self._lock:
+            return self._ids.get(chave)
+
+    def sugerir(self, nome: str) -> str | None:
+        """Nome cadastrado mais parecido com `nome` (só para exibir; não consulta o servidor)."""
+        chave = normalizar_nome(nome)
+        with self._lock:
+            if chave in self._sugestoes_remotas:
+                return self._sugestoes_remotas[chave]
+            proximos = difflib.get_close_matches(chave, self._ids.keys(), n=1, cutoff=self.corte_similaridade)
+            return self._nomes.get(proximos[0], proximos[0]) if proximos else None
+
+    def buscar(self, nome: str) -> int | None:
+        """ID do item com exatamente esse nome (após normalização); None se não houver."""
+        chave = normalizar_nome(nome)
+        if not chave:
+            return None
+
+        if self._atualizado_em is None:
+            self.recarregar()
+        elif time.monotonic() - self._atualizado_em > self.ttl_segundos:
+            self._revalidar_em_segundo_plano()
+
+        encontrado = self._procurar(chave)
+        if encontrado is None and self._buscar_remoto is not None:
+            # Ausente no índice: uma consulta indexada no servidor em vez da lista inteira
+            try:
+                item = self._buscar_remoto(nome)
+            except Exception:
+                pass  # servidor sem a busca ou fora do ar: segue para a recarga completa
+            else:
+                if item is None:
+                    return None
+                # O candidato entra no índice com o próprio nome; se não for o mesmo, vira sugestão
+                self.adicionar(item["id"], item["nome"])
+                if normalizar_nome(item["nome"]) == chave:
+                    return item["id"]
+                with self._lock:
+                    self._sugestoes_remotas[chave] = item["nome"]
+                return None
+        if encontrado is None and self._atualizado_em is not None \
+                and time.monotonic() - self._atualizado_em > self.intervalo_min_recarga:
+            # Pode ter sido criado por outra pessoa desde a última carga
+            self.recarregar()
+            encontrado = self._procurar(chave)
+        return encontrado
@@ -0,0 +1,142 @@
+"""
+Parser JSON incremental para a resposta em streaming do LLM.
+
+A resposta segue o esquema {"comandos": [{"registro": n, "intencao": "...", "parametros": {...}}]}.
+Em vez de esperar o texto inteiro para chamar json.loads, `LeitorComandos.alimentar(pedaço)`
+consome os pedaços conforme chegam e devolve eventos assim que cada valor fica completo:
+
+    ("intencao", indice, comando_parcial)    -> o campo 'intencao' do comando `indice` fechou
+    ("parametro", indice, comando_parcial)   -> um parâmetro do comando fechou
+    ("comando", indice, comando)             -> o objeto do comando fechou
+
+Com isso o pipeline já dispara as leituras dependentes (listas, buscar_*_id) enquanto
+o resto da resposta ainda está sendo gerado. Cercas ```json são ignoradas.
+"""
+
+import json
+
+_DELIMITADORES = set(",:]} \t\r\n")
+
+
+class _Quadro:
+    """Um objeto ou array aberto na pilha do parser."""
+
+    __slots__ = ("valor", "chave", "caminho")
+
+    def __init__(self, valor, caminho: tuple):
+        self.valor = valor
+        self.chave = None  # objeto: chave lida, aguardando o valor
+        self.caminho = caminho
+
+
+class LeitorComandos:
+    """Estado do parser de UMA resposta (crie um por chamada)."""
+
+    def __init__(self):
+        self._pilha: list[_Quadro] = []
+        self._token = None  # texto do string/literal em leitura
+        self._em_string = False
+        self._escape = False
+        self._iniciado = False
+        self.raiz = None
+        self.texto = []  # tudo o que já chegou (para a validação final)
+
+    @property
+    def completo(self) -> bool:
+        return self.raiz is not None
+
+    def alimentar(self, pedaco: str) -> list[tuple]:
+        self.texto.append(pedaco)
+        eventos = []
+        for c in pedaco:
+            if self.completo:
+                break
+            if not self._iniciado:
+                # Ignora cercas/markdown antes do primeiro '{'
+                if c != "{":
+                    continue
+                self._iniciado = True
+            self._consumir(c, eventos)
+        return eventos
+
+    # ------------------------------------------------------------- internos
+    def _consumir(self, c: str, eventos: list) -> None:
+        if self._em_string:
+            self._token.append(c)
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._em_string = False
+                self._valor_lido(json.loads("".join(self._token)), eventos)
+                self._token = None
+            return
+
+        if self._token is not None:  # literal: número, true, false, null
+            if c not in _DELIMITADORES:
+                self._token.append(c)
+                return
+            self._valor_lido(json.loads("".join(self._token)), eventos)
+            self._token = None
+
+        if c == '"':
+            self._em_string = True
+            self._token = [c]
+        elif c in "{[":
+            self._abrir({} if c == "{" else [])
+        elif c in "}]":
+            quadro = self._pilha.pop()
+            if not self._pilha:
+                self.raiz = quadro.valor
+            else:
+                self._emitir(quadro.caminho, eventos)
+        elif c not in _DELIMITADORES:
+            self._token = [c]
+
+    def _abrir(self, valor) -> None:
+        # O container já entra no pai ao abrir: os eventos enxergam o comando parcial
+        caminho = self._anexar(valor) if self._pilha else ()
+        self._pilha.append(_Quadro(valor, caminho))
+
+    def _anexar(self, valor) -> tuple:
+        topo = self._pilha[-1]
+        if isinstance(topo.valor, list):
+            topo.valor.append(valor)
+            return topo.caminho + (len(topo.valor) - 1,)
+        topo.valor[topo.chave] = valor
+        caminho = topo.caminho + (topo.chave,)
+        topo.chave = None
+        return caminho
+
+    def _valor_lido(self, valor, eventos: list) -> None:
+        """String ou literal completo: chave de objeto ou valor."""
+        if not self._pilha:
+            self.raiz = valor
+            return
+        topo = self._pilha[-1]
+        if isinstance(topo.valor, dict) and topo.chave is None:
+            topo.chave = valor
+            return
+        self._emitir(self._anexar(valor), eventos)
+
+    def _emitir(self, caminho: tuple, eventos: list) -> None:
+        # ("comandos", i) -> comando; ("comandos", i, campo); ("comandos", i, "parametros", chave)
+        if len(caminho) < 2 or caminho[0] != "comandos" or not isinstance(caminho[1], int):
+            return
+        indice = caminho[1]
+        comando = self._comando(indice)
+        if not isinstance(comando, dict):
+            return
+        if len(caminho) == 2:
+            eventos.append(("comando", indice, comando))
+        elif caminho[2:] == ("intencao",):
+            eventos.append(("intencao", indice, comando))
+        elif len(caminho) == 4 and caminho[2] == "parametros":
+            eventos.append(("parametro", indice, comando))
+
+    def _comando(self, indice: int):
+        for quadro in self._pilha:
+            if quadro.caminho == ("comandos",):
+                return quadro.valor[indice] if indice < len(quadro.valor) else None
+        return None
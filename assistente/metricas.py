@@ -0,0 +1,211 @@
+"""
+Instrumentação do caminho quente do assistente: spans aninhados + histogramas.
+
+    with METRICAS.span("extracao"):
+        ...
+    @METRICAS.medir("buscar_professor_id")
+    def buscar_professor_id(...): ...
+
+Cada span alimenta um histograma por (etapa, intenção); a intenção é herdada pelos
+spans filhos (contextvars), então "buscar_professor_id" aparece separado para
+'cadastrar_materia' e 'reservar_laboratorio'. Os últimos traces completos (árvore de
+spans de cada mensagem) ficam em memória para o painel de depuração.
+
+Exporta em texto do Prometheus ou JSON; `iniciar_servidor(porta)` expõe /metrics e
+/metrics.json numa thread. O custo por span é um perf_counter, um bisect e um lock.
+"""
+
+import bisect
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos baldes em segundos (convenção do Prometheus)
+LIMITES_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+_span_atual: contextvars.ContextVar = contextvars.ContextVar("span_atual", default=None)
+_intencao_atual: contextvars.ContextVar = contextvars.ContextVar("intencao_atual", default="")
+
+
+class Histograma:
+    """Histograma cumulativo (contagens nunca diminuem, como o Prometheus espera)."""
+
+    __slots__ = ("baldes", "soma", "contagem", "maximo")
+
+    def __init__(self):
+        self.baldes = [0] * (len(LIMITES_S) + 1)
+        self.soma = 0.0
+        self.contagem = 0
+        self.maximo = 0.0
+
+    def registrar(self, segundos: float) -> None:
+        self.baldes[bisect.bisect_left(LIMITES_S, segundos)] += 1
+        self.soma += segundos
+        self.contagem += 1
+        self.maximo = max(self.maximo, segundos)
+
+    def percentil(self, p: float) -> float:
+        """Estimativa pelo limite superior do balde (em segundos)."""
+        if not self.contagem:
+            return 0.0
+        acumulado = 0
+        for i, n in enumerate(self.baldes):
+            acumulado += n
+            if acumulado >= p * self.contagem:
+                return min(LIMITES_S[i], self.maximo) if i < len(LIMITES_S) else self.maximo
+        return self.maximo
+
+
+class Span:
+    __slots__ = ("nome", "intencao", "inicio", "duracao", "filhos")
+
+    def __init__(self, nome: str, intencao: str):
+        self.nome = nome
+        self.intencao = intencao
+        self.inicio = time.perf_counter()
+        self.duracao = None
+        self.filhos: list[Span] = []
+
+    def como_dict(self) -> dict:
+        return {
+            "nome": self.nome,
+            "intencao": self.intencao,
+            "ms": round((self.duracao or 0.0) * 1000, 2),
+            "filhos": [f.como_dict() for f in self.filhos],
+        }
+
+
+class _ContextoSpan:
+    __slots__ = ("metricas", "nome", "intencao", "span", "_tokens")
+
+    def __init__(self, metricas, nome: str, intencao: str | None):
+        self.metricas = metricas
+        self.nome = nome
+        self.intencao = intencao
+
+    def __enter__(self) -> Span:
+        pai = _span_atual.get()
+        intencao = self.intencao if self.intencao is not None else _intencao_atual.get()
+        self.span = Span(self.nome, intencao)
+        if pai is not None:
+            pai.filhos.append(self.span)
+        self._tokens = (_span_atual.set(self.span), _intencao_atual.set(intencao))
+        return self.span
+
+    def __exit__(self, *exc) -> None:
+        span = self.span
+        span.duracao = time.perf_counter() - span.inicio
+        _span_atual.reset(self._tokens[0])
+        _intencao_atual.reset(self._tokens[1])
+        self.metricas._registrar(span, raiz=_span_atual.get() is None)
+
+
+class Metricas:
+    def __init__(self, max_traces: int = 20):
+        self._histogramas: dict[tuple[str, str], Histograma] = {}
+        self._lock = threading.Lock()
+        self.traces: deque = deque(maxlen=max_traces)
+
+    def span(self, nome: str, intencao: str | None = None) -> _ContextoSpan:
+        """Mede o bloco; `intencao` (se dada) vale para este span e para os filhos."""
+        return _ContextoSpan(self, nome, intencao)
+
+    def medir(self, nome: str):
+        """Decorator: cada chamada da função vira um span `nome`."""
+        def decorador(fn):
+            @functools.wraps(fn)
+            def envolvida(*args, **kwargs):
+                with _ContextoSpan(self, nome, None):
+                    return fn(*args, **kwargs)
+            return envolvida
+        return decorador
+
+    @staticmethod
+    def definir_intencao(intencao: str) -> None:
+        """Rotula o span atual (e os próximos filhos) com a intenção, quando ela fica conhecida."""
+        span = _span_atual.get()
+        if span is not None:
+            span.intencao = intencao
+        _intencao_atual.set(intencao)
+
+    def _registrar(self, span: Span, raiz: bool) -> None:
+        with self._lock:
+            chave = (span.nome, span.intencao)
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.registrar(span.duracao)
+            if raiz and span.filhos:
+                self.traces.append(span)
+
+    # ------------------------------------------------------------ exportação
+    def resumo(self) -> list[dict]:
+        with self._lock:
+            itens = sorted(self._histogramas.items())
+            return [
+                {
+                    "etapa": etapa,
+                    "intencao": intencao,
+                    "contagem": h.contagem,
+                    "media_ms": round(1000 * h.soma / h.contagem, 2) if h.contagem else 0.0,
+                    "p50_ms": round(1000 * h.percentil(0.5), 2),
+                    "p95_ms": round(1000 * h.percentil(0.95), 2),
+                    "max_ms": round(1000 * h.maximo, 2),
+                }
+                for (etapa, intencao), h in itens
+            ]
+
+    def exportar_json(self) -> str:
+        with self._lock:
+            traces = [t.como_dict() for t in self.traces]
+        return json.dumps({"etapas": self.resumo(), "traces": traces}, ensure_ascii=False)
+
+    def exportar_prometheus(self) -> str:
+        nome = "assistente_etapa_duracao_segundos"
+        linhas = [f"# HELP {nome} Duração de cada etapa do assistente.", f"# TYPE {nome} histogram"]
+        with self._lock:
+            for (etapa, intencao), h in sorted(self._histogramas.items()):
+                rotulos = f'etapa="{etapa}",intencao="{intencao}"'
+                acumulado = 0
+                for limite, n in zip(LIMITES_S, h.baldes):
+                    acumulado += n
+                    linhas.append(f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+                linhas.append(f'{nome}_bucket{{{rotulos},le="+Inf"}} {h.contagem}')
+                linhas.append(f"{nome}_sum{{{rotulos}}} {h.soma:.6f}")
+                linhas.append(f"{nome}_count{{{rotulos}}} {h.contagem}")
+        return "\n".join(linhas) + "\n"
+
+    def iniciar_servidor(self, porta: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Servidor HTTP mínimo (thread daemon) com /metrics (Prometheus) e /metrics.json."""
+        metricas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    corpo, tipo = metricas.exportar_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    corpo, tipo = metricas.exportar_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                dados = corpo.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", f"{tipo}; charset=utf-8" if "json" in tipo else tipo)
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer((host, porta), Handler)
+        threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+        return servidor
+
+
+# Instância do processo (o módulo é importado uma vez; sobrevive aos reruns)
+METRICAS = Metricas()
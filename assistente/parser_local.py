@@ -0,0 +1,274 @@
+"""
+Parser local (regras + REGEX pré-compiladas) para as intenções do assistente.
+
+Substitui a cadeia de fallbacks com re.search espalhada em extrair_intencao: cada
+intenção tem seus padrões de detecção e de parâmetros, e o resultado vem com uma
+confiança entre 0 e 1. Quando o resultado é completo e confiável, a chamada ao
+Gemini pode ser pulada.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+
+# Parâmetros obrigatórios de cada intenção (para considerar o resultado "completo")
+PARAMETROS_OBRIGATORIOS = {
+    "listar_materias": (),
+    "listar_professores": (),
+    "listar_reservas": (),
+    "cadastrar_materia": ("nome",),
+    "atualizar_materia": ("id",),
+    "excluir_materia": ("id",),
+    "cadastrar_professor": ("nome", "email", "departamento"),
+    "excluir_professor": ("id",),
+    "reservar_laboratorio": ("materia_nome", "data", "hora_inicio", "hora_fim"),
+    "excluir_reserva": ("id",),
+    "mostrar_mais": (),
+    # Consultas agregadas (todos os parâmetros são opcionais)
+    "carga_professor": (),
+    "ocupacao_laboratorio": (),
+    "top_materias": (),
+}
+
+# Confiança mínima para dispensar a chamada ao LLM
+LIMIAR_CONFIANCA = 0.85
+
+_F = re.IGNORECASE
+
+# --- Detecção de intenção (ordem importa: do mais específico para o mais genérico) ---
+# Cada padrão tem um peso: padrões ancorados no início da frase valem mais.
+_PADROES_INTENCAO = [
+    ("mostrar_mais", 1.0, re.compile(r"^(?:(?:mostrar|mostre|ver|carregar)\s+mais\b|mais\s*[.!]?$|pr[oó]xima(?:\s+p[aá]gina\b|\s*[.!]?$))", _F)),
+    # Agregações antes das listagens ("mostre as matérias que mais usam o laboratório"), mas só em
+    # forma de pergunta/consulta no início da frase (um comando "Crie..."/"reservar..." não casa).
+    # Peso abaixo do limiar: o LLM confirma.
+    ("carga_professor", 0.8, re.compile(
+        r"^(?:qual|quais|quantas?|quanto|mostr\w*|ver)\b[^.?!]*\b(?:horas|carga)\b[^.?!]*\bprofessor"
+        r"|^quantas\s+horas\s+(?:de\s+aula\s+)?(?:o|a)\s|^carga\s+hor[aá]ria\b", _F)),
+    ("ocupacao_laboratorio", 0.8, re.compile(
+        r"^(?=[^.?!]*\blab)(?:qual|quais|quanto|qu[aã]o|como|o\s+lab\w*|mostr\w*|ver)\b"
+        r"[^.?!]*\b(?:ocupa[cç][aã]o|ocupad[oa]|lotad[oa]|reservad[oa])\b|^ocupa[cç][aã]o\b[^.?!]*\blab", _F)),
+    ("top_materias", 0.8, re.compile(
+        r"^(?:qual|quais|mostr\w*|ver)\b[^.?!]*\bmat[eé]rias?\b[^.?!]*\bmais\s+(?:usa|reserva|ocupa)\w*"
+        r"|^(?:top|ranking)\b[^.?!]*\b(?:mat[eé]rias?|disciplinas?)\b", _F)),
+    ("listar_professores", 1.0, re.compile(r"^(?:listar|lista|liste|ver|mostrar|mostre|falar)\s+(?:os\s+)?professor(?:es)?\b", _F)),
+    ("listar_reservas", 1.0, re.compile(r"^(?:(?:listar|lista|liste|ver|mostrar|mostre)\s+(?:as\s+)?)?reservas\b", _F)),
+    ("listar_materias", 1.0, re.compile(r"^(?:listar|lista|liste|ver|mostrar|mostre)\s+(?:as\s+)?(?:mat[eé]rias|disciplinas)\b", _F)),
+    ("excluir_reserva", 0.7, re.compile(r"\b(?:exclu\w*|apag\w*|delet\w*|remov\w*|cancel\w*)\s+(?:a\s+)?reserva\b", _F)),
+    ("excluir_professor", 0.7, re.compile(r"\b(?:exclu\w*|apag\w*|delet\w*|remov\w*)\s+(?:o\s+)?professor\b", _F)),
+    ("excluir_materia", 0.7, re.compile(r"\b(?:exclu\w*|apag\w*|delet\w*|remov\w*)\s+(?:a\s+)?(?:mat[eé]ria|disciplina)\b", _F)),
+    ("atualizar_materia", 0.7, re.compile(r"\b(?:atualiz\w*|alter\w*|edit\w*)\s+(?:a\s+)?(?:mat[eé]ria|disciplina)\b", _F)),
+    ("cadastrar_professor", 0.7, re.compile(r"\b(?:cadastr\w*|cri\w*|adicion\w*)\s+(?:o\s+|um\s+|a\s+|uma\s+)?professor(?:a)?\b", _F)),
+    ("cadastrar_materia", 0.7, re.compile(r"\b(?:cadastr\w*|cri\w*|adicion\w*)\s+(?:a\s+|uma\s+)?(?:mat[eé]ria|disciplina)\b", _F)),
+    ("reservar_laboratorio", 0.7, re.compile(r"\breserv(?:ar|e|o)\b", _F)),
+    # Comando curto e genérico ("listar", "ver") -> matérias, como no simple_intents original
+    ("listar_materias", 0.9, re.compile(r"^(?:listar|lista|ver)$", _F)),
+]
+
+# Um segundo comando no mesmo registro ("listar reservas e cadastrar o professor...",
+# "cadastrar o professor 'Ana' ... e a matéria 'redes'"): o parser só devolve um
+_RE_OUTRO_COMANDO = re.compile(
+    r"\b(?:e|depois|ent[aã]o|tamb[eé]m)\s+(?:(?:tamb[eé]m|depois|em\s+seguida)\s+)?"
+    r"(?:cadastr|cri|adicion|reserv[ae]|exclu|apag|delet|remov|cancel|atualiz|alter|edit|list|mostr)\w*"
+    r"|\be\s+(?:a|o|uma|um)\s+(?:nova\s+|novo\s+)?(?:mat[eé]ria|disciplina|professor(?:a)?)\b", _F)
+
+# --- Extração de parâmetros ---
+_RE_ID = re.compile(r"(?:\bid\s*|#\s*)(\d+)", _F)
+_RE_NUMERO_SOLTO = re.compile(r"(?:\s|^)(\d+)(?:\s|$)")
+_RE_EMAIL = re.compile(r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})")
+_RE_CARGA = re.compile(r"(\d+)\s*(?:horas?|h)\b", _F)
+_RE_DATA = re.compile(r"(?:\bdia|\bem|\bpara)\s*(\d{1,2}/\d{1,2}(?:/\d{4})?)", _F)
+_RE_HORAS = re.compile(r"\bdas\s*(\d{1,2}(?::\d{2})?)\s*h?\s*(?:às|as|a|até)\s*(\d{1,2}(?::\d{2})?)", _F)
+
+# Nome entre aspas logo após a palavra-chave, ou texto livre até um delimitador
+_RE_MATERIA_ASPAS = re.compile(r"(?:mat[eé]ria|disciplina)\s*['\"]\s*([^'\"]+?)\s*['\"]", _F)
+_RE_MATERIA_LIVRE = re.compile(
+    r"(?:mat[eé]ria|disciplina)\s+(?!id\b)(.+?)(?=\s+(?:no\s+dia|dia|em|das|e\s+vincule|com\s+o\s+professor|do\s+professor|de\s+\d+|com\s+\d+)\b|\s*[,.;]|\s*$)", _F)
+_RE_PROFESSOR_ASPAS = re.compile(r"professor(?:a)?\s*['\"]\s*([^'\"]+?)\s*['\"]", _F)
+_RE_PROFESSOR_LIVRE = re.compile(
+    r"professor(?:a)?\s+(?!id\b)([^\d,'\"]+?)(?=\s+(?:e|com|do|da|de|carga)\b|\s*[,;]|\s*$)", _F)
+_RE_DEPARTAMENTO = re.compile(
+    r"(?:departamento|depto)\.?\s*(?:de\s+|:\s*)?(?:['\"]\s*([^'\"]+?)\s*['\"]|([^,.;'\"]+?)(?=\s*[,.;]|\s*$))", _F)
+
+# "quantas horas o Rafael dá", "quantas horas de aula a professora 'Ana' tem"
+_RE_PROFESSOR_CARGA = re.compile(
+    r"quantas\s+horas\s+(?:de\s+aula\s+)?(?:o|a)\s+(?:professor(?:a)?\s+)?['\"]?([^\d'\"?]+?)['\"]?\s+(?:d[aá]|tem|leciona|ensina)\b", _F)
+_PERIODOS = [
+    ("proxima_semana", re.compile(r"\bpr[oó]xima\s+semana\b", _F)),
+    ("hoje", re.compile(r"\bhoje\b", _F)),
+    ("amanha", re.compile(r"\bamanh[aã]\b", _F)),
+    ("mes", re.compile(r"\bm[eê]s\b", _F)),
+    ("semana", re.compile(r"\bsemana\b", _F)),
+]
+
+# Palavras que indicam que o "nome" capturado na verdade é uma data/hora/palavra-chave
+_RE_NOME_INVALIDO = re.compile(r"^(?:\d+/\d+|\d+:\d+|dia|das|em|id\b|\d+$)", _F)
+
+
+@dataclass
+class ResultadoLocal:
+    """Resultado do parser local: intenção, parâmetros e confiança (0-1)."""
+    intencao: str = "outra"
+    parametros: dict = field(default_factory=dict)
+    confianca: float = 0.0
+
+    @property
+    def completo(self) -> bool:
+        obrigatorios = PARAMETROS_OBRIGATORIOS.get(self.intencao)
+        if obrigatorios is None:
+            return False
+        return all(self.parametros.get(p) not in (None, "") for p in obrigatorios)
+
+    @property
+    def confiavel(self) -> bool:
+        """True quando o LLM pode ser dispensado."""
+        return self.completo and self.confianca >= LIMIAR_CONFIANCA
+
+    def como_intent_data(self) -> dict:
+        return {"intencao": self.intencao, "parametros": dict(self.parametros)}
+
+
+def _limpar_nome(nome: str) -> str | None:
+    nome = nome.strip().strip("'\"").strip()
+    if not nome or _RE_NOME_INVALIDO.match(nome):
+        return None
+    return nome
+
+
+def _primeiro(*padroes, texto: str) -> str | None:
+    for padrao in padroes:
+        m = padrao.search(texto)
+        if m:
+            valor = next((g for g in m.groups() if g), None)
+            if valor and (nome := _limpar_nome(valor)):
+                return nome
+    return None
+
+
+def extrair_id(texto: str) -> int | None:
+    """
+    ID escrito com 'id'/'#' ou, na falta dele, o primeiro número solto. O número solto só
+    serve para completar a resposta do LLM: no caminho rápido ele não conta (ver analisar_intencao).
+    """
+    m = _RE_ID.search(texto) or _RE_NUMERO_SOLTO.search(texto)
+    return int(m.group(1)) if m else None
+
+
+def _normalizar_hora(hora: str) -> str:
+    if ":" not in hora:
+        hora = f"{hora}:00"
+    h, m = hora.split(":")
+    return f"{int(h):02d}:{m}"
+
+
+def varios_comandos(texto: str, intencao: str) -> bool:
+    """
+    O registro parece ter mais de um comando (outro padrão de intenção, ou 'e <verbo>' depois
+    de um trecho que já é um comando)? "vincule ao professor 'X' e Crie matéria..." é um só.
+    """
+    if any(detectar_intencao(texto[:m.start()])[0] != "outra" for m in _RE_OUTRO_COMANDO.finditer(texto)):
+        return True
+    return any(outra != intencao and padrao.search(texto) for outra, _, padrao in _PADROES_INTENCAO)
+
+
+def detectar_intencao(texto: str) -> tuple[str, float]:
+    """Retorna (intenção, peso do padrão) ou ('outra', 0.0)."""
+    for intencao, peso, padrao in _PADROES_INTENCAO:
+        if padrao.search(texto):
+            return intencao, peso
+    return "outra", 0.0
+
+
+def extrair_parametros(intencao: str, texto: str) -> dict:
+    """Extrai os parâmetros relevantes para a intenção informada."""
+    params = {}
+
+    if intencao in ("cadastrar_materia", "atualizar_materia"):
+        if nome := _primeiro(_RE_MATERIA_ASPAS, _RE_MATERIA_LIVRE, texto=texto):
+            params["nome"] = nome
+        if prof := _primeiro(_RE_PROFESSOR_ASPAS, _RE_PROFESSOR_LIVRE, texto=texto):
+            params["professor"] = prof
+        if m := _RE_CARGA.search(texto):
+            params["carga_horaria"] = int(m.group(1))
+
+    elif intencao == "cadastrar_professor":
+        if nome := _primeiro(_RE_PROFESSOR_ASPAS, _RE_PROFESSOR_LIVRE, texto=texto):
+            params["nome"] = nome
+        if m := _RE_EMAIL.search(texto):
+            params["email"] = m.group(1)
+        if m := _RE_DEPARTAMENTO.search(texto):
+            params["departamento"] = (m.group(1) or m.group(2)).strip()
+
+    elif intencao == "reservar_laboratorio":
+        if nome := _primeiro(_RE_MATERIA_ASPAS, _RE_MATERIA_LIVRE, texto=texto):
+            params["materia_nome"] = nome
+        if m := _RE_DATA.search(texto):
+            params["data"] = m.group(1)
+        if m := _RE_HORAS.search(texto):
+            params["hora_inicio"] = _normalizar_hora(m.group(1))
+            params["hora_fim"] = _normalizar_hora(m.group(2))
+
+    elif intencao == "carga_professor":
+        if prof := _primeiro(_RE_PROFESSOR_ASPAS, _RE_PROFESSOR_CARGA, _RE_PROFESSOR_LIVRE, texto=texto):
+            params["professor"] = prof
+
+    if intencao in ("ocupacao_laboratorio", "top_materias"):
+        if m := _RE_DATA.search(texto):
+            params["data"] = m.group(1)
+        elif periodo := next((nome for nome, padrao in _PERIODOS if padrao.search(texto)), None):
+            params["periodo"] = periodo
+
+    if PARAMETROS_OBRIGATORIOS.get(intencao) == ("id",) or intencao == "atualizar_materia":
+        if (id_val := extrair_id(texto)) is not None:
+            params["id"] = id_val
+
+    return params
+
+
+def analisar(mensagem: str) -> ResultadoLocal:
+    """
+    Analisa a mensagem localmente.
+    A confiança combina o peso do padrão de intenção com a fração de parâmetros
+    obrigatórios encontrados.
+    """
+    texto = " ".join(mensagem.replace('\xa0', ' ').split())
+    intencao, peso = detectar_intencao(texto)
+    return analisar_intencao(texto, intencao, peso)
+
+
+def analisar_intencao(mensagem: str, intencao: str, peso: float = 1.0) -> ResultadoLocal:
+    """
+    Extrai os parâmetros para uma intenção já decidida (pelas REGEX ou pelo classificador
+    treinado) e calcula a confiança da mesma forma que `analisar`.
+    """
+    texto = " ".join(mensagem.replace('\xa0', ' ').split())
+    if intencao not in PARAMETROS_OBRIGATORIOS:
+        return ResultadoLocal()
+
+    params = extrair_parametros(intencao, texto)
+    obrigatorios = PARAMETROS_OBRIGATORIOS[intencao]
+    confianca = peso
+    if obrigatorios:
+        fracao = sum(1 for p in obrigatorios if params.get(p) not in (None, "")) / len(obrigatorios)
+        confianca = peso + (1.0 - peso) * fracao
+
+    # O ID de exclusão/atualização só dispensa o LLM se vier UM, escrito com 'id'/'#':
+    # "cancelar a reserva das 13 h" ou "apagar reserva 5 e reserva 6" vão para o LLM
+    if "id" in obrigatorios and len(_RE_ID.findall(texto)) != 1:
+        confianca = min(confianca, peso * 0.8)
+
+    # Vários comandos num registro: o resultado local teria só o primeiro (e iria para o cache)
+    if varios_comandos(texto, intencao):
+        confianca = min(confianca, peso * 0.8)
+
+    # Parâmetro opcional mencionado mas não extraído: deixa o LLM confirmar
+    if intencao == "carga_professor" and "professor" not in params \
+            and re.search(r"\bprofessor(?:a)?\s+\S|\bquantas\s+horas\s+(?:o|a)\s", texto, _F):
+        confianca *= 0.8
+    if intencao == "cadastrar_materia":
+        if "professor" not in params and re.search(r"\bprofessor", texto, _F):
+            confianca *= 0.8
+        if "carga_horaria" not in params and re.search(r"\b(?:carga|horas?)\b", texto, _F):
+            confianca *= 0.8
+
+    return ResultadoLocal(intencao, params, round(confianca, 3))
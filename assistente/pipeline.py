@@ -0,0 +1,64 @@
+"""
+Pipeline concorrente: extração de intenção + pré-busca (prefetch) de entidades.
+
+Enquanto o LLM ainda está respondendo, as consultas de leitura que provavelmente
+serão necessárias (listas, buscar_*_id) já são disparadas em threads. Quando a
+intenção fica conhecida, o despacho reaproveita os resultados já prontos.
+Só funções de LEITURA podem ser agendadas aqui (a execução é especulativa).
+
+Com a extração em streaming, a própria extração também agenda leituras (a partir de
+outra thread) assim que o campo 'intencao' chega, por isso o Prefetch tem um lock.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class Prefetch:
+    """Conjunto de futuros de leitura indexados por uma chave (ex: ('professor', 'leandro'))."""
+
+    def __init__(self, executor: ThreadPoolExecutor | None = None):
+        self.executor = executor
+        self._futuros: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.aproveitados = 0
+
+    def agendar(self, chave: tuple, fn, *args) -> None:
+        with self._lock:
+            if self.executor is None or chave in self._futuros:
+                return
+            self._futuros[chave] = self.executor.submit(fn, *args)
+
+    def obter(self, chave: tuple, fn, *args):
+        """Resultado pré-buscado se existir; senão executa `fn` agora (na thread atual)."""
+        with self._lock:
+            futuro = self._futuros.pop(chave, None)
+        if futuro is not None:
+            try:
+                resultado = futuro.result()
+                self.aproveitados += 1
+                return resultado
+            except Exception:
+                pass  # Se a pré-busca falhou, tenta de novo de forma síncrona
+        return fn(*args)
+
+    def cancelar_pendentes(self) -> None:
+        """Cancela o que ainda não começou; o que já está rodando termina sozinho."""
+        with self._lock:
+            for futuro in self._futuros.values():
+                futuro.cancel()
+            self._futuros.clear()
+
+
+def executar_com_prefetch(executor: ThreadPoolExecutor, mensagem: str, extrair, palpites) -> tuple[dict, Prefetch]:
+    """
+    Dispara `palpites` (lista de (chave, fn, *args)) em paralelo e executa
+    `extrair(mensagem, prefetch=prefetch)`; a extração pode agendar mais leituras no
+    mesmo Prefetch conforme descobre a intenção.
+    A latência total fica próxima de max(LLM, API) em vez da soma.
+    """
+    prefetch = Prefetch(executor)
+    for chave, fn, *args in palpites:
+        prefetch.agendar(chave, fn, *args)
+    intent_data = extrair(mensagem, prefetch=prefetch)
+    return intent_data, prefetch
@@ -0,0 +1,446 @@
+"""
+Replay do pipeline do assistente (extração + despacho) com LLM simulado e API Django em processo.
+
+O corpus são os "comandos testados" do README mais variações geradas (nomes, datas,
+maiúsculas/acentos, mensagens com várias linhas). Cada mensagem passa pelo mesmo
+caminho do main(): extrair_com_prefetch -> executar_comandos, contra uma API Django
+servida numa thread (banco SQLite temporário, migrado na hora).
+
+O Gemini e o Claude são trocados por um LLM simulado e determinístico: responde o
+gabarito do corpus (com `--erro-llm` de intenções trocadas), em streaming, com
+latência configurável. O hedge, o parser incremental, o cache de intenções e o
+parser local rodam de verdade; o agendador de cota (RPM/TPM) fica de fora, porque
+mede a cota do Gemini real e não o pipeline.
+
+Relatório: throughput, latência p50/p95/p99 por mensagem, chamadas ao LLM evitadas,
+acurácia por intenção e tempo por etapa (spans de assistente/metricas.py).
+`--saida` grava o resultado em JSON e `--comparar` mostra a diferença para um run anterior.
+
+Uso (precisa das dependências do app: streamlit, Django/DRF, django-filter e o app 'materias';
+google-genai e anthropic NÃO são necessários):
+    python benchmarks/replay_assistente.py --variacoes 150 --latencia-llm 700 --concorrencia 4
+    python benchmarks/replay_assistente.py --passadas 2 --saida depois.json --comparar antes.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from assistente.indice_nomes import normalizar_nome  # noqa: E402
+
+# ==============================================================================
+# CORPUS
+# ==============================================================================
+
+# (mensagem, [(intenção, parâmetros esperados)]) — os comandos testados do README, na ordem
+CORPUS_README = [
+    ("Cadastrar o professor 'Leandro.' com o e-mail 'Leandro@escola.br' do departamento de 'Infraestrutura'.",
+     [("cadastrar_professor", {"nome": "Leandro", "email": "Leandro@escola.br", "departamento": "Infraestrutura"})]),
+    ("Cadastrar o professor 'Rafael.' com o e-mail 'Rafael@escola.br' do departamento de 'Ciencia da Inf.'.",
+     [("cadastrar_professor", {"nome": "Rafael", "email": "Rafael@escola.br", "departamento": "Ciencia da Inf"})]),
+    ("Cadastrar o professor 'mario.' com o e-mail 'mario@escola.br' do departamento de 'TI.'.",
+     [("cadastrar_professor", {"nome": "mario", "email": "mario@escola.br", "departamento": "TI"})]),
+    ("vincule ao professor 'Leandro' e Crie matéria 'redes ' . de 80 horas de carga",
+     [("cadastrar_materia", {"nome": "redes", "professor": "Leandro", "carga_horaria": 80})]),
+    ("vincule ao professor 'Rafael' e Crie matéria 'Programação ' . de 180 horas de carga",
+     [("cadastrar_materia", {"nome": "Programação", "professor": "Rafael", "carga_horaria": 180})]),
+    ("vincule ao professor 'mario' e Crie matéria 'informatica ' . de 90 horas de carga",
+     [("cadastrar_materia", {"nome": "informatica", "professor": "mario", "carga_horaria": 90})]),
+    ("Quero reservar o laboratório para a matéria 'redes' no dia 28/11 das 13:00 às 17:30.",
+     [("reservar_laboratorio", {"materia_nome": "redes", "data": "28/11", "hora_inicio": "13:00", "hora_fim": "17:30"})]),
+    ("Quero reservar o laboratório para a matéria 'Programação' no dia 29/11 das 14:00 às 18:30.",
+     [("reservar_laboratorio", {"materia_nome": "Programação", "data": "29/11", "hora_inicio": "14:00", "hora_fim": "18:30"})]),
+    ("Quero reservar o laboratório para a matéria 'informatica' no dia 30/11 das 15:00 às 19:30.",
+     [("reservar_laboratorio", {"materia_nome": "informatica", "data": "30/11", "hora_inicio": "15:00", "hora_fim": "19:30"})]),
+    ("Listar matérias", [("listar_materias", {})]),
+    ("Reservas agendadas", [("listar_reservas", {})]),
+    ("apagar a reserva ID 5", [("excluir_reserva", {"id": 5})]),
+]
+
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Júlia", "Márcio", "Patrícia", "Otávio", "Sérgio", "Lúcia"]
+DEPARTAMENTOS = ["Exatas", "Humanas", "Computação", "Engenharia", "Matemática Aplicada"]
+MATERIAS = ["Cálculo", "Física", "Banco de Dados", "Estruturas de Dados", "Álgebra Linear",
+            "Sistemas Operacionais", "Compiladores", "Estatística", "Redes II", "Lógica"]
+
+TEMPLATES = {
+    "cadastrar_professor": [
+        "Cadastrar o professor '{nome}' com o e-mail '{email}' do departamento de '{departamento}'.",
+        "cadastre a professora '{nome}', e-mail '{email}', departamento '{departamento}'",
+        "Novo professor '{nome}' ({email}) no departamento de '{departamento}'",
+    ],
+    "cadastrar_materia": [
+        "vincule ao professor '{professor}' e Crie matéria '{nome}' . de {carga_horaria} horas de carga",
+        "Crie a matéria '{nome}' com {carga_horaria} horas, professor '{professor}'",
+        "cadastrar disciplina '{nome}' de {carga_horaria}h para o professor '{professor}'",
+    ],
+    "reservar_laboratorio": [
+        "Quero reservar o laboratório para a matéria '{materia_nome}' no dia {data} das {hora_inicio} às {hora_fim}.",
+        "reserva do lab para a disciplina '{materia_nome}' dia {data} das {hora_inicio} as {hora_fim}",
+        "Preciso do laboratório para '{materia_nome}' em {data}, {hora_inicio} até {hora_fim}",
+    ],
+    "listar_materias": ["Listar matérias", "quais matérias existem?", "mostre as disciplinas"],
+    "listar_professores": ["listar professores", "Quais são os professores?", "mostrar todos os professores"],
+    "listar_reservas": ["Reservas agendadas", "listar reservas", "quais reservas do laboratório existem?"],
+    "excluir_reserva": ["apagar a reserva ID {id}", "cancele a reserva #{id}", "excluir reserva id {id}"],
+}
+
+
+def _sem_acentos(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn")
+
+
+def _ruido(texto: str, rng: random.Random) -> str:
+    """Variações de digitação que o atendente produz: caixa, acentos, cortesia, espaços."""
+    sorteio = rng.random()
+    if sorteio < 0.15:
+        texto = texto.lower()
+    elif sorteio < 0.25:
+        texto = _sem_acentos(texto)
+    if rng.random() < 0.2:
+        texto = rng.choice(["por favor, ", "Oi! ", "bom dia, "]) + texto
+    if rng.random() < 0.1:
+        texto += "  "
+    return texto
+
+
+def gerar_corpus(variacoes: int, semente: int) -> list[list[tuple]]:
+    """
+    Fases executadas em sequência (professores -> matérias -> reservas -> consultas),
+    para que cada cadastro encontre as dependências já criadas. Dentro de uma fase as
+    mensagens podem rodar em paralelo.
+    """
+    rng = random.Random(semente)
+    fases = {"professores": [], "materias": [], "reservas": [], "consultas": []}
+    fase_de = {"cadastrar_professor": "professores", "cadastrar_materia": "materias",
+               "reservar_laboratorio": "reservas"}
+    for mensagem, esperado in CORPUS_README:
+        fases[fase_de.get(esperado[0][0], "consultas")].append((mensagem, esperado))
+
+    professores = []
+    materias = []
+    por_fase = max(1, variacoes // 4)
+    for i in range(por_fase):
+        nome = f"{rng.choice(NOMES)} {i}"
+        params = {"nome": nome, "email": f"{_sem_acentos(nome).lower().replace(' ', '.')}@escola.br",
+                  "departamento": rng.choice(DEPARTAMENTOS)}
+        professores.append(nome)
+        fases["professores"].append(_comando("cadastrar_professor", params, rng))
+    for i in range(por_fase):
+        params = {"nome": f"{rng.choice(MATERIAS)} {i}", "professor": rng.choice(professores),
+                  "carga_horaria": rng.choice([30, 45, 60, 80, 90, 120])}
+        materias.append(params["nome"])
+        fases["materias"].append(_comando("cadastrar_materia", params, rng))
+    for i in range(por_fase):
+        inicio = rng.randint(7, 18)
+        params = {"materia_nome": rng.choice(materias), "data": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}",
+                  "hora_inicio": f"{inicio:02d}:00", "hora_fim": f"{inicio + rng.randint(1, 3):02d}:30"}
+        fases["reservas"].append(_comando("reservar_laboratorio", params, rng))
+    consultas = ["listar_materias", "listar_professores", "listar_reservas", "excluir_reserva"]
+    for i in range(variacoes - 3 * por_fase):
+        intencao = rng.choice(consultas)
+        params = {"id": rng.randint(1, 50)} if intencao == "excluir_reserva" else {}
+        fases["consultas"].append(_comando(intencao, params, rng))
+
+    # Algumas mensagens com várias linhas (um comando por linha, extração em lote)
+    for _ in range(max(1, variacoes // 20)):
+        partes = rng.sample(fases["consultas"], k=min(3, len(fases["consultas"])))
+        fases["consultas"].append(("\n".join(m for m, _ in partes), [c for _, e in partes for c in e]))
+
+    for lista in fases.values():
+        rng.shuffle(lista)
+    return [lista for lista in fases.values() if lista]
+
+
+def _comando(intencao: str, params: dict, rng: random.Random) -> tuple:
+    mensagem = rng.choice(TEMPLATES[intencao]).format(**params)
+    return _ruido(mensagem, rng), [(intencao, params)]
+
+
+# ==============================================================================
+# LLM SIMULADO
+# ==============================================================================
+
+class LLMSimulado:
+    """
+    Provedor determinístico: responde o gabarito de cada registro, em pedaços (streaming).
+    A latência e os erros dependem só do texto e da semente, então dois runs com os
+    mesmos argumentos recebem exatamente as mesmas respostas.
+    """
+
+    def __init__(self, app, gabarito: dict, latencia_ms: float, jitter_ms: float, taxa_erro: float, semente: int):
+        self.app = app
+        self.gabarito = gabarito
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.semente = semente
+        self.chamadas = 0
+        self.registros = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, pedido: dict, cancelado: threading.Event) -> str:
+        registros = re.findall(r'^\[(\d+)\] "(.*)"$', pedido["mensagem"], re.M)
+        with self._lock:
+            self.chamadas += 1
+            self.registros += len(registros)
+        rng = random.Random(f"{self.semente}|{pedido['mensagem']}")
+        comandos = []
+        for numero, registro in registros:
+            for intencao, params in self.gabarito.get(normalizar_nome(registro), [("outra", {})]):
+                if rng.random() < self.taxa_erro:
+                    intencao = rng.choice(["outra", "listar_materias", "listar_reservas"])
+                comandos.append({"registro": int(numero), "intencao": intencao, "parametros": dict(params)})
+        texto = json.dumps({"comandos": comandos}, ensure_ascii=False)
+
+        latencia = max(0.0, rng.gauss(self.latencia_ms, self.jitter_ms)) / 1000
+        pedacos = [texto[i:i + 24] for i in range(0, len(texto), 24)]
+        # ~40% da latência até o primeiro pedaço, o resto distribuído entre os pedaços
+        atrasos = [latencia * 0.4] + [latencia * 0.6 / max(1, len(pedacos) - 1)] * (len(pedacos) - 1)
+
+        def stream():
+            for atraso, pedaco in zip(atrasos, pedacos):
+                if cancelado.wait(atraso):
+                    raise RuntimeError("cancelado")
+                yield pedaco
+
+        return self.app._ler_stream(stream(), pedido, cancelado)
+
+
+# ==============================================================================
+# API DJANGO EM PROCESSO
+# ==============================================================================
+
+def iniciar_api(diretorio: Path) -> str:
+    """Sobe a API (escola_api) numa thread com um banco SQLite novo; devolve a URL base."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "escola_api.settings")
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = str(diretorio / "bench.sqlite3")
+    django.setup()
+    from django.core.management import call_command
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+    class HandlerSilencioso(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadedWSGIServer(("127.0.0.1", 0), HandlerSilencioso)
+    servidor.set_app(get_wsgi_application())
+    threading.Thread(target=servidor.serve_forever, name="api-bench", daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_address[1]}/api/"
+
+
+# ==============================================================================
+# REPLAY
+# ==============================================================================
+
+def _normalizar(valor):
+    if isinstance(valor, str):
+        return normalizar_nome(valor)
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def avaliar(obtidos: list[dict], esperados: list[tuple]) -> list[tuple[str, bool, bool]]:
+    """(intenção esperada, intenção correta?, parâmetros corretos?) para cada comando esperado."""
+    resultado = []
+    for i, (intencao, params) in enumerate(esperados):
+        obtido = obtidos[i] if i < len(obtidos) else {}
+        intencao_ok = obtido.get("intencao") == intencao
+        parametros = obtido.get("parametros") or {}
+        params_ok = intencao_ok and all(_normalizar(parametros.get(k)) == _normalizar(v) for k, v in params.items())
+        resultado.append((intencao, intencao_ok, params_ok))
+    return resultado
+
+
+def _percentis(valores: list[float]) -> dict:
+    if len(valores) < 2:
+        v = valores[0] if valores else 0.0
+        return {"p50_ms": v, "p95_ms": v, "p99_ms": v}
+    q = statistics.quantiles(valores, n=100, method="inclusive")
+    return {"p50_ms": q[49], "p95_ms": q[94], "p99_ms": q[98]}
+
+
+def executar_passada(app, fases: list, concorrencia: int, llm: LLMSimulado, extrator) -> dict:
+    latencias = []
+    avaliacoes = []
+    status = Counter()
+    lock = threading.Lock()
+    chamadas_antes, registros_antes = llm.chamadas, llm.registros
+    hedges_antes = extrator.hedges_disparados
+    total_registros = 0
+
+    def sessao(numero: int, mensagens: list):
+        estado = {}
+        for mensagem, esperado in mensagens:
+            inicio = time.perf_counter()
+            comandos, prefetch = app.extrair_com_prefetch(mensagem, f"bench-{numero}")
+            try:
+                _texto, codigo = app.executar_comandos(comandos, prefetch, estado)
+            finally:
+                prefetch.cancelar_pendentes()
+            ms = (time.perf_counter() - inicio) * 1000
+            with lock:
+                latencias.append(ms)
+                avaliacoes.extend(avaliar(comandos, esperado))
+                status[codigo // 100 * 100] += 1
+
+    inicio = time.perf_counter()
+    for mensagens in fases:
+        total_registros += sum(len(app.dividir_registros(m)) for m, _ in mensagens)
+        # Cada sessão é um atendente: processa suas mensagens em sequência
+        threads = [
+            threading.Thread(target=sessao, args=(n, mensagens[n::concorrencia]))
+            for n in range(min(concorrencia, len(mensagens)))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    duracao = time.perf_counter() - inicio
+
+    por_intencao = defaultdict(lambda: [0, 0, 0])
+    for intencao, intencao_ok, params_ok in avaliacoes:
+        contagem = por_intencao[intencao]
+        contagem[0] += 1
+        contagem[1] += intencao_ok
+        contagem[2] += params_ok
+
+    registros_llm = llm.registros - registros_antes
+    return {
+        "mensagens": len(latencias),
+        "registros": total_registros,
+        "duracao_s": round(duracao, 3),
+        "throughput_msg_s": round(len(latencias) / duracao, 2) if duracao else 0.0,
+        "latencia": {k: round(v, 1) for k, v in _percentis(latencias).items()},
+        "chamadas_llm": llm.chamadas - chamadas_antes,
+        "registros_enviados_llm": registros_llm,
+        "registros_sem_llm": total_registros - registros_llm,
+        "taxa_sem_llm": round(1 - registros_llm / total_registros, 4) if total_registros else 0.0,
+        "hedges": extrator.hedges_disparados - hedges_antes,
+        "status_http": {str(k): v for k, v in sorted(status.items())},
+        "acuracia": {
+            intencao: {"n": n, "intencao": round(ok / n, 4), "parametros": round(pok / n, 4)}
+            for intencao, (n, ok, pok) in sorted(por_intencao.items())
+        },
+    }
+
+
+def imprimir(numero: int, r: dict) -> None:
+    print(f"\n=== Passada {numero} ===")
+    print(f"{r['mensagens']} mensagens ({r['registros']} registros) em {r['duracao_s']:.2f}s "
+          f"-> {r['throughput_msg_s']:.1f} msg/s")
+    lat = r["latencia"]
+    print(f"Latência por mensagem: p50 {lat['p50_ms']:.0f} ms | p95 {lat['p95_ms']:.0f} ms | p99 {lat['p99_ms']:.0f} ms")
+    print(f"LLM: {r['chamadas_llm']} chamadas, {r['registros_enviados_llm']} registros enviados | "
+          f"{r['registros_sem_llm']} registros resolvidos sem LLM ({r['taxa_sem_llm']:.0%}) | hedges {r['hedges']}")
+    print(f"Status HTTP: {r['status_http']}")
+    print(f"{'intenção':<22} {'n':>5} {'intenção ok':>12} {'parâmetros ok':>14}")
+    for intencao, a in r["acuracia"].items():
+        print(f"{intencao:<22} {a['n']:>5} {a['intencao']:>12.1%} {a['parametros']:>14.1%}")
+
+
+def comparar(atual: dict, anterior: dict) -> None:
+    print("\n=== Comparação com o run anterior (última passada) ===")
+    a, b = atual["passadas"][-1], anterior["passadas"][-1]
+    linhas = [
+        ("throughput (msg/s)", b["throughput_msg_s"], a["throughput_msg_s"]),
+        ("p50 (ms)", b["latencia"]["p50_ms"], a["latencia"]["p50_ms"]),
+        ("p95 (ms)", b["latencia"]["p95_ms"], a["latencia"]["p95_ms"]),
+        ("p99 (ms)", b["latencia"]["p99_ms"], a["latencia"]["p99_ms"]),
+        ("chamadas ao LLM", b["chamadas_llm"], a["chamadas_llm"]),
+        ("registros sem LLM (%)", 100 * b["taxa_sem_llm"], 100 * a["taxa_sem_llm"]),
+    ]
+    for nome, antes, depois in linhas:
+        variacao = f"{(depois - antes) / antes:+.1%}" if antes else "—"
+        print(f"{nome:<24} {antes:>10.1f} -> {depois:>10.1f}  ({variacao})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variacoes", type=int, default=120, help="mensagens geradas além das do README")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--concorrencia", type=int, default=4, help="sessões (atendentes) simultâneas")
+    parser.add_argument("--passadas", type=int, default=1, help="repetições do corpus (a 2ª mede o cache quente)")
+    parser.add_argument("--latencia-llm", type=float, default=700.0, help="latência média do Gemini simulado (ms)")
+    parser.add_argument("--jitter-llm", type=float, default=250.0)
+    parser.add_argument("--latencia-claude", type=float, default=900.0)
+    parser.add_argument("--sem-claude", action="store_true", help="desliga o hedge")
+    parser.add_argument("--erro-llm", type=float, default=0.0, help="fração de intenções erradas do LLM simulado")
+    parser.add_argument("--saida", type=Path, help="grava o resultado em JSON")
+    parser.add_argument("--comparar", type=Path, help="JSON de um run anterior")
+    args = parser.parse_args()
+
+    fases = gerar_corpus(args.variacoes, args.semente)
+    gabarito = {}
+    for mensagens in fases:
+        for mensagem, esperado in mensagens:
+            registros = [r.strip() for r in re.split(r"[\r\n;]+", mensagem) if r.strip()]
+            if len(registros) == len(esperado):
+                for registro, comando in zip(registros, esperado):
+                    gabarito[normalizar_nome(registro)] = [comando]
+            else:
+                gabarito[normalizar_nome(mensagem)] = esperado
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        url_api = iniciar_api(tmp)
+
+        import Prog3_assistente as app
+        from assistente.cache_intencao import CacheIntencao
+        from assistente.cliente_api import ClienteAPI
+        from assistente.hedge import ExtratorHedged, Provedor
+        from assistente.metricas import METRICAS
+
+        # Injeta as peças do benchmark no lugar das do Streamlit (API local, cache novo, LLM simulado)
+        app.api_client = ClienteAPI(url_api, timeout=(3.05, 10.0), tentativas=3)
+        cache = CacheIntencao(tmp / "intencoes.sqlite3", namespace="bench")
+        app.obter_cache_intencao = lambda: cache
+        gemini = LLMSimulado(app, gabarito, args.latencia_llm, args.jitter_llm, args.erro_llm, args.semente)
+        claude = LLMSimulado(app, gabarito, args.latencia_claude, args.jitter_llm, args.erro_llm, args.semente + 1)
+        extrator = ExtratorHedged(
+            Provedor("gemini", gemini),
+            None if args.sem_claude else Provedor("claude", claude),
+            percentil=app.HEDGE_PERCENTIL,
+            atraso_min_ms=app.HEDGE_ATRASO_MIN_MS,
+            atraso_max_ms=app.HEDGE_ATRASO_MAX_MS,
+        )
+        app.obter_extrator_llm = lambda: extrator
+
+        resultado = {"argumentos": {k: str(v) for k, v in vars(args).items()}, "passadas": []}
+        for numero in range(1, args.passadas + 1):
+            r = executar_passada(app, fases, args.concorrencia, gemini, extrator)
+            resultado["passadas"].append(r)
+            imprimir(numero, r)
+        resultado["etapas"] = METRICAS.resumo()
+
+    print(f"\n{'etapa':<32} {'intenção':<22} {'n':>6} {'p50':>8} {'p95':>8}")
+    for e in sorted(resultado["etapas"], key=lambda e: -e["p95_ms"])[:15]:
+        print(f"{e['etapa']:<32} {e['intencao'] or '-':<22} {e['contagem']:>6} {e['p50_ms']:>6.1f}ms {e['p95_ms']:>6.1f}ms")
+
+    if args.saida:
+        args.saida.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.comparar:
+        comparar(resultado, json.loads(args.comparar.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark de leitura/escrita concorrente no SQLite: perfil 'padrao' x perfil 'wal'.
+
+Simula vários atendentes reservando o laboratório ao mesmo tempo enquanto outros
+listam as reservas. Usa apenas a biblioteca padrão (sqlite3 + threads); o perfil 'wal'
+vem de SQLITE_OPCOES_WAL em escola_api/settings.py (init_command, transaction_mode e
+timeout aplicados como o backend sqlite3 do Django faz), então mede exatamente o que está
+configurado.
+
+Uso:
+    python benchmarks/sqlite_concorrencia.py --escritores 8 --leitores 8 --segundos 5
+"""
+
+import argparse
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from escola_api.settings import SQLITE_OPCOES_WAL  # noqa: E402
+
+
+def perfil_django(opcoes: dict) -> dict:
+    """OPTIONS do DATABASES -> perfil do benchmark (o init_command é dividido em ';', como no Django)."""
+    return {
+        "pragmas": [p.strip() for p in opcoes.get("init_command", "").split(";") if p.strip()],
+        "begin": f"BEGIN {opcoes['transaction_mode']}" if opcoes.get("transaction_mode") else "BEGIN",
+        "timeout": float(opcoes.get("timeout", 5.0)),
+    }
+
+
+PERFIS = {
+    # Padrão do Django/SQLite: journal de rollback, synchronous=FULL, transações DEFERRED
+    "padrao": perfil_django({}),
+    "wal": perfil_django(SQLITE_OPCOES_WAL),
+}
+
+
+def conectar(caminho: Path, perfil: dict) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(caminho), timeout=perfil["timeout"], isolation_level=None, check_same_thread=False)
+    for pragma in perfil["pragmas"]:
+        conn.execute(pragma)
+    return conn
+
+
+def preparar(caminho: Path, linhas_iniciais: int) -> None:
+    conn = sqlite3.connect(str(caminho))
+    conn.execute(
+        "CREATE TABLE reserva (id INTEGER PRIMARY KEY, materia_id INTEGER, data TEXT,"
+        " hora_inicio TEXT, hora_fim TEXT, confirmada INTEGER)"
+    )
+    conn.execute("CREATE INDEX reserva_data_horario_idx ON reserva (data, hora_inicio, hora_fim)")
+    conn.executemany(
+        "INSERT INTO reserva (materia_id, data, hora_inicio, hora_fim, confirmada) VALUES (?, ?, ?, ?, 1)",
+        [(i % 50, f"2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}", "08:00", "10:00") for i in range(linhas_iniciais)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def executar(perfil_nome: str, escritores: int, leitores: int, segundos: float, linhas_iniciais: int) -> dict:
+    perfil = PERFIS[perfil_nome]
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = Path(tmp) / "bench.sqlite3"
+        preparar(caminho, linhas_iniciais)
+        # Aplica journal_mode antes das threads (é persistente no arquivo)
+        conectar(caminho, perfil).close()
+
+        parar = threading.Event()
+        lock = threading.Lock()
+        resultados = {"escrita_ms": [], "leitura_ms": [], "erros_lock": 0}
+
+        def escritor(n: int):
+            conn = conectar(caminho, perfil)
+            i = 0
+            while not parar.is_set():
+                inicio = time.perf_counter()
+                try:
+                    conn.execute(perfil["begin"])
+                    # Checagem de conflito + INSERT na mesma transação (como o ViewSet de reservas)
+                    conn.execute(
+                        "SELECT id FROM reserva WHERE data = ? AND hora_inicio < ? AND hora_fim > ? LIMIT 1",
+                        ("2026-01-01", "12:00", "10:00"),
+                    ).fetchall()
+                    conn.execute(
+                        "INSERT INTO reserva (materia_id, data, hora_inicio, hora_fim, confirmada) VALUES (?, ?, ?, ?, 1)",
+                        (n, f"2026-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}", "13:00", "15:00"),
+                    )
+                    conn.execute("COMMIT")
+                    with lock:
+                        resultados["escrita_ms"].append((time.perf_counter() - inicio) * 1000)
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    with lock:
+                        resultados["erros_lock"] += 1
+                i += 1
+            conn.close()
+
+        def leitor():
+            conn = conectar(caminho, perfil)
+            while not parar.is_set():
+                inicio = time.perf_counter()
+                try:
+                    conn.execute(
+                        "SELECT id, materia_id, data, hora_inicio, hora_fim FROM reserva"
+                        " WHERE id > (SELECT MAX(id) - 20 FROM reserva) ORDER BY id"
+                    ).fetchall()
+                    with lock:
+                        resultados["leitura_ms"].append((time.perf_counter() - inicio) * 1000)
+                except sqlite3.OperationalError:
+                    with lock:
+                        resultados["erros_lock"] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=escritor, args=(n,)) for n in range(escritores)]
+        threads += [threading.Thread(target=leitor) for _ in range(leitores)]
+        for t in threads:
+            t.start()
+        time.sleep(segundos)
+        parar.set()
+        for t in threads:
+            t.join()
+
+    def p99(valores):
+        return statistics.quantiles(valores, n=100)[98] if len(valores) >= 100 else (max(valores) if valores else 0.0)
+
+    return {
+        "perfil": perfil_nome,
+        "escritas_s": len(resultados["escrita_ms"]) / segundos,
+        "leituras_s": len(resultados["leitura_ms"]) / segundos,
+        "escrita_p99_ms": p99(resultados["escrita_ms"]),
+        "leitura_p99_ms": p99(resultados["leitura_ms"]),
+        "erros_lock": resultados["erros_lock"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escritores", type=int, default=8)
+    parser.add_argument("--leitores", type=int, default=8)
+    parser.add_argument("--segundos", type=float, default=5.0)
+    parser.add_argument("--linhas", type=int, default=20000, help="reservas pré-existentes")
+    args = parser.parse_args()
+
+    print(f"{'perfil':<8} {'escritas/s':>11} {'leituras/s':>11} {'p99 escrita':>12} {'p99 leitura':>12} {'erros lock':>11}")
+    for nome in PERFIS:
+        r = executar(nome, args.escritores, args.leitores, args.segundos, args.linhas)
+        print(f"{r['perfil']:<8} {r['escritas_s']:>11.0f} {r['leituras_s']:>11.0f} "
+              f"{r['escrita_p99_ms']:>10.1f}ms {r['leitura_p99_ms']:>10.1f}ms {r['erros_lock']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark de throughput e latência (p50/p99) da API sob carga concorrente: WSGI x ASGI.
+
+Suba os dois servidores com o mesmo banco e rode o script apontando para eles; cada
+caminho é medido em todos os servidores, então a comparação é sempre do MESMO endpoint:
+
+    gunicorn escola_api.wsgi:application -w 1 --threads 8 -b 127.0.0.1:8001
+    uvicorn escola_api.asgi:application --workers 1 --port 8002
+
+    python benchmarks/wsgi_vs_asgi.py \\
+        --servidor wsgi=http://127.0.0.1:8001 --servidor asgi=http://127.0.0.1:8002 \\
+        --caminho /api/async/reservas/ --caminho /api/reservas/ \\
+        --concorrencia 64 --requisicoes 4000
+
+`--cliente-lento KB/s` lê cada resposta em pedaços nessa taxa, simulando clientes
+lentos, o cenário em que o servidor assíncrono mais se diferencia. O servidor só fica
+preso ao cliente quando a resposta não cabe nos buffers do socket: use páginas grandes
+(ex: --caminho "/api/async/reservas/?page_size=100").
+Usa apenas a biblioteca padrão (http.client + threads, conexões keep-alive).
+"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+TAMANHO_PEDACO = 4096
+
+
+def _percentil(valores: list[float], p: int) -> float:
+    if not valores:
+        return 0.0
+    if len(valores) < 100:
+        return sorted(valores)[min(len(valores) - 1, int(len(valores) * p / 100))]
+    return statistics.quantiles(valores, n=100)[p - 1]
+
+
+def _ler(resposta: http.client.HTTPResponse, kb_s: float) -> None:
+    """Lê o corpo inteiro; com `kb_s`, em pedaços espaçados para não passar dessa taxa."""
+    if not kb_s:
+        resposta.read()
+        return
+    while pedaco := resposta.read(TAMANHO_PEDACO):
+        time.sleep(len(pedaco) / (kb_s * 1024))
+
+
+def carregar(url: str, concorrencia: int, requisicoes: int, cliente_lento: float) -> dict:
+    partes = urlsplit(url)
+    caminho = partes.path + (f"?{partes.query}" if partes.query else "")
+    restantes = iter(range(requisicoes))
+    lock = threading.Lock()
+    latencias, erros = [], 0
+    local = threading.local()
+
+    def conexao() -> http.client.HTTPConnection:
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+        return local.conn
+
+    def trabalhador():
+        nonlocal erros
+        while True:
+            with lock:
+                if next(restantes, None) is None:
+                    return
+            inicio = time.perf_counter()
+            try:
+                conn = conexao()
+                conn.request("GET", caminho, headers={"Accept": "application/json"})
+                resposta = conn.getresponse()
+                _ler(resposta, cliente_lento)
+                ok = resposta.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                local.__dict__.pop("conn", None)
+            ms = (time.perf_counter() - inicio) * 1000
+            with lock:
+                if ok:
+                    latencias.append(ms)
+                else:
+                    erros += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        for _ in range(concorrencia):
+            executor.submit(trabalhador)
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "req_s": len(latencias) / duracao if duracao else 0.0,
+        "p50_ms": _percentil(latencias, 50),
+        "p99_ms": _percentil(latencias, 99),
+        "erros": erros,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servidor", action="append", required=True, metavar="NOME=URL_BASE",
+                        help="servidor a medir, ex: wsgi=http://127.0.0.1:8001 (pode repetir)")
+    parser.add_argument("--caminho", action="append", metavar="CAMINHO",
+                        help="endpoint medido em todos os servidores (pode repetir; padrão: /api/async/reservas/)")
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--requisicoes", type=int, default=4000)
+    parser.add_argument("--cliente-lento", type=float, default=0.0, metavar="KB/S",
+                        help="taxa de leitura de cada resposta (0 = sem limite)")
+    parser.add_argument("--aquecimento", type=int, default=200, help="requisições descartadas antes de medir")
+    args = parser.parse_args()
+
+    print(f"{'caminho':<32} {'servidor':<10} {'req/s':>9} {'p50':>9} {'p99':>9} {'erros':>7}")
+    for caminho in args.caminho or ["/api/async/reservas/"]:
+        for servidor in args.servidor:
+            nome, base = servidor.split("=", 1)
+            url = base.rstrip("/") + caminho
+            if args.aquecimento:
+                carregar(url, min(args.concorrencia, 8), args.aquecimento, 0.0)
+            r = carregar(url, args.concorrencia, args.requisicoes, args.cliente_lento)
+            print(f"{caminho:<32} {nome:<10} {r['req_s']:>9.0f} {r['p50_ms']:>7.1f}ms "
+                  f"{r['p99_ms']:>7.1f}ms {r['erros']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Agregações no servidor: GET /api/agregacoes/<nome>/.
+
+Perguntas como "quantas horas o Rafael dá" ou "quão ocupado está o laboratório esta
+semana" antes baixavam as listas inteiras para somar no cliente. Cada endpoint aqui é
+UMA consulta values().annotate() (GROUP BY no banco), servida pelos índices:
+
+- carga-professores/?professor=<nome>      soma de carga_horaria por professor (matérias
+  sem professor ficam de fora)
+  (índice (professor, carga_horaria) de `indices_materia`: a soma sai só do índice);
+- ocupacao/?inicio=&fim=&agrupar=dia|semana reservas e minutos reservados por período
+  (índice (data, hora_inicio, hora_fim) de reservas.indices_reserva cobre a consulta);
+- top-materias/?inicio=&fim=&k=5            matérias que mais usam o laboratório.
+
+Datas em AAAA-MM-DD; sem período, vale a semana atual (segunda a domingo). As respostas
+ficam no cache com as versões das tabelas na chave (ver cache_api), então qualquer
+escrita em matérias, professores ou reservas as invalida.
+
+Uso no model do app 'materias':
+
+    class Materia(NomeNormalizadoModel):
+        ...
+        class Meta:
+            indexes = indices_materia() + indices_nome_normalizado("materia")
+"""
+
+import hashlib
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncWeek
+from django.urls import reverse
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .busca_nomes import filtro_prefixo, normalizar_nome, tem_nome_normalizado
+from .cache_api import registrar_invalidacao, versao_tabela
+
+# Janela de funcionamento do laboratório usada na taxa de ocupação (07:00 às 22:00)
+MINUTOS_LAB_POR_DIA = 15 * 60
+TOP_K_PADRAO = 5
+TOP_K_MAXIMO = 50
+PERIODO_MAXIMO_DIAS = 366
+CACHE_TIMEOUT = 300
+
+MODELOS = ("materias.Materia", "materias.Professor", "materias.ReservaLaboratorio")
+
+
+def indices_materia() -> list:
+    return [models.Index(fields=["professor", "carga_horaria"], name="materia_professor_carga_idx")]
+
+
+def _duracao():
+    return ExpressionWrapper(F("hora_fim") - F("hora_inicio"), output_field=DurationField())
+
+
+def _minutos(duracao) -> int:
+    return int(duracao.total_seconds() // 60) if duracao else 0
+
+
+def _data(valor: str | None, nome: str) -> date | None:
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValidationError({"erro": f"'{nome}' deve estar no formato AAAA-MM-DD."})
+
+
+def periodo(params) -> tuple[date, date]:
+    """(?inicio, ?fim) validados; sem eles, a semana atual."""
+    inicio, fim = _data(params.get("inicio"), "inicio"), _data(params.get("fim"), "fim")
+    if inicio is None:
+        inicio = (fim or date.today()) - timedelta(days=(fim or date.today()).weekday())
+    if fim is None:
+        fim = inicio + timedelta(days=6)
+    if fim < inicio:
+        raise ValidationError({"erro": "'fim' deve ser igual ou posterior a 'inicio'."})
+    if (fim - inicio).days >= PERIODO_MAXIMO_DIAS:
+        raise ValidationError({"erro": f"O período aceita no máximo {PERIODO_MAXIMO_DIAS} dias."})
+    return inicio, fim
+
+
+class AgregacoesViewSet(viewsets.ViewSet):
+    """Somente leitura; registrado no router com basename 'agregacoes'."""
+
+    @staticmethod
+    def _cacheado(request, calcular):
+        # Idempotente; garante a invalidação mesmo sem os ViewSets com CacheRespostaMixin
+        for label in MODELOS:
+            registrar_invalidacao(apps.get_model(label))
+        versoes = "-".join(str(versao_tabela(apps.get_model(label))) for label in MODELOS)
+        caminho = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        chave = f"api:agregacoes:{versoes}:{caminho}"
+        dados = cache.get(chave)
+        if dados is None:
+            dados = calcular()
+            cache.set(chave, dados, CACHE_TIMEOUT)
+        return Response(dados)
+
+    def list(self, request):
+        return Response({
+            nome: request.build_absolute_uri(reverse(f"agregacoes-{nome}"))
+            for nome in ("carga-professores", "ocupacao", "top-materias")
+        })
+
+    @action(detail=False, methods=["get"], url_path="carga-professores", url_name="carga-professores")
+    def carga_professores(self, request):
+        nome = normalizar_nome(request.query_params.get("professor", ""))
+
+        def calcular():
+            # Sem o filtro, as matérias sem professor formariam um grupo professor=None
+            materias = apps.get_model("materias.Materia").objects.filter(professor__isnull=False)
+            if nome and tem_nome_normalizado(apps.get_model("materias.Professor")):
+                # Nome normalizado por prefixo: 'rafael' encontra 'Rafael Souza' (índice B-tree)
+                materias = materias.filter(filtro_prefixo(nome, "professor__nome_normalizado"))
+            elif nome:
+                # Professor ainda sem a coluna: prefixo no nome original, sem diferenciar maiúsculas
+                materias = materias.filter(professor__nome__istartswith=request.query_params["professor"].strip())
+            linhas = (
+                materias
+                .values("professor", "professor__nome")
+                .annotate(materias=Count("id"), carga_total=Sum("carga_horaria"))
+                .order_by("-carga_total", "professor__nome")
+            )
+            return {
+                "results": [
+                    {
+                        "professor": linha["professor"],
+                        "professor_nome": linha["professor__nome"],
+                        "materias": linha["materias"],
+                        "carga_total": linha["carga_total"] or 0,
+                    }
+                    for linha in linhas
+                ]
+            }
+
+        return self._cacheado(request, calcular)
+
+    @action(detail=False, methods=["get"], url_path="ocupacao", url_name="ocupacao")
+    def ocupacao(self, request):
+        inicio, fim = periodo(request.query_params)
+        agrupar = request.query_params.get("agrupar", "dia")
+        if agrupar not in ("dia", "semana"):
+            raise ValidationError({"erro": "'agrupar' deve ser 'dia' ou 'semana'."})
+
+        def calcular():
+            reservas = apps.get_model("materias.ReservaLaboratorio").objects.filter(data__gte=inicio, data__lte=fim)
+            chave = TruncWeek("data") if agrupar == "semana" else F("data")
+            linhas = (
+                reservas
+                .annotate(periodo=chave)
+                .values("periodo")
+                .annotate(reservas=Count("id"), duracao=Sum(_duracao()))
+                .order_by("periodo")
+            )
+            resultados = []
+            for linha in linhas:
+                comeco = linha["periodo"]
+                # Dias do período dentro do intervalo pedido (semanas nas pontas podem ser parciais)
+                ultimo = comeco + timedelta(days=6) if agrupar == "semana" else comeco
+                dias = (min(ultimo, fim) - max(comeco, inicio)).days + 1
+                minutos = _minutos(linha["duracao"])
+                resultados.append({
+                    "periodo": comeco.isoformat(),
+                    "reservas": linha["reservas"],
+                    "minutos": minutos,
+                    "ocupacao": round(minutos / (dias * MINUTOS_LAB_POR_DIA), 4),
+                })
+            total_minutos = sum(r["minutos"] for r in resultados)
+            return {
+                "inicio": inicio.isoformat(),
+                "fim": fim.isoformat(),
+                "agrupar": agrupar,
+                "total": {
+                    "reservas": sum(r["reservas"] for r in resultados),
+                    "minutos": total_minutos,
+                    "ocupacao": round(total_minutos / (((fim - inicio).days + 1) * MINUTOS_LAB_POR_DIA), 4),
+                },
+                "results": resultados,
+            }
+
+        return self._cacheado(request, calcular)
+
+    @action(detail=False, methods=["get"], url_path="top-materias", url_name="top-materias")
+    def top_materias(self, request):
+        inicio, fim = periodo(request.query_params)
+        try:
+            k = min(max(int(request.query_params.get("k", TOP_K_PADRAO)), 1), TOP_K_MAXIMO)
+        except ValueError:
+            raise ValidationError({"erro": "'k' deve ser um inteiro."})
+
+        def calcular():
+            linhas = (
+                apps.get_model("materias.ReservaLaboratorio").objects
+                .filter(data__gte=inicio, data__lte=fim)
+                .values("materia", "materia__nome", "materia__professor__nome")
+                .annotate(reservas=Count("id"), duracao=Sum(_duracao()))
+                .order_by("-duracao", "-reservas", "materia__nome")[:k]
+            )
+            return {
+                "inicio": inicio.isoformat(),
+                "fim": fim.isoformat(),
+                "results": [
+                    {
+                        "materia": linha["materia"],
+                        "materia_nome": linha["materia__nome"],
+                        "professor_nome": linha["materia__professor__nome"],
+                        "reservas": linha["reservas"],
+                        "minutos": _minutos(linha["duracao"]),
+                    }
+                    for linha in linhas
+                ],
+            }
+
+        return self._cacheado(request, calcular)
@@ -3,6 +3,9 @@ ASGI config for escola_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Servir com um servidor ASGI para usar as views assíncronas de /api/async/:
+    uvicorn escola_api.asgi:application --host 127.0.0.1 --port 8000
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
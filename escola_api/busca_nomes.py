@@ -0,0 +1,208 @@
+"""
+Busca por nome normalizado: GET /api/<recurso>/buscar/?q=<nome>&k=5.
+
+O filtro exato ?nome= falha com qualquer diferença de acento, maiúscula ou espaço
+("Programação " x "programacao"). Aqui cada linha guarda o nome já normalizado
+(minúsculas, sem acentos, sem espaços/pontuação nas pontas, a mesma regra de
+assistente/indice_nomes.py) numa coluna indexada, e a busca é UMA consulta indexada:
+
+- PostgreSQL: similaridade de trigramas (pg_trgm, índice GIN) OU prefixo, ordenados
+  por (prefixo, similaridade);
+- demais bancos: faixa de prefixo no índice B-tree (nome_normalizado >= 'pro' AND
+  < 'prp'), com o ranking por trigramas feito sobre esses poucos candidatos.
+
+Uso no model do app 'materias':
+
+    class Professor(NomeNormalizadoModel):
+        nome = models.CharField(max_length=100)
+        ...
+        class Meta:
+            indexes = indices_nome_normalizado("professor")  # GIN só no PostgreSQL
+
+Na migração: o campo, `RunPython(preencher_nome_normalizado("materias", "Professor"))`
+para as linhas existentes e, no PostgreSQL, `TrigramExtension()` antes do índice GIN.
+
+Enquanto o model não tiver a coluna, a busca continua funcionando por prefixo do nome
+original (istartswith, sem índice) com o ranking feito aqui, e o lote não a preenche.
+"""
+
+import unicodedata
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, models
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+_PONTUACAO_PONTAS = " \t'\"`´.,;:!?-"
+
+TOP_K_PADRAO = 5
+TOP_K_MAXIMO = 20
+SIMILARIDADE_MINIMA = 0.3
+# Fora do PostgreSQL: os candidatos são os nomes que começam com os mesmos N caracteres
+TAMANHO_PREFIXO_CANDIDATOS = 3
+MAX_CANDIDATOS = 200
+
+
+def normalizar_nome(nome: str) -> str:
+    """'Programação ' -> 'programacao'; 'Leandro.' -> 'leandro' (igual ao assistente)."""
+    sem_acento = unicodedata.normalize("NFKD", nome or "")
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return " ".join(sem_acento.lower().replace('\xa0', ' ').split()).strip(_PONTUACAO_PONTAS)
+
+
+def tem_nome_normalizado(modelo) -> bool:
+    """O model já herda de NomeNormalizadoModel (tem a coluna `nome_normalizado`)?"""
+    try:
+        modelo._meta.get_field("nome_normalizado")
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def filtro_prefixo(prefixo: str, campo: str = "nome_normalizado") -> Q:
+    """Prefixo como faixa [prefixo, prefixo com o último caractere +1): usa o índice B-tree."""
+    fim = prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+    return Q(**{f"{campo}__gte": prefixo, f"{campo}__lt": fim})
+
+
+def _trigramas(texto: str) -> set[str]:
+    # Mesmo preenchimento do pg_trgm: duas posições vazias antes e uma depois de cada palavra
+    return {t[i:i + 3] for palavra in texto.split() for t in [f"  {palavra} "] for i in range(len(t) - 2)}
+
+
+def similaridade(a: str, b: str) -> float:
+    """Trigramas em comum / trigramas distintos (a medida do similarity() do pg_trgm)."""
+    ta, tb = _trigramas(a), _trigramas(b)
+    return len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+
+
+class NomeNormalizadoModel(models.Model):
+    """Model abstrato: mantém `nome_normalizado` em dia a cada save()."""
+
+    campo_nome = "nome"
+
+    nome_normalizado = models.CharField(max_length=255, editable=False, db_index=True, default="")
+
+    class Meta:
+        abstract = True
+
+    def atualizar_nome_normalizado(self) -> None:
+        self.nome_normalizado = normalizar_nome(getattr(self, self.campo_nome))
+
+    def save(self, *args, **kwargs):
+        self.atualizar_nome_normalizado()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and self.campo_nome in update_fields:
+            kwargs["update_fields"] = {*update_fields, "nome_normalizado"}
+        super().save(*args, **kwargs)
+
+
+def indices_nome_normalizado(prefixo: str) -> list:
+    """Índice GIN de trigramas (só no PostgreSQL; o B-tree vem do db_index do campo)."""
+    if connection.vendor != "postgresql":
+        return []
+    from django.contrib.postgres.indexes import GinIndex
+
+    return [GinIndex(fields=["nome_normalizado"], opclasses=["gin_trgm_ops"], name=f"{prefixo}_nome_trgm_idx")]
+
+
+def preencher_nome_normalizado(app_label: str, nome_modelo: str):
+    """Função para RunPython: preenche a coluna nas linhas que já existiam."""
+    def preencher(apps, schema_editor):
+        modelo = apps.get_model(app_label, nome_modelo)
+        objetos = list(modelo.objects.only("pk", "nome"))
+        for objeto in objetos:
+            objeto.nome_normalizado = normalizar_nome(objeto.nome)
+        modelo.objects.bulk_update(objetos, ["nome_normalizado"], batch_size=500)
+    return preencher
+
+
+def buscar_por_nome(queryset, consulta: str, k: int = TOP_K_PADRAO,
+                    minimo: float = SIMILARIDADE_MINIMA) -> list[dict]:
+    """Os `k` melhores candidatos para `consulta` (já normalizada), em uma consulta indexada."""
+    if not tem_nome_normalizado(queryset.model):
+        # Sem a coluna: prefixo no nome original e normalização em Python sobre os candidatos
+        candidatos = [
+            {**linha, "nome_normalizado": normalizar_nome(linha["nome"])}
+            for linha in queryset
+            .filter(nome__istartswith=consulta[:TAMANHO_PREFIXO_CANDIDATOS])
+            .values("id", "nome")[:MAX_CANDIDATOS]
+        ]
+        return _ranquear(candidatos, consulta, k, minimo)
+
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        linhas = (
+            queryset
+            .annotate(
+                similaridade=TrigramSimilarity("nome_normalizado", consulta),
+                prefixo=Case(When(filtro_prefixo(consulta), then=Value(1)), default=Value(0),
+                             output_field=IntegerField()),
+            )
+            # '%' (trigram_similar) e a faixa de prefixo usam os índices GIN e B-tree
+            .filter(Q(nome_normalizado__trigram_similar=consulta) | filtro_prefixo(consulta))
+            .filter(Q(similaridade__gte=minimo) | Q(prefixo=1))
+            .order_by("-prefixo", "-similaridade", "nome_normalizado")
+            .values("id", "nome", "nome_normalizado", "similaridade")[:k]
+        )
+        return [_resultado(linha, consulta, linha["similaridade"]) for linha in linhas]
+
+    candidatos = (
+        queryset
+        .filter(filtro_prefixo(consulta[:TAMANHO_PREFIXO_CANDIDATOS]))
+        .values("id", "nome", "nome_normalizado")[:MAX_CANDIDATOS]
+    )
+    return _ranquear(candidatos, consulta, k, minimo)
+
+
+def _ranquear(candidatos, consulta: str, k: int, minimo: float) -> list[dict]:
+    """Prefixo primeiro, depois similaridade de trigramas (o ranking do PostgreSQL, em Python)."""
+    ranqueados = []
+    for linha in candidatos:
+        nota = similaridade(consulta, linha["nome_normalizado"])
+        prefixo = linha["nome_normalizado"].startswith(consulta)
+        if prefixo or nota >= minimo:
+            ranqueados.append((not prefixo, -nota, linha["nome_normalizado"], linha))
+    ranqueados.sort(key=lambda r: r[:3])
+    return [_resultado(linha, consulta, -nota) for _, nota, _, linha in ranqueados[:k]]
+
+
+def _resultado(linha: dict, consulta: str, nota: float) -> dict:
+    return {
+        "id": linha["id"],
+        "nome": linha["nome"],
+        "similaridade": round(float(nota), 3),
+        "exato": linha["nome_normalizado"] == consulta,
+    }
+
+
+class BuscaNomeMixin:
+    """
+    Mixin para ModelViewSet de um NomeNormalizadoModel: adiciona a action 'buscar'.
+    Deve vir antes do CriacaoEmLoteMixin (o bulk_create do lote não chama save()).
+    Num model ainda sem a coluna, a busca usa o caminho sem índice e o lote segue igual.
+    """
+
+    @action(detail=False, methods=["get"], url_path="buscar")
+    def buscar(self, request, *args, **kwargs):
+        consulta = normalizar_nome(request.query_params.get("q", ""))
+        if not consulta:
+            raise ValidationError({"erro": "Informe o nome em ?q=."})
+        try:
+            k = min(max(int(request.query_params.get("k", TOP_K_PADRAO)), 1), TOP_K_MAXIMO)
+            minimo = float(request.query_params.get("min_similaridade", SIMILARIDADE_MINIMA))
+        except ValueError:
+            raise ValidationError({"erro": "Parâmetros 'k' e 'min_similaridade' devem ser numéricos."})
+
+        resultados = buscar_por_nome(self.get_queryset().model.objects.all(), consulta, k, minimo)
+        return Response({"consulta": consulta, "results": resultados})
+
+    def preparar_lote(self, objetos: list) -> None:
+        super().preparar_lote(objetos)
+        if not tem_nome_normalizado(self.get_queryset().model):
+            return
+        for objeto in objetos:
+            objeto.atualizar_nome_normalizado()
@@ -0,0 +1,139 @@
+"""
+Cache das actions list/retrieve dos ViewSets do router.
+
+Cada tabela tem uma "versão" guardada no cache (timestamp em ns da última escrita).
+A chave de cada resposta inclui as versões das tabelas de que ela depende, então um
+create/update/delete invalida exatamente as respostas daquela tabela (e das que a
+expandem), sem varrer o cache. Os contadores de hit/miss ficam em /api/metricas/cache/.
+"""
+
+import hashlib
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+_PREFIXO = "api"
+_modelos_registrados: set[str] = set()
+_endpoints: set[str] = set()
+
+
+def _chave_versao(modelo) -> str:
+    return f"{_PREFIXO}:versao:{modelo._meta.label_lower}"
+
+
+def versao_tabela(modelo) -> int:
+    """Versão atual da tabela. Se a chave sumiu do cache, cria uma nova (nunca reaproveita)."""
+    versao = cache.get(_chave_versao(modelo))
+    if versao is None:
+        versao = time.time_ns()
+        cache.add(_chave_versao(modelo), versao, None)
+        versao = cache.get(_chave_versao(modelo), versao)
+    return versao
+
+
+def invalidar_tabela(modelo) -> None:
+    cache.set(_chave_versao(modelo), time.time_ns(), None)
+
+
+def invalidar_ao_confirmar(modelo) -> None:
+    """
+    Troca a versão só depois do COMMIT (na hora, se não houver transação aberta).
+    Trocar antes deixaria um GET concorrente guardar as linhas antigas sob a versão nova,
+    e essa entrada (e a ETag dela) valeria até a próxima escrita.
+    """
+    transaction.on_commit(lambda: invalidar_tabela(modelo))
+
+
+def _ao_alterar(sender, **kwargs):
+    invalidar_ao_confirmar(sender)
+
+
+def registrar_invalidacao(modelo) -> None:
+    """Liga os sinais de escrita do model à troca de versão (uma vez por model)."""
+    label = modelo._meta.label_lower
+    if label in _modelos_registrados:
+        return
+    post_save.connect(_ao_alterar, sender=modelo, weak=False, dispatch_uid=f"cache-api-save-{label}")
+    post_delete.connect(_ao_alterar, sender=modelo, weak=False, dispatch_uid=f"cache-api-delete-{label}")
+    _modelos_registrados.add(label)
+
+
+def _contar(basename: str, evento: str) -> None:
+    chave = f"{_PREFIXO}:stats:{basename}:{evento}"
+    if not cache.add(chave, 1, None):
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, 1, None)
+
+
+class CacheRespostaMixin:
+    """
+    Mixin para ModelViewSet: guarda no cache as respostas de list/retrieve.
+    `cache_modelos_relacionados` lista outros models ('app.Model') cujo conteúdo
+    aparece na resposta (ex: nomes expandidos) e que também devem invalidá-la.
+    """
+
+    cache_modelos_relacionados: tuple[str, ...] = ()
+    cache_timeout: int | None = 300
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        queryset = getattr(cls, "queryset", None)
+        if queryset is not None:
+            registrar_invalidacao(queryset.model)
+            # Nome estável entre processos (o basename padrão do router)
+            cls.cache_nome = queryset.model._meta.model_name
+            _endpoints.add(cls.cache_nome)
+        for label in cls.cache_modelos_relacionados:
+            registrar_invalidacao(apps.get_model(label))
+
+    def _modelos_dependentes(self) -> list:
+        return [self.get_queryset().model] + [apps.get_model(label) for label in self.cache_modelos_relacionados]
+
+    def _chave_resposta(self, request) -> str:
+        versoes = "-".join(str(versao_tabela(m)) for m in self._modelos_dependentes())
+        caminho = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f"{_PREFIXO}:resp:{self.cache_nome}:{versoes}:{caminho}"
+
+    def _responder_com_cache(self, acao, request, *args, **kwargs):
+        chave = self._chave_resposta(request)
+        dados = cache.get(chave)
+        if dados is not None:
+            _contar(self.cache_nome, "hits")
+            return Response(dados)
+
+        _contar(self.cache_nome, "misses")
+        response = acao(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(chave, response.data, self.cache_timeout)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._responder_com_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._responder_com_cache(super().retrieve, request, *args, **kwargs)
+
+    def lote_criado(self, objetos):
+        # bulk_create não dispara post_save: invalida manualmente
+        invalidar_ao_confirmar(self.get_queryset().model)
+        if hasattr(super(), "lote_criado"):
+            super().lote_criado(objetos)
+
+
+@api_view(["GET"])
+def metricas_cache(request):
+    """Hits, misses e taxa de acerto do cache por endpoint."""
+    dados = {}
+    for nome in sorted(_endpoints):
+        hits = cache.get(f"{_PREFIXO}:stats:{nome}:hits", 0)
+        misses = cache.get(f"{_PREFIXO}:stats:{nome}:misses", 0)
+        total = hits + misses
+        dados[nome] = {"hits": hits, "misses": misses, "taxa_acerto": round(hits / total, 4) if total else 0.0}
+    return Response(dados)
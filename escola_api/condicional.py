@@ -0,0 +1,58 @@
+"""
+GET condicional (ETag / Last-Modified) para list/retrieve dos ViewSets do router.
+
+Os validadores vêm da versão de cada tabela (a mesma usada pelo cache em
+cache_api.py, que é o timestamp da última escrita), e não do hash do corpo: a
+checagem custa algumas leituras no cache e, quando o cliente já tem a versão
+atual, a resposta é um 304 sem corpo e sem tocar no banco.
+"""
+
+import hashlib
+
+from django.apps import apps
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+from .cache_api import versao_tabela
+
+
+class GetCondicionalMixin:
+    """Mixin para ModelViewSet; usa `cache_modelos_relacionados` como dependências extras."""
+
+    cache_modelos_relacionados: tuple[str, ...] = ()
+
+    def _validadores(self, request) -> tuple[str, int]:
+        modelos = [self.get_queryset().model] + [apps.get_model(label) for label in self.cache_modelos_relacionados]
+        versoes = [versao_tabela(m) for m in modelos]
+        # A URL completa (cursor, filtros, expand) entra na ETag: cada página tem a sua
+        base = f"{'-'.join(map(str, versoes))}|{request.get_full_path()}"
+        etag = f'W/"{hashlib.md5(base.encode()).hexdigest()[:20]}"'
+        ultima_escrita = max(versoes) // 1_000_000_000
+        return etag, ultima_escrita
+
+    @staticmethod
+    def _nao_modificado(request, etag: str, ultima_escrita: int) -> bool:
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            etags = {t.strip() for t in if_none_match.split(",")}
+            return "*" in etags or etag in etags
+        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since") or "")
+        return if_modified_since is not None and ultima_escrita <= if_modified_since
+
+    def _responder_condicional(self, acao, request, *args, **kwargs):
+        etag, ultima_escrita = self._validadores(request)
+        cabecalhos = {"ETag": etag, "Last-Modified": http_date(ultima_escrita)}
+        if self._nao_modificado(request, etag, ultima_escrita):
+            return Response(status=304, headers=cabecalhos)
+
+        response = acao(request, *args, **kwargs)
+        if response.status_code == 200:
+            for nome, valor in cabecalhos.items():
+                response[nome] = valor
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._responder_condicional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._responder_condicional(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,55 @@
+"""
+Expansão opcional de chaves estrangeiras nos endpoints do router (?expand=...).
+
+Ex.: GET /api/reservas/?expand=materia,professor devolve também 'materia_nome' e
+'professor_nome'. As relações pedidas entram em select_related, então o número de
+consultas SQL é fixo, independente da quantidade de linhas.
+"""
+
+from rest_framework import serializers
+
+
+class ExpansaoMixin:
+    """
+    Mixin para ModelViewSet.
+    `campos_expansiveis` mapeia o nome aceito em ?expand= para
+    (campo de saída, source no objeto, caminho do select_related).
+    """
+
+    campos_expansiveis: dict[str, tuple[str, str, str]] = {}
+    _classes_expandidas: dict = {}
+
+    def _expansoes(self) -> tuple[str, ...]:
+        request = getattr(self, "request", None)
+        if request is None:
+            return ()
+        pedido = request.query_params.get("expand", "")
+        nomes = {p.strip() for p in pedido.split(",")}
+        return tuple(sorted(n for n in nomes if n in self.campos_expansiveis))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        relacoes = [self.campos_expansiveis[n][2] for n in self._expansoes()]
+        return queryset.select_related(*relacoes) if relacoes else queryset
+
+    def get_serializer_class(self):
+        base = super().get_serializer_class()
+        expansoes = self._expansoes()
+        if not expansoes:
+            return base
+
+        # Uma subclasse por combinação de expansões, criada uma única vez
+        chave = (base, expansoes)
+        if chave not in self._classes_expandidas:
+            extras = {}
+            for nome in expansoes:
+                campo, source, _ = self.campos_expansiveis[nome]
+                extras[campo] = serializers.CharField(source=source, read_only=True, allow_null=True)
+
+            meta_attrs = {}
+            campos = getattr(base.Meta, "fields", None)
+            if campos is not None and campos != serializers.ALL_FIELDS:
+                meta_attrs["fields"] = tuple(campos) + tuple(extras)
+            extras["Meta"] = type("Meta", (base.Meta,), meta_attrs)
+            self._classes_expandidas[chave] = type(f"{base.__name__}Expandido", (base,), extras)
+        return self._classes_expandidas[chave]
@@ -0,0 +1,51 @@
+"""
+Criação em lote: POST /api/<recurso>/lote/ com uma lista de objetos.
+
+A lista inteira é validada de uma vez pelo serializer (many=True) e gravada com um
+único bulk_create dentro de uma transação: ou entram todos, ou nenhum.
+"""
+
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+# Limite de itens por requisição (protege memória e duração da transação)
+TAMANHO_MAXIMO_LOTE = 500
+
+
+class CriacaoEmLoteMixin:
+    """Mixin para ModelViewSet que adiciona a action 'lote'."""
+
+    def validar_lote(self, itens: list[dict]) -> None:
+        """Gancho para validações que envolvem o lote inteiro (ex: conflitos entre itens)."""
+
+    @action(detail=False, methods=["post"], url_path="lote")
+    def lote(self, request, *args, **kwargs):
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError({"erro": "Envie uma lista não vazia de objetos."})
+        if len(request.data) > TAMANHO_MAXIMO_LOTE:
+            raise ValidationError({"erro": f"O lote aceita no máximo {TAMANHO_MAXIMO_LOTE} itens."})
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        modelo = self.get_queryset().model
+
+        try:
+            with transaction.atomic():
+                self.validar_lote(serializer.validated_data)
+                objetos = [modelo(**dados) for dados in serializer.validated_data]
+                self.preparar_lote(objetos)
+                objetos = modelo.objects.bulk_create(objetos)
+        except IntegrityError as e:
+            raise ValidationError({"erro": "Lote rejeitado pelo banco de dados.", "detalhe": str(e)})
+
+        self.lote_criado(objetos)
+        return Response(self.get_serializer(objetos, many=True).data, status=status.HTTP_201_CREATED)
+
+    def preparar_lote(self, objetos: list) -> None:
+        """Gancho antes do bulk_create (que não chama save()): campos derivados etc."""
+
+    def lote_criado(self, objetos: list) -> None:
+        """Chamado após o bulk_create (que não dispara post_save)."""
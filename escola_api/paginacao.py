@@ -0,0 +1,16 @@
+"""
+Paginação padrão dos endpoints do router.
+
+Paginação por cursor: o custo de cada página não cresce com o tamanho da tabela
+(sem OFFSET nem COUNT(*)) e as páginas ficam estáveis mesmo com inserções no meio.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacaoCursor(CursorPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    # Precisa ser um campo único e imutável: o ID serve para todas as tabelas
+    ordering = "id"
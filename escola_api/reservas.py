@@ -0,0 +1,146 @@
+"""
+Verificação de sobreposição de reservas do laboratório.
+
+A checagem é uma única consulta por faixa (data = X AND hora_inicio < fim AND
+hora_fim > inicio), coberta pelo índice composto (data, hora_inicio, hora_fim),
+executada na mesma transação da escrita. No PostgreSQL a garantia final fica com
+uma exclusion constraint, que também cobre escritas concorrentes.
+
+Uso no model do app 'materias':
+
+    class ReservaLaboratorio(models.Model):
+        ...
+        class Meta:
+            indexes = indices_reserva()
+            constraints = restricoes_reserva()  # vazio fora do PostgreSQL
+"""
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import ExpressionWrapper, F, Func, Value
+from rest_framework.exceptions import APIException
+
+
+class ConflitoReserva(APIException):
+    """409 com os dados das reservas conflitantes (para o assistente exibir)."""
+    status_code = 409
+    default_code = "conflito_reserva"
+
+    def __init__(self, conflitos, mensagem: str = "O laboratório já está reservado em parte desse horário."):
+        super().__init__({
+            "erro": "conflito_reserva",
+            "mensagem": mensagem,
+            "conflitos": [
+                {
+                    "id": r.id,
+                    "materia": r.materia_id,
+                    "data": r.data.isoformat(),
+                    "hora_inicio": r.hora_inicio.strftime("%H:%M"),
+                    "hora_fim": r.hora_fim.strftime("%H:%M"),
+                }
+                for r in conflitos
+            ],
+        })
+
+
+def indices_reserva() -> list:
+    return [models.Index(fields=["data", "hora_inicio", "hora_fim"], name="reserva_data_horario_idx")]
+
+
+def restricoes_reserva() -> list:
+    """Exclusion constraint (tsrange &&) — só existe no PostgreSQL."""
+    if connection.vendor != "postgresql":
+        return []
+    from django.contrib.postgres.constraints import ExclusionConstraint
+    from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+
+    intervalo = Func(
+        ExpressionWrapper(F("data") + F("hora_inicio"), output_field=models.DateTimeField()),
+        ExpressionWrapper(F("data") + F("hora_fim"), output_field=models.DateTimeField()),
+        Value("[)"),
+        function="TSRANGE",
+        output_field=DateTimeRangeField(),
+    )
+    return [
+        ExclusionConstraint(
+            name="reserva_sem_sobreposicao",
+            expressions=[(intervalo, RangeOperators.OVERLAPS)],
+        )
+    ]
+
+
+def reservas_sobrepostas(queryset, data, hora_inicio, hora_fim, excluir_id=None):
+    """Reservas do mesmo dia cujo intervalo [inicio, fim) cruza o informado."""
+    queryset = queryset.filter(data=data, hora_inicio__lt=hora_fim, hora_fim__gt=hora_inicio)
+    if excluir_id is not None:
+        queryset = queryset.exclude(pk=excluir_id)
+    return queryset
+
+
+class SemSobreposicaoMixin:
+    """
+    Mixin para o ViewSet de reservas: rejeita (409) escritas que se sobrepõem a uma
+    reserva existente. No SQLite as escritas já são serializadas (transação IMMEDIATE);
+    no PostgreSQL a exclusion constraint resolve corridas entre a checagem e o INSERT.
+    """
+
+    def _verificar_conflito(self, serializer):
+        instancia = serializer.instance
+        dados = serializer.validated_data
+
+        def valor(campo):
+            return dados.get(campo, getattr(instancia, campo, None))
+
+        conflitos = list(
+            reservas_sobrepostas(
+                self.get_queryset().model.objects.all(),
+                valor("data"), valor("hora_inicio"), valor("hora_fim"),
+                excluir_id=instancia.pk if instancia is not None else None,
+            )[:5]
+        )
+        if conflitos:
+            raise ConflitoReserva(conflitos)
+
+    def _salvar_sem_conflito(self, salvar, serializer):
+        with transaction.atomic():
+            self._verificar_conflito(serializer)
+            try:
+                with transaction.atomic():
+                    salvar(serializer)
+            except IntegrityError:
+                # Violação da exclusion constraint (escrita concorrente): reporta o conflito
+                self._verificar_conflito(serializer)
+                raise
+
+    def validar_lote(self, itens):
+        """
+        Lote de reservas: uma única consulta traz as reservas existentes nos dias do
+        lote; os conflitos (com o banco e entre os próprios itens) são checados em memória.
+        """
+        existentes = {}
+        dias = {item["data"] for item in itens}
+        for r in self.get_queryset().model.objects.filter(data__in=dias).order_by("data", "hora_inicio"):
+            existentes.setdefault(r.data, []).append(r)
+
+        conflitos = []
+        aceitos = {}
+        for item in itens:
+            inicio, fim = item["hora_inicio"], item["hora_fim"]
+            for r in existentes.get(item["data"], []):
+                if r.hora_inicio < fim and r.hora_fim > inicio:
+                    conflitos.append(r)
+            for outro_inicio, outro_fim in aceitos.get(item["data"], []):
+                if outro_inicio < fim and outro_fim > inicio:
+                    raise ConflitoReserva([], mensagem=(
+                        f"Duas reservas do lote se sobrepõem em {item['data']:%d/%m/%Y} "
+                        f"({outro_inicio:%H:%M}-{outro_fim:%H:%M} e {inicio:%H:%M}-{fim:%H:%M})."
+                    ))
+            aceitos.setdefault(item["data"], []).append((inicio, fim))
+        if conflitos:
+            raise ConflitoReserva(conflitos)
+        super().validar_lote(itens)
+
+    def perform_create(self, serializer):
+        self._salvar_sem_conflito(super().perform_create, serializer)
+
+    def perform_update(self, serializer):
+        self._salvar_sem_conflito(super().perform_update, serializer)
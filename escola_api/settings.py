@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -79,6 +80,27 @@ WSGI_APPLICATION = 'escola_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil do SQLite: 'wal' (padrão, alta concorrência) ou 'padrao' (journal de rollback do SQLite).
+# No perfil 'wal' leituras não bloqueiam escritas, e as escritas começam com BEGIN IMMEDIATE
+# (sem o "database is locked" de upgrades de lock no meio da transação).
+SQLITE_PERFIL = os.environ.get('SQLITE_PERFIL', 'wal')
+
+SQLITE_PRAGMAS_WAL = ';'.join([
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',      # seguro com WAL; fsync só nos checkpoints
+    # Sem busy_timeout aqui: a espera pelo lock vem do 'timeout' abaixo (o PRAGMA o sobrescreveria)
+    'PRAGMA cache_size=-20000',       # ~20 MB de cache de páginas por conexão
+    'PRAGMA mmap_size=134217728',     # 128 MB lidos via mmap
+    'PRAGMA temp_store=MEMORY',
+])
+
+# OPTIONS do perfil 'wal' (também lidas por benchmarks/sqlite_concorrencia.py)
+SQLITE_OPCOES_WAL = {
+    'init_command': SQLITE_PRAGMAS_WAL,
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,                    # segundos esperando o lock antes de "database is locked"
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -86,6 +108,35 @@ DATABASES = {
     }
 }
 
+if SQLITE_PERFIL == 'wal':
+    DATABASES['default'].update({
+        # Conexões persistentes: os PRAGMAs são aplicados uma vez por conexão, não por request
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': dict(SQLITE_OPCOES_WAL),
+    })
+
+
+# Cache das respostas da API (list/retrieve). CACHE_BACKEND=locmem (padrão, por processo)
+# ou file (compartilhado entre processos/workers, necessário com mais de um worker).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'escola-api',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+if CACHE_BACKEND == 'file':
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache_django',
+        'TIMEOUT': 300,
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,5 +189,9 @@ REST_FRAMEWORK = {
     # 2. ADIÇÃO CRÍTICA: Configurar o Backend de Filtro Padrão
     'DEFAULT_FILTER_BACKENDS': ( # <- CORREÇÃO CRÍTICA
         'django_filters.rest_framework.DjangoFilterBackend',
-    )
+    ),
+
+    # Paginação por cursor em todos os endpoints do router (?cursor=...&page_size=...)
+    'DEFAULT_PAGINATION_CLASS': 'escola_api.paginacao.PaginacaoCursor',
+    'PAGE_SIZE': 20,
 }
\ No newline at end of file
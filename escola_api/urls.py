@@ -3,20 +3,28 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-# Garante que todas as 3 ViewSets são importadas
-from materias.views import MateriaViewSet, ProfessorViewSet, ReservaLaboratorioViewSet 
+# Garante que todas as 3 ViewSets são importadas (versões estendidas do app 'materias')
+from .viewsets import MateriaAPIViewSet, ProfessorAPIViewSet, ReservaLaboratorioAPIViewSet
+from .agregacoes import AgregacoesViewSet
+from .cache_api import metricas_cache
 
 # Criação e Registro do Router
 router = routers.DefaultRouter()
 # 1. Registro de Matérias
-router.register(r'materias', MateriaViewSet) 
+router.register(r'materias', MateriaAPIViewSet)
 # 2. Registro de Professores
-router.register(r'professores', ProfessorViewSet) 
+router.register(r'professores', ProfessorAPIViewSet)
 # 3. Registro de Reservas
-router.register(r'reservas', ReservaLaboratorioViewSet) 
+router.register(r'reservas', ReservaLaboratorioAPIViewSet)
+# 4. Agregações (carga por professor, ocupação do laboratório, matérias que mais reservam)
+router.register(r'agregacoes', AgregacoesViewSet, basename='agregacoes')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Taxa de acerto do cache das listas/detalhes (antes do router para não colidir)
+    path('api/metricas/cache/', metricas_cache, name='metricas-cache'),
+    # Leitura assíncrona (ORM async) para servir via ASGI: /api/async/materias/ etc.
+    path('api/async/', include('escola_api.views_async')),
     # Esta linha final usa o router completo para o prefixo /api/
     path('api/', include(router.urls)), 
 ]
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+Views assíncronas (somente leitura) para servir as listas pelo ASGI.
+
+Rodando sob um servidor ASGI (ex: uvicorn escola_api.asgi:application), essas views
+usam o ORM assíncrono do Django: enquanto uma consulta ou um cliente lento espera,
+o mesmo processo atende outras requisições, sem ocupar uma thread por conexão.
+
+O formato da resposta segue o dos endpoints do router (results/next/previous),
+com paginação por chave (?after=<id>&page_size=N).
+"""
+
+from django.apps import apps
+from django.http import Http404, JsonResponse
+from django.urls import path
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Recurso da URL -> model do app 'materias'
+RECURSOS = {
+    "materias": "materias.Materia",
+    "professores": "materias.Professor",
+    "reservas": "materias.ReservaLaboratorio",
+}
+
+
+def _colunas(modelo) -> dict[str, str]:
+    """attname -> nome na resposta (FK 'materia_id' sai como 'materia', igual ao DRF)."""
+    return {f.attname: f.name for f in modelo._meta.concrete_fields}
+
+
+def _renomear(linha: dict, colunas: dict[str, str]) -> dict:
+    return {colunas[k]: v for k, v in linha.items()}
+
+
+async def listar(request, recurso: str):
+    modelo = apps.get_model(RECURSOS[recurso])
+    colunas = _colunas(modelo)
+    try:
+        after = int(request.GET.get("after", 0))
+        page_size = min(max(int(request.GET.get("page_size", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"erro": "Parâmetros 'after' e 'page_size' devem ser inteiros."}, status=400)
+
+    queryset = modelo.objects.filter(pk__gt=after).order_by("pk").values(*colunas)[:page_size + 1]
+    linhas = [_renomear(linha, colunas) async for linha in queryset]
+
+    proxima = None
+    if len(linhas) > page_size:
+        linhas = linhas[:page_size]
+        proxima = request.build_absolute_uri(f"{request.path}?after={linhas[-1]['id']}&page_size={page_size}")
+    return JsonResponse({"next": proxima, "previous": None, "results": linhas})
+
+
+async def detalhar(request, recurso: str, pk: int):
+    modelo = apps.get_model(RECURSOS[recurso])
+    colunas = _colunas(modelo)
+    try:
+        linha = await modelo.objects.values(*colunas).aget(pk=pk)
+    except modelo.DoesNotExist:
+        raise Http404
+    return JsonResponse(_renomear(linha, colunas))
+
+
+urlpatterns = [
+    padrao
+    for recurso in RECURSOS
+    for padrao in (
+        path(f"{recurso}/", listar, {"recurso": recurso}, name=f"async-{recurso}-list"),
+        path(f"{recurso}/<int:pk>/", detalhar, {"recurso": recurso}, name=f"async-{recurso}-detail"),
+    )
+]
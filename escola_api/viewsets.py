@@ -0,0 +1,36 @@
+"""
+ViewSets publicados no router (/api/).
+
+Estendem os ViewSets do app 'materias' com os recursos de nível de projeto
+(expansão de chaves estrangeiras, cache, GET condicional, lote, busca por nome etc.) sem alterar o app.
+"""
+
+from materias.views import MateriaViewSet, ProfessorViewSet, ReservaLaboratorioViewSet
+
+from .busca_nomes import BuscaNomeMixin
+from .cache_api import CacheRespostaMixin
+from .condicional import GetCondicionalMixin
+from .expansao import ExpansaoMixin
+from .lote import CriacaoEmLoteMixin
+from .reservas import SemSobreposicaoMixin
+
+
+class MateriaAPIViewSet(GetCondicionalMixin, CacheRespostaMixin, BuscaNomeMixin, CriacaoEmLoteMixin, ExpansaoMixin,
+                        MateriaViewSet):
+    cache_modelos_relacionados = ("materias.Professor",)
+    campos_expansiveis = {
+        "professor": ("professor_nome", "professor.nome", "professor"),
+    }
+
+
+class ProfessorAPIViewSet(GetCondicionalMixin, CacheRespostaMixin, BuscaNomeMixin, CriacaoEmLoteMixin, ProfessorViewSet):
+    pass
+
+
+class ReservaLaboratorioAPIViewSet(GetCondicionalMixin, CacheRespostaMixin, SemSobreposicaoMixin,
+                                   CriacaoEmLoteMixin, ExpansaoMixin, ReservaLaboratorioViewSet):
+    cache_modelos_relacionados = ("materias.Materia", "materias.Professor")
+    campos_expansiveis = {
+        "materia": ("materia_nome", "materia.nome", "materia"),
+        "professor": ("professor_nome", "materia.professor.nome", "materia__professor"),
+    }
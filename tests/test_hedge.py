@@ -0,0 +1,122 @@
+"""
+Testes do ExtratorHedged com ProvedorFalso (sem rede).
+
+Latências fixas (mínimo = máximo) deixam as corridas determinísticas; as margens de
+tempo são folgadas para não depender da velocidade da máquina.
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from assistente.hedge import ExtratorHedged, Provedor, ProvedorFalso
+
+
+def _validar(texto: str) -> str:
+    if texto == "invalido":
+        raise ValueError("JSON inválido")
+    return texto
+
+
+class ProvedorObservado:
+    """Envolve um ProvedorFalso e guarda como cada chamada terminou ('ok' ou a mensagem do erro)."""
+
+    def __init__(self, falso: ProvedorFalso):
+        self.falso = falso
+        self.desfechos = []
+        self.terminou = threading.Event()
+
+    def __call__(self, pedido, cancelado):
+        try:
+            texto = self.falso(pedido, cancelado)
+            self.desfechos.append("ok")
+            return texto
+        except Exception as e:
+            self.desfechos.append(str(e))
+            raise
+        finally:
+            self.terminou.set()
+
+
+class TestExtratorHedged(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def _extrator(self, primario, secundario, **kwargs):
+        kwargs.setdefault("atraso_min_ms", 0)
+        return ExtratorHedged(primario, secundario, executor=self.executor, **kwargs)
+
+    def test_primario_rapido_nao_dispara_hedge(self):
+        primario = Provedor("gemini", ProvedorFalso("g", latencia_ms=(10, 10)))
+        secundario = Provedor("claude", ProvedorFalso("c", latencia_ms=(10, 10)))
+        extrator = self._extrator(primario, secundario, atraso_inicial_ms=500)
+
+        self.assertEqual(extrator.extrair({}, _validar), ("g", "gemini"))
+        self.assertEqual(extrator.hedges_disparados, 0)
+
+    def test_hedge_dispara_no_percentil_e_o_mais_rapido_vence(self):
+        primario = Provedor("gemini", ProvedorFalso("g", latencia_ms=(1500, 1500)))
+        secundario = Provedor("claude", ProvedorFalso("c", latencia_ms=(10, 10)))
+        for _ in range(100):
+            primario.latencias.registrar(150)  # p90 = limite do balde: 200 ms
+        extrator = self._extrator(primario, secundario, atraso_inicial_ms=5000)
+        self.assertEqual(extrator.atraso_hedge_ms(), 200)
+
+        inicio = time.perf_counter()
+        resultado = extrator.extrair({}, _validar)
+        decorrido_ms = (time.perf_counter() - inicio) * 1000
+
+        self.assertEqual(resultado, ("c", "claude"))
+        self.assertEqual(extrator.hedges_disparados, 1)
+        self.assertEqual(secundario.vitorias, 1)
+        # Não dispara antes do atraso, nem espera o primário terminar
+        self.assertGreaterEqual(decorrido_ms, 200)
+        self.assertLess(decorrido_ms, 1000)
+
+    def test_erro_do_primario_passa_para_o_secundario_na_hora(self):
+        primario = Provedor("gemini", ProvedorFalso("g", latencia_ms=(10, 10), taxa_erro=1.0))
+        secundario = Provedor("claude", ProvedorFalso("c", latencia_ms=(10, 10)))
+        extrator = self._extrator(primario, secundario, atraso_inicial_ms=3000)
+
+        inicio = time.perf_counter()
+        self.assertEqual(extrator.extrair({}, _validar), ("c", "claude"))
+        self.assertLess(time.perf_counter() - inicio, 1.0)  # sem esperar os 3 s do hedge
+        self.assertEqual(primario.latencias.erros, 1)
+
+    def test_resposta_invalida_passa_para_o_secundario(self):
+        primario = Provedor("gemini", ProvedorFalso("invalido", latencia_ms=(10, 10)))
+        secundario = Provedor("claude", ProvedorFalso("c", latencia_ms=(10, 10)))
+        extrator = self._extrator(primario, secundario, atraso_inicial_ms=3000)
+
+        self.assertEqual(extrator.extrair({}, _validar), ("c", "claude"))
+
+    def test_nenhuma_resposta_valida_levanta_runtime_error(self):
+        primario = Provedor("gemini", ProvedorFalso("invalido", latencia_ms=(10, 10)))
+        secundario = Provedor("claude", ProvedorFalso("g", latencia_ms=(10, 10), taxa_erro=1.0))
+        extrator = self._extrator(primario, secundario, atraso_inicial_ms=50)
+
+        with self.assertRaises(RuntimeError):
+            extrator.extrair({}, _validar)
+
+    def test_perdedor_e_cancelado_e_nao_registra_latencia(self):
+        lento = ProvedorObservado(ProvedorFalso("g", latencia_ms=(5000, 5000)))
+        primario = Provedor("gemini", lento)
+        secundario = Provedor("claude", ProvedorFalso("c", latencia_ms=(10, 10)))
+        extrator = self._extrator(primario, secundario, atraso_inicial_ms=50)
+
+        self.assertEqual(extrator.extrair({}, _validar), ("c", "claude"))
+        # O evento de cancelamento libera o perdedor bem antes dos 5 s
+        self.assertTrue(lento.terminou.wait(1.0))
+        self.assertEqual(lento.desfechos, ["cancelado"])
+        self.assertEqual(primario.latencias.amostras, 0)
+        self.assertEqual(primario.latencias.erros, 0)
+        self.assertEqual(secundario.latencias.amostras, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()